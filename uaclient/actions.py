@@ -22,6 +22,7 @@ from uaclient.defaults import (
     DEFAULT_LOG_PREFIX,
 )
 from uaclient.entitlements.livepatch import LIVEPATCH_CMD
+from uaclient.entitlements.repo import RepoEntitlement
 
 LOG = logging.getLogger("pro.actions")
 event = event_logger.get_event_logger()
@@ -126,6 +127,29 @@ def enable_entitlement_by_name(
     return entitlement.enable()
 
 
+def prefetch_resource_machine_access(
+    cfg: config.UAConfig, names: List[str]
+) -> None:
+    """Request at once the resource tokens needed to enable services.
+
+    Covers the named services and the services they require.
+    """
+    resources = []
+    for name in names:
+        try:
+            ent_cls = entitlements.entitlement_factory(cfg=cfg, name=name)
+        except exceptions.EntitlementNotFoundError:
+            continue
+        for cls in (ent_cls,) + ent_cls(cfg).required_services:
+            ent = cls(cfg)
+            if (
+                isinstance(ent, RepoEntitlement)
+                and ent.needs_resource_machine_access
+            ):
+                resources.append(ent.name)
+    contract.prefetch_resource_machine_access(cfg, resources)
+
+
 def status(
     cfg: config.UAConfig,
     *,
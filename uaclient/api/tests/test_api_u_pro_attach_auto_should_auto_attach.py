@@ -18,16 +18,16 @@ class TestShouldAutoAttachV1:
         ),
     )
     @mock.patch(M_PATH + ".cloud_instance_factory")
-    @mock.patch("uaclient.apt.get_installed_packages")
+    @mock.patch("uaclient.apt.get_dpkg_status_index")
     def test_detect_is_pro(
         self,
-        m_get_installed_pkgs,
+        m_get_dpkg_status_index,
         _m_cloud_factory,
         expected,
         installed_pkgs,
         FakeConfig,
     ):
-        m_get_installed_pkgs.return_value = installed_pkgs
+        m_get_dpkg_status_index.return_value = dict.fromkeys(installed_pkgs)
         assert expected == _should_auto_attach(FakeConfig()).should_auto_attach
 
     @pytest.mark.parametrize(
@@ -1,15 +1,28 @@
 import enum
 import glob
+import json
 import logging
 import os
 import re
 import subprocess
 import sys
 import tempfile
-from functools import lru_cache
-from typing import Dict, List, Optional
+import threading
+from functools import lru_cache, total_ordering, wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 from uaclient import event_logger, exceptions, gpg, messages, system
+from uaclient.defaults import DPKG_STATUS_CACHE_PATH
 
 APT_HELPER_TIMEOUT = 60.0  # 60 second timeout used for apt-helper call
 APT_AUTH_COMMENT = "  # ubuntu-advantage-tools"
@@ -30,8 +43,12 @@ APT_METHOD_HTTPS_FILE = "/usr/lib/apt/methods/https"
 CA_CERTIFICATES_FILE = "/usr/sbin/update-ca-certificates"
 APT_PROXY_CONF_FILE = "/etc/apt/apt.conf.d/90ubuntu-advantage-aptproxy"
 
+DPKG_STATUS_PATH = "/var/lib/dpkg/status"
+
 APT_UPDATE_SUCCESS_STAMP_PATH = "/var/lib/apt/periodic/update-success-stamp"
 APT_LISTS_PATH = "/var/lib/apt/lists"
+APT_SOURCES_PATHS = ("/etc/apt/sources.list", "/etc/apt/sources.list.d")
+APT_PREFERENCES_PATHS = ("/etc/apt/preferences", "/etc/apt/preferences.d")
 
 # Since we generally have a person at the command line prompt. Don't loop
 # for 5 minutes like charmhelpers because we expect the human to notice and
@@ -41,6 +58,93 @@ APT_RETRIES = [1.0, 5.0, 10.0]
 
 event = event_logger.get_event_logger()
 
+F = TypeVar("F", bound=Callable[..., Any])
+
+InstalledPackage = NamedTuple(
+    "InstalledPackage",
+    [("name", str), ("source", str), ("version", str), ("status", str)],
+)
+
+
+AptPolicySource = NamedTuple(
+    "AptPolicySource",
+    [
+        ("pin", int),
+        ("url", str),
+        ("suite", str),
+        ("component", str),
+        ("origin", str),
+        ("site", str),
+    ],
+)
+
+RE_APT_POLICY_SOURCE = re.compile(
+    r"^\s*(?P<pin>-?\d+) (?P<url>\S+)(?: (?P<dist>\S+))?"
+)
+RE_APT_POLICY_RELEASE = re.compile(r"^\s*release (?P<fields>.*)$")
+RE_APT_POLICY_ORIGIN = re.compile(r"^\s*origin (?P<site>\S+)")
+
+
+class AptPolicy:
+    """The package files listed by apt-cache policy, indexed by URL."""
+
+    def __init__(self, sources: List[AptPolicySource]):
+        self.sources = sources
+        self._sources_by_url = {}  # type: Dict[str, List[AptPolicySource]]
+        for source in sources:
+            self._sources_by_url.setdefault(source.url, []).append(source)
+
+    @classmethod
+    def from_output(cls, policy_output: str) -> "AptPolicy":
+        sources = []  # type: List[AptPolicySource]
+        for line in policy_output.splitlines():
+            if line.strip() == "Pinned packages:":
+                break
+            match = RE_APT_POLICY_SOURCE.match(line)
+            if match:
+                suite, _, component = (match.group("dist") or "").partition(
+                    "/"
+                )
+                sources.append(
+                    AptPolicySource(
+                        pin=int(match.group("pin")),
+                        url=match.group("url").rstrip("/"),
+                        suite=suite,
+                        component=component,
+                        origin="",
+                        site="",
+                    )
+                )
+                continue
+            if not sources:
+                continue
+            match = RE_APT_POLICY_RELEASE.match(line)
+            if match:
+                fields = dict(
+                    field.partition("=")[::2]
+                    for field in match.group("fields").split(",")
+                )
+                sources[-1] = sources[-1]._replace(
+                    origin=fields.get("o", ""),
+                    component=fields.get("c") or sources[-1].component,
+                )
+                continue
+            match = RE_APT_POLICY_ORIGIN.match(line)
+            if match:
+                sources[-1] = sources[-1]._replace(site=match.group("site"))
+        return cls(sources)
+
+    def get_sources(self, url: str) -> List[AptPolicySource]:
+        """Return the package files served from url, in apt's order."""
+        return self._sources_by_url.get(url.rstrip("/"), [])
+
+
+_apt_policy = None  # type: Optional[Tuple[List[Any], AptPolicy]]
+
+# Held while apt or dpkg run and while apt sources change, so that services
+# processed concurrently never change the packaging state at the same time.
+APT_LOCK = threading.RLock()
+
 
 @enum.unique
 class AptProxyScope(enum.Enum):
@@ -145,6 +249,17 @@ def _parse_apt_update_for_invalid_apt_config(
     return error_msg
 
 
+def serialize_apt_changes(func: F) -> F:
+    """Decorate func to run while holding APT_LOCK."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with APT_LOCK:
+            return func(*args, **kwargs)
+
+    return cast(F, wrapper)
+
+
 def run_apt_command(
     cmd: List[str],
     error_msg: Optional[str] = None,
@@ -161,9 +276,10 @@ def run_apt_command(
     :raise UserFacingError: on issues running apt-cache policy.
     """
     try:
-        out, _err = system.subp(
-            cmd, capture=True, retry_sleeps=APT_RETRIES, env=env
-        )
+        with APT_LOCK:
+            out, _err = system.subp(
+                cmd, capture=True, retry_sleeps=APT_RETRIES, env=env
+            )
     except exceptions.ProcessExecutionError as e:
         if "Could not get lock /var/lib/dpkg/lock" in str(e.stderr):
             raise exceptions.APTProcessConflictError()
@@ -194,6 +310,38 @@ def get_apt_cache_policy(
     )
 
 
+def get_apt_policy(error_msg: Optional[str] = None) -> AptPolicy:
+    """Return the parsed apt-cache policy of this machine.
+
+    The policy is shared by every caller in the process. It is read again
+    when apt update runs or when the apt sources, preferences or lists
+    change.
+    """
+    global _apt_policy
+    key = [
+        get_apt_config_fingerprint(),
+        system.get_file_fingerprint(APT_UPDATE_SUCCESS_STAMP_PATH),
+        system.get_file_fingerprint(APT_LISTS_PATH),
+    ]
+    with APT_LOCK:
+        if _apt_policy is None or _apt_policy[0] != key:
+            if _apt_policy is not None:
+                get_apt_cache_policy.cache_clear()
+            policy = AptPolicy.from_output(
+                get_apt_cache_policy(error_msg=error_msg)
+            )
+            _apt_policy = (key, policy)
+        return _apt_policy[1]
+
+
+def invalidate_apt_policy() -> None:
+    """Drop the apt-cache policy output and its parsed index."""
+    global _apt_policy
+    with APT_LOCK:
+        _apt_policy = None
+        get_apt_cache_policy.cache_clear()
+
+
 def get_apt_cache_policy_for_package(
     package: str,
     error_msg: Optional[str] = None,
@@ -220,7 +368,7 @@ def run_apt_update_command(env: Optional[Dict[str, str]] = {}) -> str:
         # Whenever we run an apt-get update command, we must invalidate
         # the existing apt-cache policy cache. Otherwise, we could provide
         # users with incorrect values.
-        get_apt_cache_policy.cache_clear()
+        invalidate_apt_policy()
 
     return out
 
@@ -486,13 +634,109 @@ def clean_apt_files(*, _entitlements=None):
             system.remove_file(pref_file)
 
 
+def _parse_dpkg_status(status_path: str) -> Dict[str, InstalledPackage]:
+    """Stream the dpkg status file into a dict keyed by package name.
+
+    Packages dpkg considers not-installed are left out, like dpkg-query -W
+    does. Packages without a Source field are their own source package.
+    """
+    packages = {}  # type: Dict[str, InstalledPackage]
+    fields = {}  # type: Dict[str, str]
+
+    def add_package():
+        status_words = fields.get("Status", "").split()
+        status = status_words[-1] if status_words else ""
+        name = fields.get("Package")
+        if name and status and status != "not-installed":
+            # Multi-arch packages show up once per architecture
+            if name not in packages or status == "installed":
+                source = fields.get("Source", "").split(" ")[0]
+                packages[name] = InstalledPackage(
+                    name=name,
+                    source=source or name,
+                    version=fields.get("Version", ""),
+                    status=status,
+                )
+        fields.clear()
+
+    with open(status_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line[0] in (" ", "\t"):
+                continue  # continuation of a multi-line field
+            line = line.strip()
+            if not line:
+                add_package()
+                continue
+            key, sep, value = line.partition(":")
+            if sep and key in ("Package", "Source", "Status", "Version"):
+                fields[key] = value.strip()
+    add_package()
+    return packages
+
+
+def _read_dpkg_status_cache(
+    cache_key: Tuple[int, int]
+) -> Optional[Dict[str, InstalledPackage]]:
+    try:
+        cache = json.loads(system.load_file(DPKG_STATUS_CACHE_PATH))
+        if (cache["mtime"], cache["size"]) != cache_key:
+            return None
+        return {pkg[0]: InstalledPackage(*pkg) for pkg in cache["packages"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_dpkg_status_cache(
+    cache_key: Tuple[int, int], packages: Dict[str, InstalledPackage]
+) -> None:
+    content = json.dumps(
+        {
+            "mtime": cache_key[0],
+            "size": cache_key[1],
+            "packages": [list(pkg) for pkg in packages.values()],
+        }
+    )
+    try:
+        os.makedirs(os.path.dirname(DPKG_STATUS_CACHE_PATH), exist_ok=True)
+        system.write_file(DPKG_STATUS_CACHE_PATH, content)
+    except OSError as e:
+        logging.debug("Unable to write dpkg status cache: %s", e)
+
+
+@lru_cache(maxsize=1)
+def _get_dpkg_status_index(
+    status_path: str, mtime: int, size: int
+) -> Dict[str, InstalledPackage]:
+    cache_key = (mtime, size)
+    packages = _read_dpkg_status_cache(cache_key)
+    if packages is None:
+        packages = _parse_dpkg_status(status_path)
+        _write_dpkg_status_cache(cache_key, packages)
+    return packages
+
+
+def get_dpkg_status_index() -> Dict[str, InstalledPackage]:
+    """Return the packages known to dpkg, keyed by binary package name.
+
+    The dpkg status file is only parsed again when its mtime or size change.
+    The parsed index is kept in memory and in DPKG_STATUS_CACHE_PATH so
+    other pro processes can reuse it.
+    """
+    try:
+        stat = os.stat(DPKG_STATUS_PATH)
+    except OSError:
+        return {}
+    return _get_dpkg_status_index(
+        DPKG_STATUS_PATH, stat.st_mtime_ns, stat.st_size
+    )
+
+
 def is_installed(pkg: str) -> bool:
-    return pkg in get_installed_packages()
+    return pkg in get_dpkg_status_index()
 
 
 def get_installed_packages() -> List[str]:
-    out, _ = system.subp(["dpkg-query", "-W", "--showformat=${Package}\\n"])
-    return out.splitlines()
+    return list(get_dpkg_status_index())
 
 
 def setup_apt_proxy(
@@ -577,17 +821,226 @@ def setup_unauthenticated_repo(
     )
 
 
+def _order(char: str) -> int:
+    """Return the dpkg sort weight of a non-digit version character."""
+    if char.isdigit():
+        return 0
+    if char == "~":
+        return -1
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+
+def _compare_version_part(part1: str, part2: str) -> int:
+    """Compare upstream or revision strings following dpkg's verrevcmp."""
+    i = j = 0
+    while i < len(part1) or j < len(part2):
+        first_diff = 0
+        while (i < len(part1) and not part1[i].isdigit()) or (
+            j < len(part2) and not part2[j].isdigit()
+        ):
+            order1 = _order(part1[i]) if i < len(part1) else 0
+            order2 = _order(part2[j]) if j < len(part2) else 0
+            if order1 != order2:
+                return order1 - order2
+            i += 1
+            j += 1
+        while i < len(part1) and part1[i] == "0":
+            i += 1
+        while j < len(part2) and part2[j] == "0":
+            j += 1
+        while (
+            i < len(part1)
+            and part1[i].isdigit()
+            and j < len(part2)
+            and part2[j].isdigit()
+        ):
+            if not first_diff:
+                first_diff = ord(part1[i]) - ord(part2[j])
+            i += 1
+            j += 1
+        if i < len(part1) and part1[i].isdigit():
+            return 1
+        if j < len(part2) and part2[j].isdigit():
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def _version_part_key(part: str) -> Tuple[Tuple[str, int], ...]:
+    """Return a key that is equal for parts _compare_version_part finds equal.
+
+    Parts are split in (non-digits, number) pairs. Numbers ignore leading
+    zeros, a missing one counts as 0, and trailing ("", 0) pairs don't
+    change the ordering.
+    """
+    tokens = re.split(r"(\d+)", part)
+    key = [
+        (tokens[i], int(tokens[i + 1]) if i + 1 < len(tokens) else 0)
+        for i in range(0, len(tokens), 2)
+    ]
+    while key and key[-1] == ("", 0):
+        key.pop()
+    return tuple(key)
+
+
+@total_ordering
+class DebianVersion:
+    """A parsed Debian package version, ordered the way dpkg orders them.
+
+    Instances can be used directly as sort keys.
+    """
+
+    __slots__ = ("epoch", "upstream", "revision")
+
+    def __init__(self, epoch: int, upstream: str, revision: str):
+        self.epoch = epoch
+        self.upstream = upstream
+        self.revision = revision
+
+    @classmethod
+    def from_string(cls, version: str) -> "DebianVersion":
+        """Parse a version string as [epoch:]upstream_version[-revision].
+
+        :raise ValueError: when version is not a valid Debian version.
+        """
+        version = version.strip()
+        if not version or " " in version:
+            raise ValueError("Invalid version: '{}'".format(version))
+        epoch = 0
+        if ":" in version:
+            epoch_str, version = version.split(":", 1)
+            if not epoch_str.isdigit():
+                raise ValueError(
+                    "Invalid epoch in version: '{}'".format(epoch_str)
+                )
+            epoch = int(epoch_str)
+        revision = ""
+        if "-" in version:
+            version, revision = version.rsplit("-", 1)
+            if not revision:
+                raise ValueError("Empty revision in version")
+        if not version:
+            raise ValueError("Empty upstream version")
+        return cls(epoch, version, revision)
+
+    def compare(self, other: "DebianVersion") -> int:
+        """Return <0, 0 or >0 if self is lower, equal or greater than other."""
+        if self.epoch != other.epoch:
+            return self.epoch - other.epoch
+        return _compare_version_part(
+            self.upstream, other.upstream
+        ) or _compare_version_part(self.revision, other.revision)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DebianVersion):
+            return NotImplemented
+        return self.compare(other) == 0
+
+    def __lt__(self, other) -> bool:
+        if not isinstance(other, DebianVersion):
+            return NotImplemented
+        return self.compare(other) < 0
+
+    def __hash__(self):
+        # Versions that compare equal must hash equal: "1.0" == "1.0-0"
+        return hash(
+            (
+                self.epoch,
+                _version_part_key(self.upstream),
+                _version_part_key(self.revision),
+            )
+        )
+
+    def __str__(self) -> str:
+        version = self.upstream
+        if self.epoch:
+            version = "{}:{}".format(self.epoch, version)
+        if self.revision:
+            version = "{}-{}".format(version, self.revision)
+        return version
+
+    def __repr__(self) -> str:
+        return "DebianVersion('{}')".format(self)
+
+
+BLANK_VERSIONS = ("", "<unknown>")
+
+
+@lru_cache(maxsize=4096)
+def parse_version(version: str) -> DebianVersion:
+    """Return the DebianVersion for a version string, caching the result."""
+    return DebianVersion.from_string(version)
+
+
+@lru_cache(maxsize=4096)
+def version_compare(version1: str, version2: str) -> int:
+    """Return <0, 0 or >0 if version1 is lower, equal or greater.
+
+    As for dpkg --compare-versions, an empty version or <unknown> is lower
+    than any other version.
+    """
+    blank1 = version1 in BLANK_VERSIONS
+    blank2 = version2 in BLANK_VERSIONS
+    if blank1 or blank2:
+        return blank2 - blank1
+    return parse_version(version1).compare(parse_version(version2))
+
+
+VERSION_RELATIONS = {
+    "lt": lambda result: result < 0,
+    "le": lambda result: result <= 0,
+    "eq": lambda result: result == 0,
+    "ne": lambda result: result != 0,
+    "ge": lambda result: result >= 0,
+    "gt": lambda result: result > 0,
+    "<<": lambda result: result < 0,
+    "<=": lambda result: result <= 0,
+    "=": lambda result: result == 0,
+    ">=": lambda result: result >= 0,
+    ">>": lambda result: result > 0,
+}
+
+
 def compare_versions(version1: str, version2: str, relation: str) -> bool:
-    """Return True comparing version1 to version2 with the given relation."""
+    """Return True comparing version1 to version2 with the given relation.
+
+    Versions are compared in-process with the same ordering rules as
+    `dpkg --compare-versions`. Invalid versions never satisfy a relation.
+    """
     try:
-        system.subp(
-            ["dpkg", "--compare-versions", version1, relation, version2]
-        )
-        return True
-    except exceptions.ProcessExecutionError:
+        relation_check = VERSION_RELATIONS[relation]
+    except KeyError:
+        raise ValueError("Invalid version relation: '{}'".format(relation))
+    try:
+        return relation_check(version_compare(version1, version2))
+    except ValueError:
         return False
 
 
+def get_apt_config_fingerprint() -> List[Any]:
+    """Return the fingerprints of the apt sources and preferences.
+
+    Directories are fingerprinted along with every file in them, so adding,
+    removing or editing any source or preference file changes the result.
+    """
+    fingerprint = []  # type: List[Any]
+    for path in APT_SOURCES_PATHS + APT_PREFERENCES_PATHS:
+        fingerprint.append([path, system.get_file_fingerprint(path)])
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            continue  # Not a directory, or missing
+        for name in names:
+            file_path = os.path.join(path, name)
+            fingerprint.append(
+                [file_path, system.get_file_fingerprint(file_path)]
+            )
+    return fingerprint
+
+
 def get_apt_cache_time() -> Optional[float]:
     cache_time = None
     if os.path.exists(APT_UPDATE_SUCCESS_STAMP_PATH):
@@ -25,13 +25,14 @@ from uaclient import (
     entitlements,
     event_logger,
     exceptions,
+    http_pool,
     lock,
     messages,
     security,
     security_status,
 )
 from uaclient import status as ua_status
-from uaclient import util, version
+from uaclient import system, util, version
 from uaclient.api.api import call_api
 from uaclient.apt import AptProxyScope, setup_apt_proxy
 from uaclient.data_types import AttachActionsConfigFile, IncorrectTypeError
@@ -427,7 +428,11 @@ def attach_parser(parser):
 def fix_parser(parser):
     """Build or extend an arg parser for fix subcommand."""
     parser.usage = USAGE_TMPL.format(
-        name=NAME, command="fix <CVE-yyyy-nnnn+>|<USN-nnnn-d+>"
+        name=NAME,
+        command=(
+            "fix <CVE-yyyy-nnnn+>|<USN-nnnn-d+>...|--file FILE|--plan FILE"
+            "|--scan"
+        ),
     )
     parser.prog = "fix"
     parser.description = (
@@ -437,9 +442,24 @@ def fix_parser(parser):
     parser._optionals.title = "Flags"
     parser.add_argument(
         "security_issue",
+        nargs="*",
+        help=(
+            "Security vulnerability IDs to inspect and resolve on this"
+            " system. Format: CVE-yyyy-nnnn, CVE-yyyy-nnnnnnn or USN-nnnn-dd"
+        ),
+    )
+    parser.add_argument(
+        "--file",
+        help=(
+            "Also fix the security vulnerability IDs listed in this file,"
+            " separated by whitespace. Lines starting with # are ignored."
+        ),
+    )
+    parser.add_argument(
+        "--plan",
         help=(
-            "Security vulnerability ID to inspect and resolve on this system."
-            " Format: CVE-yyyy-nnnn, CVE-yyyy-nnnnnnn or USN-nnnn-dd"
+            "Apply the fix plans in this file, as printed by --dry-run"
+            " --format json, without inspecting the issues again."
         ),
     )
     parser.add_argument(
@@ -451,6 +471,24 @@ def fix_parser(parser):
             " command."
         ),
     )
+    parser.add_argument(
+        "--scan",
+        action="store_true",
+        help=(
+            "Check every installed package against all USNs for this"
+            " release and report the affected ones, without fixing them."
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        action="store",
+        choices=["cli", "json"],
+        default="cli",
+        help=(
+            "output the fix in the specified format (default: cli). With"
+            " --dry-run, json prints the plan of the fix"
+        ),
+    )
 
     return parser
 
@@ -479,8 +517,11 @@ def security_status_parser(parser):
 
     parser.add_argument(
         "--format",
-        help=("Format for the output (json or yaml)"),
-        choices=("json", "yaml"),
+        help=(
+            "Format for the output (json, yaml or ndjson). ndjson prints one"
+            " package per line as it is found and the summary last"
+        ),
+        choices=("json", "yaml", "ndjson"),
         required=True,
     )
     return parser
@@ -493,27 +534,30 @@ def refresh_parser(parser):
         "Refresh existing Ubuntu Pro contract and update services."
     )
     parser.usage = USAGE_TMPL.format(
-        name=NAME, command="refresh [contract|config|messages]"
+        name=NAME, command="refresh [contract|config|messages|security]"
     )
 
     parser._optionals.title = "Flags"
     parser.formatter_class = argparse.RawDescriptionHelpFormatter
     parser.description = textwrap.dedent(
         """\
-        Refresh three distinct Ubuntu Pro related artifacts in the system:
+        Refresh distinct Ubuntu Pro related artifacts in the system:
 
         * contract: Update contract details from the server.
         * config:   Reload the config file.
         * messages: Update APT and MOTD messages related to UA.
+        * security: Download security notices used by `pro fix` to a local
+                    database.
 
-        You can individually target any of the three specific actions,
+        You can individually target any of the specific actions,
         by passing it's target to nome to the command.  If no `target`
-        is specified, all targets are refreshed.
+        is specified, the contract, config and messages targets are
+        refreshed.
         """
     )
     parser.add_argument(
         "target",
-        choices=["contract", "config", "messages"],
+        choices=["contract", "config", "messages", "security"],
         nargs="?",
         default=None,
         help="Target to refresh.",
@@ -521,10 +565,49 @@ def refresh_parser(parser):
     return parser
 
 
+def _print_security_status_json(cfg):
+    """Print the security status as one JSON document.
+
+    Package updates are encoded one at a time, instead of serializing the
+    whole document at once. The summary comes first, so nothing is printed
+    before every installed package is classified.
+    """
+    summary, packages = security_status.get_security_status(cfg)
+    sys.stdout.write(
+        '{{"_schema_version": {}, "summary": {}, "packages": ['.format(
+            json.dumps(security_status.SECURITY_STATUS_SCHEMA_VERSION),
+            json.dumps(summary),
+        )
+    )
+    for i, package in enumerate(packages):
+        sys.stdout.write((", " if i else "") + json.dumps(package))
+    print("]}")
+
+
+def _print_security_status_ndjson(cfg):
+    """Print the security status as newline-delimited JSON.
+
+    Every package update is printed on its own line as soon as it is found
+    while walking the apt cache. The last line holds the schema version and
+    the summary, which is only known once every package is classified.
+    """
+    for kind, record in security_status.iter_security_status(cfg):
+        if kind == "summary":
+            record = {
+                "_schema_version": (
+                    security_status.SECURITY_STATUS_SCHEMA_VERSION
+                ),
+                "summary": record,
+            }
+        print(json.dumps(record), flush=True)
+
+
 def action_security_status(args, *, cfg, **kwargs):
     # For now, --format is mandatory so no need to check for it here.
     if args.format == "json":
-        print(json.dumps(security_status.security_status(cfg)))
+        _print_security_status_json(cfg)
+    elif args.format == "ndjson":
+        _print_security_status_ndjson(cfg)
     else:
         print(
             yaml.safe_dump(
@@ -534,19 +617,98 @@ def action_security_status(args, *, cfg, **kwargs):
     return 0
 
 
+def _read_security_issues_file(path: str) -> List[str]:
+    try:
+        content = system.load_file(path)
+    except (OSError, UnicodeDecodeError) as e:
+        raise exceptions.UserFacingError(
+            messages.SECURITY_FIX_FILE_READ_ERROR.format(
+                file=path, error=str(e)
+            )
+        )
+    issues = []
+    for line in content.splitlines():
+        if not line.strip().startswith("#"):
+            issues.extend(line.split())
+    return issues
+
+
+def _read_fix_plans_file(path: str) -> List[security.FixPlan]:
+    try:
+        plans = json.loads(system.load_file(path))
+    except (OSError, ValueError) as e:
+        raise exceptions.UserFacingError(
+            messages.SECURITY_FIX_PLAN_READ_ERROR.format(
+                file=path, error=str(e)
+            )
+        )
+    if not isinstance(plans, list):
+        raise exceptions.UserFacingError(
+            messages.SECURITY_FIX_PLAN_READ_ERROR.format(
+                file=path, error="expected a list of fix plans"
+            )
+        )
+    return [security.FixPlan.from_dict(plan) for plan in plans]
+
+
 def action_fix(args, *, cfg, **kwargs):
-    if not re.match(security.CVE_OR_USN_REGEX, args.security_issue):
-        msg = (
-            'Error: issue "{}" is not recognized.\n'
-            'Usage: "pro fix CVE-yyyy-nnnn" or "pro fix USN-nnnn"'
-        ).format(args.security_issue)
-        raise exceptions.UserFacingError(msg)
-
-    fix_status = security.fix_security_issue_id(
-        cfg=cfg,
-        issue_id=args.security_issue,
-        dry_run=args.dry_run,
-    )
+    if args.plan:
+        if (
+            args.security_issue
+            or args.file
+            or args.scan
+            or args.format == "json"
+        ):
+            raise exceptions.UserFacingError(
+                messages.SECURITY_FIX_PLAN_WITH_ISSUE
+            )
+        plans = _read_fix_plans_file(args.plan)
+        return security.apply_fix_plans(
+            cfg=cfg, plans=plans, dry_run=args.dry_run
+        ).value
+    security_issues = list(args.security_issue)
+    if args.file:
+        security_issues += _read_security_issues_file(args.file)
+    if args.format == "json" and (args.scan or not args.dry_run):
+        raise exceptions.UserFacingError(messages.SECURITY_FIX_JSON_DRY_RUN)
+    if args.scan:
+        if security_issues:
+            raise exceptions.UserFacingError(
+                messages.SECURITY_SCAN_WITH_ISSUE.format(
+                    issue_id=", ".join(security_issues)
+                )
+            )
+        return security.scan_security_issues(cfg=cfg).value
+    if not security_issues:
+        raise exceptions.UserFacingError(messages.SECURITY_FIX_MISSING_ISSUE)
+    for security_issue in security_issues:
+        if not re.match(security.CVE_OR_USN_REGEX, security_issue):
+            msg = (
+                'Error: issue "{}" is not recognized.\n'
+                'Usage: "pro fix CVE-yyyy-nnnn" or "pro fix USN-nnnn"'
+            ).format(security_issue)
+            raise exceptions.UserFacingError(msg)
+
+    if args.format == "json":
+        plans = security.plan_security_issues_fix(
+            cfg=cfg, issue_ids=security_issues
+        )
+        print(json.dumps([plan.to_dict() for plan in plans], sort_keys=True))
+        return security.get_worst_fix_status(
+            plan.expected_status for plan in plans
+        ).value
+    if len(security_issues) == 1:
+        fix_status = security.fix_security_issue_id(
+            cfg=cfg,
+            issue_id=security_issues[0],
+            dry_run=args.dry_run,
+        )
+    else:
+        fix_status = security.fix_security_issue_ids(
+            cfg=cfg,
+            issue_ids=security_issues,
+            dry_run=args.dry_run,
+        )
     return fix_status.value
 
 
@@ -800,6 +962,7 @@ def _perform_disable(entitlement, cfg, *, assume_yes, update_status=True):
         event.service_processed(entitlement.name)
 
     if update_status:
+        ua_status.invalidate_status_cache(cfg)
         ua_status.status(cfg=cfg)  # Update the status cache
 
     return ret
@@ -1124,6 +1287,7 @@ def action_enable(args, *, cfg, **kwargs):
     entitlements_found, entitlements_not_found = get_valid_entitlement_names(
         names, cfg
     )
+    actions.prefetch_resource_machine_access(cfg, entitlements_found)
     ret = True
     for ent_name in entitlements_found:
         try:
@@ -1134,6 +1298,7 @@ def action_enable(args, *, cfg, **kwargs):
                 allow_beta=args.beta,
                 access_only=args.access_only,
             )
+            ua_status.invalidate_status_cache(cfg)
             ua_status.status(cfg=cfg)  # Update the status cache
 
             if (
@@ -1332,6 +1497,7 @@ def action_attach(args, *, cfg):
             found, not_found = get_valid_entitlement_names(
                 enable_services_override, cfg
             )
+            actions.prefetch_resource_machine_access(cfg, found)
             for name in found:
                 ent_ret, reason = actions.enable_entitlement_by_name(
                     cfg, name, assume_yes=True, allow_beta=True
@@ -1577,6 +1743,16 @@ def _action_refresh_messages(_args, cfg: config.UAConfig):
         print(messages.REFRESH_MESSAGES_SUCCESS)
 
 
+def _action_refresh_security(_args, cfg: config.UAConfig):
+    try:
+        num_notices = security.update_security_db(cfg)
+    except exceptions.UrlError as exc:
+        with util.disable_log_to_console():
+            logging.exception(exc)
+        raise exceptions.UserFacingError(messages.REFRESH_SECURITY_FAILURE)
+    print(messages.REFRESH_SECURITY_SUCCESS.format(count=num_notices))
+
+
 @assert_root
 @assert_lock_file("pro refresh")
 def action_refresh(args, *, cfg: config.UAConfig):
@@ -1590,6 +1766,9 @@ def action_refresh(args, *, cfg: config.UAConfig):
     if args.target is None or args.target == "messages":
         _action_refresh_messages(args, cfg)
 
+    if args.target == "security":
+        _action_refresh_security(args, cfg)
+
     return 0
 
 
@@ -1793,6 +1972,9 @@ def main(sys_argv=None):
     http_proxy = cfg.http_proxy
     https_proxy = cfg.https_proxy
     util.configure_web_proxy(http_proxy=http_proxy, https_proxy=https_proxy)
+    http_pool.configure_pool(
+        size=cfg.http_pool_size, idle_timeout=cfg.http_pool_idle_timeout
+    )
 
     log_level = cfg.log_level
     console_level = logging.DEBUG if args.debug else logging.INFO
@@ -13,6 +13,7 @@ from uaclient import (
     event_logger,
     exceptions,
     files,
+    http_pool,
     messages,
     snap,
     system,
@@ -86,9 +87,11 @@ class UAConfig:
     data_paths = {
         "instance-id": DataPath("instance-id", True, False),
         "machine-access-cis": DataPath("machine-access-cis.json", True, False),
+        "contract-check": DataPath("contract-check.json", True, False),
         "lock": DataPath("lock", True, False),
         "status-cache": DataPath("status.json", False, False),
         "notices": DataPath("notices.json", False, False),
+        "security-status": DataPath("security-status.json", False, False),
         "marker-reboot-cmds": DataPath(
             "marker-reboot-cmds-required", False, False
         ),
@@ -275,6 +278,48 @@ class UAConfig:
         self.cfg["ua_config"]["metering_timer"] = value
         self.write_cfg()
 
+    @property
+    def contract_check_interval(self) -> int:
+        """Minimum seconds between two contract change checks in status."""
+        return self.cfg.get("ua_config", {}).get(
+            "contract_check_interval", 3600
+        )
+
+    @contract_check_interval.setter
+    def contract_check_interval(self, value: int):
+        if "ua_config" not in self.cfg:
+            self.cfg["ua_config"] = {}
+        self.cfg["ua_config"]["contract_check_interval"] = value
+        self.write_cfg()
+
+    @property
+    def http_pool_size(self) -> int:
+        """Idle connections kept open per host between HTTP requests."""
+        return self.cfg.get("ua_config", {}).get(
+            "http_pool_size", http_pool.HTTP_POOL_SIZE
+        )
+
+    @http_pool_size.setter
+    def http_pool_size(self, value: int):
+        if "ua_config" not in self.cfg:
+            self.cfg["ua_config"] = {}
+        self.cfg["ua_config"]["http_pool_size"] = value
+        self.write_cfg()
+
+    @property
+    def http_pool_idle_timeout(self) -> int:
+        """Seconds an idle HTTP connection is kept open for reuse."""
+        return self.cfg.get("ua_config", {}).get(
+            "http_pool_idle_timeout", http_pool.HTTP_POOL_IDLE_TIMEOUT
+        )
+
+    @http_pool_idle_timeout.setter
+    def http_pool_idle_timeout(self, value: int):
+        if "ua_config" not in self.cfg:
+            self.cfg["ua_config"] = {}
+        self.cfg["ua_config"]["http_pool_idle_timeout"] = value
+        self.write_cfg()
+
     @property
     def poll_for_pro_license(self) -> bool:
         # TODO: when polling is supported
@@ -30,6 +30,66 @@ def _subp():
         yield original
 
 
+@pytest.yield_fixture(scope="session", autouse=True)
+def _dpkg_status():
+    """
+    A fixture that points the dpkg status file and its cache to paths that
+    don't exist for all tests, so the packages installed on the host running
+    the tests are never seen.
+    """
+    with mock.patch(
+        "uaclient.apt.DPKG_STATUS_PATH", "/nonexistent/dpkg/status"
+    ):
+        with mock.patch(
+            "uaclient.apt.DPKG_STATUS_CACHE_PATH",
+            "/nonexistent/dpkg-status.json",
+        ):
+            yield
+
+
+@pytest.yield_fixture(scope="session")
+def _livepatch_status_cache_path(tmpdir_factory):
+    path = tmpdir_factory.mktemp("livepatch").join("livepatch-status.json")
+    with mock.patch(
+        "uaclient.livepatch.LIVEPATCH_STATUS_CACHE_PATH", path.strpath
+    ):
+        yield path
+
+
+@pytest.yield_fixture(autouse=True)
+def _livepatch_status(_livepatch_status_cache_path):
+    """
+    A fixture that drops the livepatch status snapshot between tests and
+    keeps it off the disk of the host running the tests.
+    """
+    with mock.patch("uaclient.livepatch._status", None):
+        yield
+    if _livepatch_status_cache_path.exists():
+        _livepatch_status_cache_path.remove()
+
+
+@pytest.yield_fixture(autouse=True)
+def _resource_machine_access():
+    """
+    A fixture that drops the resource machine access contexts requested by
+    previous tests.
+    """
+    with mock.patch("uaclient.contract._resource_machine_access", {}):
+        yield
+
+
+@pytest.yield_fixture(autouse=True)
+def _apt_policy():
+    """
+    A fixture that drops the parsed apt-cache policy between tests.
+    """
+    with mock.patch("uaclient.apt._apt_policy", None):
+        yield
+    from uaclient.apt import get_apt_cache_policy
+
+    get_apt_cache_policy.cache_clear()
+
+
 @pytest.yield_fixture(scope="session", autouse=True)
 def _warn_about_new_version():
     """
@@ -1,6 +1,17 @@
+import hashlib
+import json
 import logging
 import socket
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from uaclient import (
     clouds,
@@ -30,14 +41,26 @@ API_V1_CONTRACT_INFORMATION = "/v1/contract"
 API_V1_MAGIC_ATTACH = "/v1/magic-attach"
 
 OVERRIDE_SELECTOR_WEIGHTS = {"series_overrides": 1, "series": 2, "cloud": 3}
+RESOURCE_MACHINE_ACCESS_MAX_WORKERS = 8
+CONTRACT_DELTAS_MAX_WORKERS = 4
 
 event = event_logger.get_event_logger()
 
+# Resource machine access contexts requested by this process, keyed by
+# machine token and resource name
+_resource_machine_access = {}  # type: Dict[Tuple[str, str], Dict[str, Any]]
+_resource_machine_access_lock = threading.Lock()
+
 
 class UAContractClient(serviceclient.UAServiceClient):
 
     cfg_url_base_attr = "contract_url"
     api_error_cls = exceptions.ContractAPIError
+    cache_ttls = {
+        API_V1_RESOURCES: 60 * 60,
+        # Always revalidated so contract changes are seen right away
+        "/v1/contracts/": 0,
+    }
 
     @util.retry(socket.timeout, retry_sleeps=[1, 2, 2])
     def request_contract_machine_attach(self, contract_token, machine_id=None):
@@ -333,7 +356,15 @@ class UAContractClient(serviceclient.UAServiceClient):
         if headers.get("expires"):
             response["expires"] = headers["expires"]
         if not detach:
-            self.cfg.machine_token_file.write(response)
+            if _get_machine_token_hash(response) == _read_machine_token_hash(
+                self.cfg
+            ):
+                # Only the expiry changes, the public file is still valid
+                self.cfg.machine_token_file.write_expires(
+                    response.get("expires")
+                )
+            else:
+                self.cfg.machine_token_file.write(response)
             system.get_machine_id.cache_clear()
             machine_id = response.get("machineTokenInfo", {}).get(
                 "machineId", data.get("machineId")
@@ -415,21 +446,23 @@ def process_entitlements_delta(
 
     # We need to sort our entitlements because some of them
     # depend on other service to be enable first.
-    for name in entitlements_enable_order(cfg):
-        try:
-            new_entitlement = new_entitlements[name]
-        except KeyError:
-            continue
-
-        try:
-            deltas, service_enabled = process_entitlement_delta(
-                cfg=cfg,
-                orig_access=past_entitlements.get(name, {}),
-                new_access=new_entitlement,
-                allow_enable=allow_enable,
-                series_overrides=series_overrides,
-            )
-        except exceptions.UserFacingError:
+    names = [
+        name
+        for name in entitlements_enable_order(cfg)
+        if name in new_entitlements
+    ]
+    results = _process_entitlement_deltas_concurrently(
+        cfg=cfg,
+        names=names,
+        past_entitlements=past_entitlements,
+        new_entitlements=new_entitlements,
+        allow_enable=allow_enable,
+        series_overrides=series_overrides,
+    )
+    for name in names:
+        new_entitlement = new_entitlements[name]
+        exc = results[name].exception()
+        if isinstance(exc, exceptions.UserFacingError):
             delta_error = True
             event.service_failed(name)
             with util.disable_log_to_console():
@@ -437,17 +470,19 @@ def process_entitlements_delta(
                     "Failed to process contract delta for {name}:"
                     " {delta}".format(name=name, delta=new_entitlement)
                 )
-        except Exception:
+        elif exc is not None:
             unexpected_error = True
             event.service_failed(name)
             with util.disable_log_to_console():
-                logging.exception(
+                logging.error(
                     "Unexpected error processing contract delta for {name}:"
-                    " {delta}".format(name=name, delta=new_entitlement)
+                    " {delta}".format(name=name, delta=new_entitlement),
+                    exc_info=exc,
                 )
         else:
             # If we have any deltas to process and we were able to process
             # them, then we will mark that service as successfully enabled
+            deltas, service_enabled = results[name].result()
             if service_enabled and deltas:
                 event.service_processed(name)
     if unexpected_error:
@@ -462,6 +497,97 @@ def process_entitlements_delta(
         )
 
 
+def _get_delta_dependencies(
+    cfg: UAConfig, names: List[str]
+) -> Dict[str, Set[str]]:
+    """Return the services each service delta must be processed after.
+
+    Services that require, depend on or are incompatible with each other are
+    processed in the order of names. Unrelated services do not wait for each
+    other.
+    """
+    from uaclient.entitlements import entitlement_factory
+
+    position = {name: index for index, name in enumerate(names)}
+    dependencies = {name: set() for name in names}  # type: Dict[str, Set[str]]
+    for name in names:
+        try:
+            ent = entitlement_factory(cfg=cfg, name=name)(cfg=cfg)
+        except exceptions.EntitlementNotFoundError:
+            continue
+        related = [
+            ent_cls.name
+            for ent_cls in ent.required_services + ent.dependent_services
+        ]
+        related += [
+            service.entitlement.name for service in ent.incompatible_services
+        ]
+        for other in related:
+            if other in position and other != name:
+                first, last = sorted((name, other), key=position.__getitem__)
+                dependencies[last].add(first)
+    return dependencies
+
+
+def _process_entitlement_deltas_concurrently(
+    cfg: UAConfig,
+    names: List[str],
+    past_entitlements: Dict[str, Any],
+    new_entitlements: Dict[str, Any],
+    allow_enable: bool,
+    series_overrides: bool,
+) -> Dict[str, "Future[Tuple[Dict[str, Any], bool]]"]:
+    """Process the deltas of names, each once the related ones are done.
+
+    apt and dpkg operations of different services still run one at a time,
+    see apt.APT_LOCK. The output of each service is kept until the services
+    before it in names are done, so it is printed in that order.
+
+    :return: the finished future of each service, holding the result of
+        process_entitlement_delta or the exception it raised.
+    """
+    if not names:
+        return {}
+
+    outputs = {
+        name: [] for name in names
+    }  # type: Dict[str, event_logger.InfoMessages]
+
+    def process(name: str) -> Tuple[Dict[str, Any], bool]:
+        with event.capture_info(outputs[name]):
+            deltas, service_enabled = process_entitlement_delta(
+                cfg=cfg,
+                orig_access=past_entitlements.get(name, {}),
+                new_access=new_entitlements[name],
+                allow_enable=allow_enable,
+                series_overrides=series_overrides,
+            )
+        return deltas, service_enabled
+
+    waiting = _get_delta_dependencies(cfg, names)
+    running = {}  # type: Dict[Future, str]
+    results = {}  # type: Dict[str, Future]
+    printed = 0
+    with ThreadPoolExecutor(
+        max_workers=min(CONTRACT_DELTAS_MAX_WORKERS, len(names))
+    ) as executor:
+        while waiting or running:
+            for name in names:
+                if name in waiting and not waiting[name]:
+                    del waiting[name]
+                    running[executor.submit(process, name)] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future
+                for dependencies in waiting.values():
+                    dependencies.discard(name)
+            while printed < len(names) and names[printed] in results:
+                event.print_info(outputs.pop(names[printed]))
+                printed += 1
+    return results
+
+
 def process_entitlement_delta(
     cfg: UAConfig,
     orig_access: Dict[str, Any],
@@ -566,6 +692,8 @@ def request_updated_contract(
     """Request contract refresh from ua-contracts service.
 
     Compare original token to new token and react to entitlement deltas.
+    When only the expiry of the token changed, the token is neither rewritten
+    nor parsed for entitlements.
 
     :param cfg: Instance of UAConfig for this machine.
     :param contract_token: String contraining an optional contract token.
@@ -578,7 +706,6 @@ def request_updated_contract(
     :raise UrlError: On failure to contact the server
     """
     orig_token = cfg.machine_token
-    orig_entitlements = cfg.machine_token_file.entitlements
     if orig_token and contract_token:
         msg = messages.UNEXPECTED_CONTRACT_TOKEN_ON_ATTACHED_MACHINE
         raise exceptions.UserFacingError(msg=msg.msg, msg_code=msg.name)
@@ -607,12 +734,21 @@ def request_updated_contract(
                 msg=messages.CONNECTIVITY_ERROR.msg,
                 msg_code=messages.CONNECTIVITY_ERROR.name,
             )
+        orig_entitlements = {}  # type: Dict[str, Any]
     else:
+        orig_token_hash = _read_machine_token_hash(cfg)
         machine_token = orig_token["machineToken"]
         contract_id = orig_token["machineTokenInfo"]["contractInfo"]["id"]
-        contract_client.request_machine_token_update(
+        new_token = contract_client.request_machine_token_update(
             machine_token=machine_token, contract_id=contract_id
         )
+        if orig_token_hash == _get_machine_token_hash(new_token):
+            # Same entitlements, there are no deltas to process
+            logging.debug("Machine token is unchanged, no deltas to process")
+            return
+        orig_entitlements = cfg.machine_token_file.get_entitlements_from_token(
+            orig_token
+        )
 
     process_entitlements_delta(
         cfg,
@@ -635,9 +771,143 @@ def get_contract_information(cfg: UAConfig, token: str) -> Dict[str, Any]:
     return client.request_contract_information(token)
 
 
+def get_resource_machine_access(
+    cfg: UAConfig, machine_token: str, resource: str
+) -> Dict[str, Any]:
+    """Return the machine access context of a resource.
+
+    The context is requested once per process and reused afterwards, so
+    contexts fetched by prefetch_resource_machine_access are not requested
+    again when each service is enabled.
+    """
+    key = (machine_token, resource)
+    with _resource_machine_access_lock:
+        resource_access = _resource_machine_access.get(key)
+    if resource_access is None:
+        client = UAContractClient(cfg)
+        resource_access = client.request_resource_machine_access(
+            machine_token, resource
+        )
+        with _resource_machine_access_lock:
+            _resource_machine_access[key] = resource_access
+    return resource_access
+
+
+def prefetch_resource_machine_access(
+    cfg: UAConfig, resources: List[str]
+) -> None:
+    """Request the machine access contexts of resources concurrently.
+
+    Failures of any kind are only logged: each service requests its context
+    again when it is enabled, and reports the error then.
+    """
+    if len(set(resources)) < 2 or not cfg.is_attached:
+        return  # Nothing to gain from concurrency
+    machine_token = cfg.machine_token["machineToken"]
+    with _resource_machine_access_lock:
+        missing = [
+            resource
+            for resource in sorted(set(resources))
+            if (machine_token, resource) not in _resource_machine_access
+        ]
+    if len(missing) < 2:
+        return
+    system.get_machine_id(cfg)  # Read once, before the requests start
+
+    def prefetch(resource: str) -> None:
+        try:
+            get_resource_machine_access(cfg, machine_token, resource)
+        except Exception as e:
+            logging.debug(
+                "Unable to prefetch machine access to %s: %r", resource, e
+            )
+
+    with ThreadPoolExecutor(
+        max_workers=min(RESOURCE_MACHINE_ACCESS_MAX_WORKERS, len(missing))
+    ) as executor:
+        list(executor.map(prefetch, missing))
+
+
+def _get_json_hash(content: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            content, sort_keys=True, cls=util.DatetimeAwareJSONEncoder
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _get_machine_token_hash(machine_token: Dict[str, Any]) -> str:
+    """Return the hash of machine_token as it is written on disk.
+
+    The expires value comes from the headers of each refresh response, it
+    does not make the token change.
+    """
+    content = json.loads(
+        json.dumps(machine_token, cls=util.DatetimeAwareJSONEncoder)
+    )
+    content.pop("expires", None)
+    return _get_json_hash(content)
+
+
+def _read_machine_token_hash(cfg: UAConfig) -> Optional[str]:
+    """Return the hash of the stored machine token, None if unreadable."""
+    content = cfg.machine_token_file.private_file.read()
+    if not content:
+        return None
+    try:
+        return _get_machine_token_hash(json.loads(content))
+    except (ValueError, AttributeError):
+        return None
+
+
+def _parse_expires(expires: Any) -> Optional[float]:
+    """Return the timestamp of an HTTP Expires header, None if invalid."""
+    try:
+        return parsedate_to_datetime(expires).timestamp()
+    except (TypeError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _read_contract_check_cache(cfg: UAConfig) -> Optional[Dict[str, Any]]:
+    cache = cfg.read_cache("contract-check", silent=True)
+    if not isinstance(cache, dict):
+        return None
+    return cache
+
+
+def _write_contract_check_cache(cfg: UAConfig, cache: Dict[str, Any]) -> None:
+    try:
+        cfg.write_cache("contract-check", cache)
+    except OSError as e:
+        logging.debug("Unable to write contract check cache: %s", e)
+
+
 def is_contract_changed(cfg: UAConfig) -> bool:
+    """Return True when the contract server has a newer contract.
+
+    The server is contacted at most once per cfg.contract_check_interval,
+    or later when its Expires header says so. The answer is kept in the
+    contract-check cache until then, or until the machine token
+    changes. The request is conditional, and a contract that did not
+    change since the last check is not compared again.
+    """
     orig_token = cfg.machine_token
-    orig_entitlements = cfg.machine_token_file.entitlements
+    token_hash = _get_json_hash(orig_token)
+    now = time.time()
+    cache = _read_contract_check_cache(cfg)
+    if cache and cache.get("machine_token") == token_hash:
+        try:
+            if (
+                float(cache["checked_at"])
+                <= now
+                < float(cache["next_check_at"])
+            ):
+                return bool(cache["changed"])
+        except (KeyError, TypeError, ValueError):
+            pass
+    else:
+        cache = None
+
     machine_token = orig_token.get("machineToken", "")
     contract_id = (
         orig_token.get("machineTokenInfo", {})
@@ -648,6 +918,31 @@ def is_contract_changed(cfg: UAConfig) -> bool:
     resp = contract_client.get_updated_contract_info(
         machine_token, contract_id
     )
+    contract_hash = _get_json_hash(resp)
+    if cache and cache.get("contract") == contract_hash:
+        changed = bool(cache.get("changed"))
+    else:
+        changed = _is_contract_changed(cfg, resp)
+
+    next_check_at = now + cfg.contract_check_interval
+    expires_at = _parse_expires(resp.get("expires"))
+    if expires_at is not None and expires_at > next_check_at:
+        next_check_at = expires_at
+    _write_contract_check_cache(
+        cfg,
+        {
+            "machine_token": token_hash,
+            "contract": contract_hash,
+            "changed": changed,
+            "checked_at": now,
+            "next_check_at": next_check_at,
+        },
+    )
+    return changed
+
+
+def _is_contract_changed(cfg: UAConfig, resp: Dict[str, Any]) -> bool:
+    orig_entitlements = cfg.machine_token_file.entitlements
     resp_expiry = (
         resp.get("machineTokenInfo", {})
         .get("contractInfo", {})
@@ -14,6 +14,8 @@ DEFAULT_PRIVATE_MACHINE_TOKEN_PATH = (
     DEFAULT_DATA_DIR + PRIVATE_SUBDIR + "/" + MACHINE_TOKEN_FILE
 )
 CANDIDATE_CACHE_PATH = UAC_TMP_PATH + "candidate-version"
+DPKG_STATUS_CACHE_PATH = DEFAULT_DATA_DIR + "/dpkg-status.json"
+LIVEPATCH_STATUS_CACHE_PATH = DEFAULT_DATA_DIR + "/livepatch-status.json"
 DEFAULT_CONFIG_FILE = UAC_ETC_PATH + "uaclient.conf"
 DEFAULT_HELP_FILE = UAC_ETC_PATH + "help_data.yaml"
 DEFAULT_UPGRADE_CONTRACT_FLAG_FILE = UAC_ETC_PATH + "request-update-contract"
@@ -61,6 +61,11 @@ class UAEntitlement(metaclass=abc.ABCMeta):
     # List of services that depend on this service
     _dependent_services = ()  # type: Tuple[Type[UAEntitlement], ...]
 
+    # What the status checks of this service read besides the machine
+    # token. Cached statuses are checked again when those inputs change,
+    # see uaclient.status for the available inputs.
+    status_inputs = ()  # type: Tuple[str, ...]
+
     @property
     @abc.abstractmethod
     def name(self) -> str:
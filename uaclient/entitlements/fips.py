@@ -80,6 +80,7 @@ class FIPSCommonEntitlement(repo.RepoEntitlement):
     repo_pin_priority = 1001
     repo_key_file = "ubuntu-advantage-fips.gpg"  # Same for fips & fips-updates
     FIPS_PROC_FILE = "/proc/sys/crypto/fips_enabled"
+    status_inputs = ("apt", "fips", "reboot_required")
 
     # RELEASE_BLOCKER GH: #104, don't prompt for conf differences in FIPS
     # Review this fix to see if we want more general functionality for all
@@ -391,6 +392,7 @@ class FIPSCommonEntitlement(repo.RepoEntitlement):
 
         return False
 
+    @apt.serialize_apt_changes
     def setup_apt_config(self, silent: bool = False) -> None:
         """Setup apt config based on the resourceToken and directives.
 
@@ -6,6 +6,7 @@ from uaclient import (
     apt,
     event_logger,
     exceptions,
+    livepatch,
     messages,
     snap,
     system,
@@ -13,9 +14,9 @@ from uaclient import (
 )
 from uaclient.entitlements.base import IncompatibleService, UAEntitlement
 from uaclient.entitlements.entitlement_status import ApplicationStatus
+from uaclient.livepatch import LIVEPATCH_CMD
 from uaclient.types import StaticAffordance
 
-LIVEPATCH_RETRIES = [0.5, 1.0]
 HTTP_PROXY_OPTION = "http-proxy"
 HTTPS_PROXY_OPTION = "https-proxy"
 
@@ -24,8 +25,6 @@ ERROR_MSG_MAP = {
     "unsupported kernel": "Your running kernel is not supported by Livepatch.",
 }
 
-LIVEPATCH_CMD = "/snap/bin/canonical-livepatch"
-
 event = event_logger.get_event_logger()
 
 
@@ -105,6 +104,7 @@ class LivepatchEntitlement(UAEntitlement):
     name = "livepatch"
     title = "Livepatch"
     description = "Canonical Livepatch service"
+    status_inputs = ("livepatch",)  # type: Tuple[str, ...]
 
     @property
     def incompatible_services(self) -> Tuple[IncompatibleService, ...]:
@@ -251,6 +251,8 @@ class LivepatchEntitlement(UAEntitlement):
                 except exceptions.ProcessExecutionError as e:
                     logging.error(str(e))
                     return False
+                finally:
+                    livepatch.invalidate_status()
             try:
                 system.subp(
                     [LIVEPATCH_CMD, "enable", livepatch_token], capture=True
@@ -265,6 +267,8 @@ class LivepatchEntitlement(UAEntitlement):
                     msg += str(e)
                 event.info(msg)
                 return False
+            finally:
+                livepatch.invalidate_status()
             event.info("Canonical livepatch enabled.")
         return True
 
@@ -275,29 +279,29 @@ class LivepatchEntitlement(UAEntitlement):
         """
         if not system.which(LIVEPATCH_CMD):
             return True
-        system.subp([LIVEPATCH_CMD, "disable"], capture=True)
+        try:
+            system.subp([LIVEPATCH_CMD, "disable"], capture=True)
+        finally:
+            livepatch.invalidate_status()
         return True
 
     def application_status(
         self,
     ) -> Tuple[ApplicationStatus, Optional[messages.NamedMessage]]:
-        status = (ApplicationStatus.ENABLED, None)
-
         if not system.which(LIVEPATCH_CMD):
             return (ApplicationStatus.DISABLED, messages.LIVEPATCH_NOT_ENABLED)
 
-        try:
-            system.subp(
-                [LIVEPATCH_CMD, "status"], retry_sleeps=LIVEPATCH_RETRIES
-            )
-        except exceptions.ProcessExecutionError as e:
+        livepatch_status = livepatch.get_status()
+        if not livepatch_status.enabled:
             # TODO(May want to parse INACTIVE/failure assessment)
-            logging.debug("Livepatch not enabled. %s", str(e))
+            logging.debug("Livepatch not enabled. %s", livepatch_status.error)
             return (
                 ApplicationStatus.DISABLED,
-                messages.NamedMessage(name="", msg=str(e)),
+                messages.NamedMessage(
+                    name="", msg=livepatch_status.error or ""
+                ),
             )
-        return status
+        return (ApplicationStatus.ENABLED, None)
 
     def process_contract_deltas(
         self,
@@ -2,7 +2,6 @@ import abc
 import copy
 import logging
 import os
-import re
 from typing import Any, Dict, List, Optional, Tuple, Union  # noqa: F401
 
 from uaclient import (
@@ -17,7 +16,7 @@ from uaclient import (
 from uaclient.entitlements import base
 from uaclient.entitlements.entitlement_status import ApplicationStatus
 
-APT_DISABLED_PIN = "-32768"
+APT_DISABLED_PIN = -32768
 
 event = event_logger.get_event_logger()
 
@@ -26,6 +25,7 @@ class RepoEntitlement(base.UAEntitlement):
 
     repo_list_file_tmpl = "/etc/apt/sources.list.d/ubuntu-{name}.list"
     repo_pref_file_tmpl = "/etc/apt/preferences.d/ubuntu-{name}"
+    status_inputs = ("apt",)  # type: Tuple[str, ...]
 
     # The repo Origin value for setting pinning
     origin = None  # type: Optional[str]
@@ -62,6 +62,24 @@ class RepoEntitlement(base.UAEntitlement):
 
         return packages
 
+    @property
+    def needs_resource_machine_access(self) -> bool:
+        """Whether the resource token must be requested on enable.
+
+        Services that are not enableByDefault need to obtain specific
+        resource access for tokens. It is requested by every enable command
+        because it is not refreshed by `pro refresh`.
+        """
+        resource_cfg = self.cfg.machine_token_file.entitlements.get(
+            self.name, {}
+        )
+        obligations = resource_cfg.get("entitlement", {}).get(
+            "obligations", {}
+        )
+        return not resource_cfg.get("resourceToken") and not obligations.get(
+            "enableByDefault"
+        )
+
     def _check_for_reboot(self) -> bool:
         """Check if system needs to be rebooted."""
         reboot_required = system.should_reboot(
@@ -97,6 +115,7 @@ class RepoEntitlement(base.UAEntitlement):
             self._check_for_reboot_msg(operation="install")
         return True
 
+    @apt.serialize_apt_changes
     def _perform_disable(self, silent=False):
         if hasattr(self, "remove_packages"):
             self.remove_packages()
@@ -122,14 +141,9 @@ class RepoEntitlement(base.UAEntitlement):
                 ApplicationStatus.DISABLED,
                 messages.NO_APT_URL_FOR_SERVICE.format(title=self.title),
             )
-        protocol, repo_path = repo_url.split("://")
-        policy = apt.get_apt_cache_policy(
-            error_msg=messages.APT_POLICY_FAILED.msg
-        )
-        match = re.search(
-            r"(?P<pin>(-)?\d+) {}/ubuntu".format(repo_url), policy
-        )
-        if match and match.group("pin") != APT_DISABLED_PIN:
+        policy = apt.get_apt_policy(error_msg=messages.APT_POLICY_FAILED.msg)
+        sources = policy.get_sources("{}/ubuntu".format(repo_url))
+        if sources and sources[0].pin != APT_DISABLED_PIN:
             return (
                 ApplicationStatus.ENABLED,
                 messages.SERVICE_IS_ACTIVE.format(title=self.title),
@@ -226,6 +240,7 @@ class RepoEntitlement(base.UAEntitlement):
 
         return True
 
+    @apt.serialize_apt_changes
     def install_packages(
         self,
         package_list: List[str] = None,
@@ -277,6 +292,7 @@ class RepoEntitlement(base.UAEntitlement):
                 self._cleanup()
             raise
 
+    @apt.serialize_apt_changes
     def setup_apt_config(self, silent: bool = False) -> None:
         """Setup apt config based on the resourceToken and directives.
         Also sets up apt proxy if necessary.
@@ -318,17 +334,12 @@ class RepoEntitlement(base.UAEntitlement):
         repo_filename = self.repo_list_file_tmpl.format(name=self.name)
         resource_cfg = self.cfg.machine_token_file.entitlements.get(self.name)
         directives = resource_cfg["entitlement"].get("directives", {})
-        obligations = resource_cfg["entitlement"].get("obligations", {})
         token = resource_cfg.get("resourceToken")
         if not token:
             machine_token = self.cfg.machine_token["machineToken"]
-            if not obligations.get("enableByDefault"):
-                # services that are not enableByDefault need to obtain specific
-                # resource access for tokens. We want to refresh this every
-                # enable call because it is not refreshed by `pro refresh`.
-                client = contract.UAContractClient(self.cfg)
-                machine_access = client.request_resource_machine_access(
-                    machine_token, self.name
+            if self.needs_resource_machine_access:
+                machine_access = contract.get_resource_machine_access(
+                    self.cfg, machine_token, self.name
                 )
                 if machine_access:
                     token = machine_access.get("resourceToken")
@@ -409,6 +420,7 @@ class RepoEntitlement(base.UAEntitlement):
             self.remove_apt_config(run_apt_update=False)
             raise
 
+    @apt.serialize_apt_changes
     def remove_apt_config(
         self, run_apt_update: bool = True, silent: bool = False
     ):
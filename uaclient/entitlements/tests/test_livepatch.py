@@ -832,6 +832,7 @@ class TestLivepatchEntitlementEnable:
         assert m_livepatch_proxy.call_count == 1
 
     @mock.patch("uaclient.system.get_platform_info")
+    @mock.patch("uaclient.apt.get_installed_packages", return_value=["snapd"])
     @mock.patch("uaclient.system.subp", return_value=("snapd", ""))
     @mock.patch("uaclient.contract.apply_contract_overrides")
     @mock.patch(
@@ -848,6 +849,7 @@ class TestLivepatchEntitlementEnable:
         m_which,
         _m_contract_overrides,
         m_subp,
+        _m_get_installed_packages,
         _m_get_platform_info,
         m_livepatch_proxy,
         m_snap_proxy,
@@ -1167,6 +1169,7 @@ class TestLivepatchApplicationStatus:
         self, m_subp, m_which, subp_raise_exception, which_result, entitlement
     ):
         m_which.return_value = which_result
+        m_subp.return_value = ("{}", "")
 
         if subp_raise_exception:
             m_subp.side_effect = exceptions.ProcessExecutionError("error msg")
@@ -9,10 +9,22 @@ those events in real time or through a machine-readable format.
 import enum
 import json
 import sys
-from typing import Any, Dict, List, Optional, Set, Union  # noqa: F401
+import threading
+from contextlib import contextmanager
+from typing import (  # noqa: F401
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 JSON_SCHEMA_VERSION = "0.1"
 EventFieldErrorType = Optional[Union[str, Dict[str, str]]]
+InfoMessages = List[Tuple[str, Any, Optional[str]]]
 _event_logger = None
 
 
@@ -70,6 +82,7 @@ class EventLogger:
         # By default, the event logger will be on CLI mode,
         # printing every event it receives.
         self._event_logger_mode = EventLoggerMode.CLI
+        self._thread_state = threading.local()
 
     def reset(self):
         """Reset the state of the event logger attributes."""
@@ -113,7 +126,29 @@ class EventLogger:
             file_type = sys.stdout
 
         if self._event_logger_mode == EventLoggerMode.CLI:
-            print(info_msg, file=file_type, end=end)
+            captured = getattr(self._thread_state, "info_messages", None)
+            if captured is not None:
+                captured.append((info_msg, file_type, end))
+            else:
+                print(info_msg, file=file_type, end=end)
+
+    @contextmanager
+    def capture_info(self, info_messages: InfoMessages) -> Iterator[None]:
+        """Keep the info messages of the current thread in info_messages.
+
+        Used by work running concurrently, so its output can be printed
+        later, in a deterministic order, with print_info.
+        """
+        self._thread_state.info_messages = info_messages
+        try:
+            yield
+        finally:
+            self._thread_state.info_messages = None
+
+    def print_info(self, info_messages: InfoMessages):
+        """Print info messages kept by capture_info."""
+        for info_msg, file_type, end in info_messages:
+            self.info(info_msg, file_type=file_type, end=end)
 
     def _record_dict_event(
         self,
@@ -2,6 +2,7 @@ import json
 import logging
 import os
 import re
+import threading
 from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, Generic, Optional, Type, TypeVar
@@ -163,6 +164,24 @@ class MachineTokenFile:
         else:
             raise exceptions.NonRootUserError()
 
+    def write_expires(self, expires: Optional[str]):
+        """Update the expires value of the private machine_token file.
+
+        The public file does not hold it, so it is left untouched, and
+        nothing is written when the value is the same.
+        """
+        if not self.is_root:
+            raise exceptions.NonRootUserError()
+        try:
+            content = json.loads(self.private_file.read() or "")
+        except ValueError:
+            return
+        if not isinstance(content, dict) or content.get("expires") == expires:
+            return
+        content["expires"] = expires
+        self.private_file.write(json.dumps(content))
+        self._machine_token = None
+
     def delete(self):
         """Delete both pub and private files"""
         if self.is_root:
@@ -354,6 +373,10 @@ class MachineTokenFile:
 
 
 class NoticeFile:
+    # notices.json is read and written back, services enabled at the same
+    # time must not lose each other's notices
+    _lock = threading.Lock()
+
     def __init__(
         self,
         directory: str = defaults.DEFAULT_DATA_DIR,
@@ -369,11 +392,12 @@ class NoticeFile:
         Raises a NonRootUserError if the user is not root.
         """
         if self.is_root:
-            notices = self.read() or []
-            notice = [label, description]
-            if notice not in notices:
-                notices.append(notice)
-                self.write(notices)
+            with self._lock:
+                notices = self.read() or []
+                notice = [label, description]
+                if notice not in notices:
+                    notices.append(notice)
+                    self.write(notices)
         else:
             raise exceptions.NonRootUserError
 
@@ -393,18 +417,19 @@ class NoticeFile:
         Raises a NonRootUserError if the user is not root.
         """
         if self.is_root:
-            notices = []
-            cached_notices = self.read() or []
-            if cached_notices:
-                for notice_label, notice_descr in cached_notices:
-                    if re.match(label_regex, notice_label):
-                        if re.match(descr_regex, notice_descr):
-                            continue
-                    notices.append((notice_label, notice_descr))
-            if notices:
-                self.write(notices)
-            elif os.path.exists(self.file.path):
-                self.file.delete()
+            with self._lock:
+                notices = []
+                cached_notices = self.read() or []
+                if cached_notices:
+                    for notice_label, notice_descr in cached_notices:
+                        if re.match(label_regex, notice_label):
+                            if re.match(descr_regex, notice_descr):
+                                continue
+                        notices.append((notice_label, notice_descr))
+                if notices:
+                    self.write(notices)
+                elif os.path.exists(self.file.path):
+                    self.file.delete()
         else:
             raise exceptions.NonRootUserError
 
@@ -0,0 +1,186 @@
+"""
+On-disk cache of GET responses made by UAServiceClient.
+
+Entries are stored one JSON file per request, keyed by a hash of the full
+URL (including the query string) and the Authorization header, so cached
+responses are never shared between different credentials. Stale entries
+that carry an ETag or Last-Modified header are revalidated with a
+conditional request instead of being fetched again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from http.client import HTTPMessage
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+from uaclient import system
+from uaclient.defaults import ROOT_READABLE_MODE
+
+HTTP_CACHE_SUBDIR = "http-cache"
+HTTP_CACHE_MAX_SIZE = 10 * 1024 * 1024  # bytes
+HTTP_CACHE_VALIDATOR_HEADERS = (
+    ("etag", "If-None-Match"),
+    ("last-modified", "If-Modified-Since"),
+)
+
+LOG = logging.getLogger(__name__)
+
+
+def get_user_cache_dir() -> str:
+    """Return the HTTP cache directory used by non-root users."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "ubuntu-pro", HTTP_CACHE_SUBDIR)
+
+
+class CachedResponse:
+    """A response body and headers read back from the HTTP cache."""
+
+    def __init__(self, path: str, entry: Dict[str, Any]):
+        self.path = path
+        self.entry = entry
+
+    @property
+    def content(self) -> Any:
+        return self.entry["content"]
+
+    @property
+    def headers(self) -> HTTPMessage:
+        headers = HTTPMessage()
+        for name, value in self.entry["headers"]:
+            headers[name] = value
+        return headers
+
+    def is_fresh(self, ttl: int) -> bool:
+        return time.time() - self.entry["stored_at"] < ttl
+
+    def validator_headers(self) -> Dict[str, str]:
+        """Return the conditional request headers for this response."""
+        headers = {}
+        for name, value in self.entry["headers"]:
+            for header, request_header in HTTP_CACHE_VALIDATOR_HEADERS:
+                if name.lower() == header:
+                    headers[request_header] = value
+        return headers
+
+
+class HTTPResponseCache:
+    """Size-bounded store of HTTP responses, evicting the least recently
+    used entries first."""
+
+    def __init__(self, directory: str, max_size: int = HTTP_CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _entry_path(self, url: str, headers: Mapping[str, str]) -> str:
+        key = url
+        for name, value in headers.items():
+            if name.lower() == "authorization":
+                key += "\n" + value
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def get(
+        self, url: str, headers: Mapping[str, str]
+    ) -> Optional[CachedResponse]:
+        """Return the cached response for a request, None when missing."""
+        path = self._entry_path(url, headers)
+        try:
+            entry = json.loads(system.load_file(path))
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        return CachedResponse(path, entry)
+
+    def put(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        content: Any,
+        response_headers: Union[HTTPMessage, Mapping[str, str]],
+    ) -> None:
+        """Store the response of a request, evicting old entries if needed."""
+        entry = {
+            "url": url,
+            "stored_at": time.time(),
+            "content": content,
+            "headers": [
+                [name, value] for name, value in response_headers.items()
+            ],
+        }
+        try:
+            serialized = json.dumps(entry)
+        except (TypeError, ValueError):
+            LOG.debug("Not caching unserializable response from %s", url)
+            return
+        if len(serialized) > self.max_size:
+            return
+        path = self._entry_path(url, headers)
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            system.write_file(path, serialized, mode=ROOT_READABLE_MODE)
+        except OSError as e:
+            LOG.debug("Unable to write HTTP cache entry %s: %s", path, e)
+            return
+        self._evict()
+
+    def touch(self, cached: CachedResponse) -> None:
+        """Mark a revalidated response as fresh again."""
+        cached.entry["stored_at"] = time.time()
+        try:
+            system.write_file(
+                cached.path, json.dumps(cached.entry), mode=ROOT_READABLE_MODE
+            )
+        except OSError as e:
+            LOG.debug(
+                "Unable to update HTTP cache entry %s: %s", cached.path, e
+            )
+
+    def invalidate(self, url_prefix: str) -> None:
+        """Remove cached responses of every URL starting with url_prefix."""
+        for path, _stat in self._entries():
+            try:
+                entry = json.loads(system.load_file(path))
+            except (OSError, ValueError):
+                continue
+            if entry.get("url", "").startswith(url_prefix):
+                self._remove(path)
+
+    def _entries(self) -> Tuple[Tuple[str, os.stat_result], ...]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return ()
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((path, os.stat(path)))
+            except OSError:
+                continue
+        return tuple(entries)
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total_size = sum(stat.st_size for _path, stat in entries)
+        for path, stat in entries:
+            if total_size <= self.max_size:
+                break
+            LOG.debug("Evicting HTTP cache entry %s", path)
+            self._remove(path)
+            total_size -= stat.st_size
@@ -0,0 +1,215 @@
+"""
+Persistent HTTP connections shared by every readurl call.
+
+urllib opens a new connection, and so a new TLS session, for each request.
+The handlers below keep a connection open once its response has been read
+and reuse it for the next request to the same host through the same proxy.
+At most HTTP_POOL_SIZE idle connections are kept per host, and idle
+connections are closed after HTTP_POOL_IDLE_TIMEOUT seconds.
+"""
+
+import http.client
+import logging
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa: F401
+from urllib import error, request
+
+HTTP_POOL_SIZE = 4
+HTTP_POOL_IDLE_TIMEOUT = 30  # seconds
+# Requests sent again when a reused connection fails after sending them
+HTTP_RETRY_METHODS = ("GET", "HEAD")
+
+LOG = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str, Optional[str], Optional[str]]
+IdleConnections = List[Tuple[float, http.client.HTTPConnection]]
+
+
+class _PooledHTTPResponse(http.client.HTTPResponse):
+    """HTTP response handing its connection back to the pool once read."""
+
+    _on_close = None  # type: Optional[Callable[[bool], None]]
+    _discard = False
+
+    def close(self):
+        if self.fp is not None:
+            # The body was not read to the end, the connection is unusable
+            self._discard = True
+        super().close()
+
+    def _close_conn(self):
+        super()._close_conn()  # type: ignore
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            complete = self.chunked or self.length == 0
+            on_close(complete and not self.will_close and not self._discard)
+
+
+class HTTPConnectionPool:
+    """Idle HTTP connections, keyed by host and proxy."""
+
+    def __init__(
+        self,
+        size: int = HTTP_POOL_SIZE,
+        idle_timeout: int = HTTP_POOL_IDLE_TIMEOUT,
+    ):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = {}  # type: Dict[PoolKey, IdleConnections]
+        self._lock = threading.Lock()
+
+    def acquire(self, key: PoolKey) -> Optional[http.client.HTTPConnection]:
+        """Return an idle connection for key, None if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                released_at, conn = idle.pop()
+                if conn.sock is not None and (
+                    now - released_at < self.idle_timeout
+                ):
+                    return conn
+                conn.close()
+        return None
+
+    def release(
+        self, key: PoolKey, conn: http.client.HTTPConnection, reusable: bool
+    ) -> None:
+        """Keep conn for a later request to key, or close it."""
+        if reusable and conn.sock is not None:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.size:
+                    idle.append((time.monotonic(), conn))
+                    return
+        conn.close()
+
+    def clear(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            for idle in self._idle.values():
+                for _released_at, conn in idle:
+                    conn.close()
+            self._idle = {}
+
+
+_pool = HTTPConnectionPool()
+_proxies = None  # type: Optional[Dict[str, str]]
+_opener = None  # type: Optional[request.OpenerDirector]
+_opener_lock = threading.Lock()
+
+
+def _open(
+    http_class: Any, req: request.Request, **http_conn_args: Any
+) -> http.client.HTTPResponse:
+    host = req.host
+    if not host:
+        raise error.URLError("no host given")
+    tunnel_host = getattr(req, "_tunnel_host", None)
+    headers = dict(req.unredirected_hdrs)
+    headers.update(
+        (name, value)
+        for name, value in req.headers.items()
+        if name not in headers
+    )
+    headers = {name.title(): value for name, value in headers.items()}
+    tunnel_headers = {}
+    if tunnel_host and "Proxy-Authorization" in headers:
+        tunnel_headers["Proxy-Authorization"] = headers.pop(
+            "Proxy-Authorization"
+        )
+    key = (
+        http_class.__name__,
+        host,
+        tunnel_host,
+        tunnel_headers.get("Proxy-Authorization"),
+    )  # type: PoolKey
+    while True:
+        conn = _pool.acquire(key)
+        reused = conn is not None
+        if conn is None:
+            conn = http_class(host, timeout=req.timeout, **http_conn_args)
+            conn.response_class = _PooledHTTPResponse
+            if tunnel_host:
+                conn.set_tunnel(tunnel_host, headers=tunnel_headers)
+        elif req.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:  # type: ignore
+            conn.timeout = req.timeout
+            conn.sock.settimeout(req.timeout)
+        sent = False
+        try:
+            conn.request(req.get_method(), req.selector, req.data, headers)
+            sent = True
+            resp = conn.getresponse()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            conn.close()
+            # The server closed the idle connection. Unless the request
+            # could not be sent, it may have been processed already, so
+            # only requests without side effects are sent again
+            if reused and (not sent or req.get_method() in HTTP_RETRY_METHODS):
+                LOG.debug("Reconnecting to %s: %s", host, e)
+                continue
+            raise error.URLError(e)
+        except OSError as e:
+            conn.close()
+            raise error.URLError(e)
+        except http.client.HTTPException:
+            conn.close()
+            raise
+        break
+
+    def release(reusable: bool, conn: http.client.HTTPConnection = conn):
+        _pool.release(key, conn, reusable)
+
+    resp._on_close = release  # type: ignore
+    resp.url = req.get_full_url()  # type: ignore
+    resp.msg = resp.reason  # type: ignore
+    return resp
+
+
+class _PooledHTTPHandler(request.HTTPHandler):
+    def do_open(self, http_class, req, **http_conn_args):
+        return _open(http_class, req, **http_conn_args)
+
+
+class _PooledHTTPSHandler(request.HTTPSHandler):
+    def do_open(self, http_class, req, **http_conn_args):
+        return _open(http_class, req, **http_conn_args)
+
+
+def _get_opener() -> request.OpenerDirector:
+    global _opener
+    with _opener_lock:
+        if _opener is None:
+            handlers = [
+                _PooledHTTPHandler(),
+                _PooledHTTPSHandler(),
+            ]  # type: List[request.BaseHandler]
+            if _proxies is not None:
+                handlers.append(request.ProxyHandler(_proxies))
+            _opener = request.build_opener(*handlers)
+        return _opener
+
+
+def set_proxies(proxies: Optional[Dict[str, str]]) -> None:
+    """Send requests through proxies, keyed by URL scheme.
+
+    When None, the proxies of the environment are used.
+    """
+    global _opener, _proxies
+    with _opener_lock:
+        _proxies = proxies
+        _opener = None
+    _pool.clear()
+
+
+def configure_pool(size: int, idle_timeout: int) -> None:
+    """Set how many idle connections are kept per host, and for how long."""
+    _pool.size = size
+    _pool.idle_timeout = idle_timeout
+
+
+def urlopen(req: request.Request, timeout: Optional[int] = None) -> Any:
+    """Open req like urllib.request.urlopen, reusing pooled connections."""
+    return _get_opener().open(req, timeout=timeout)
@@ -0,0 +1,134 @@
+"""
+Snapshot of the state reported by canonical-livepatch.
+
+canonical-livepatch status is slow to run, so its result is shared by every
+caller in the process and kept on disk for a short while, letting
+back-to-back pro commands reuse it.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+from uaclient import exceptions, system
+from uaclient.defaults import LIVEPATCH_STATUS_CACHE_PATH
+
+LIVEPATCH_CMD = "/snap/bin/canonical-livepatch"
+LIVEPATCH_RETRIES = [0.5, 1.0]
+LIVEPATCH_STATUS_CACHE_TTL = 60  # seconds
+
+LivepatchStatus = NamedTuple(
+    "LivepatchStatus",
+    [
+        ("enabled", bool),
+        ("error", Optional[str]),
+        ("version", Optional[str]),
+        ("fixed_cves", FrozenSet[str]),
+    ],
+)
+
+_status = None  # type: Optional[Tuple[float, LivepatchStatus]]
+_status_lock = threading.Lock()
+
+
+def _is_fresh(fetched_at: float) -> bool:
+    return 0 <= time.time() - fetched_at < LIVEPATCH_STATUS_CACHE_TTL
+
+
+def _parse_status(status_stdout: str) -> Tuple[Optional[str], FrozenSet[str]]:
+    """Return the livepatch version and the lowercase CVEs it patched."""
+    try:
+        livepatch = json.loads(status_stdout)["Status"][0]["Livepatch"]
+        if not livepatch:
+            return None, frozenset()
+        return livepatch.get("Version"), frozenset(
+            fix["Name"].lower()
+            for fix in livepatch.get("Fixes") or []
+            if fix["Patched"]
+        )
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return None, frozenset()
+
+
+def _fetch_status() -> LivepatchStatus:
+    if not system.which(LIVEPATCH_CMD):
+        return LivepatchStatus(
+            enabled=False, error=None, version=None, fixed_cves=frozenset()
+        )
+    try:
+        out, _ = system.subp(
+            [LIVEPATCH_CMD, "status", "--verbose", "--format=json"],
+            retry_sleeps=LIVEPATCH_RETRIES,
+        )
+    except exceptions.ProcessExecutionError as e:
+        return LivepatchStatus(
+            enabled=False, error=str(e), version=None, fixed_cves=frozenset()
+        )
+    version, fixed_cves = _parse_status(out)
+    return LivepatchStatus(
+        enabled=True, error=None, version=version, fixed_cves=fixed_cves
+    )
+
+
+def _read_status_cache() -> Optional[Tuple[float, LivepatchStatus]]:
+    try:
+        cache = json.loads(system.load_file(LIVEPATCH_STATUS_CACHE_PATH))
+        status = LivepatchStatus(
+            enabled=bool(cache["enabled"]),
+            error=cache["error"],
+            version=cache["version"],
+            fixed_cves=frozenset(cache["fixed_cves"]),
+        )
+        return float(cache["fetched_at"]), status
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_status_cache(fetched_at: float, status: LivepatchStatus) -> None:
+    content = json.dumps(
+        {
+            "fetched_at": fetched_at,
+            "enabled": status.enabled,
+            "error": status.error,
+            "version": status.version,
+            "fixed_cves": sorted(status.fixed_cves),
+        }
+    )
+    try:
+        os.makedirs(
+            os.path.dirname(LIVEPATCH_STATUS_CACHE_PATH), exist_ok=True
+        )
+        system.write_file(LIVEPATCH_STATUS_CACHE_PATH, content)
+    except OSError as e:
+        logging.debug("Unable to write livepatch status cache: %s", e)
+
+
+def get_status() -> LivepatchStatus:
+    """Return the state of livepatch on this machine.
+
+    canonical-livepatch status only runs when no snapshot younger than
+    LIVEPATCH_STATUS_CACHE_TTL exists in this process or in
+    LIVEPATCH_STATUS_CACHE_PATH.
+    """
+    global _status
+    with _status_lock:
+        if _status is None or not _is_fresh(_status[0]):
+            _status = _read_status_cache()
+            if _status is None or not _is_fresh(_status[0]):
+                _status = (time.time(), _fetch_status())
+                _write_status_cache(*_status)
+        return _status[1]
+
+
+def invalidate_status() -> None:
+    """Drop the livepatch snapshot, after livepatch is enabled or disabled."""
+    global _status
+    with _status_lock:
+        _status = None
+        try:
+            os.unlink(LIVEPATCH_STATUS_CACHE_PATH)
+        except OSError:
+            pass
@@ -73,6 +73,39 @@ SECURITY_ISSUE_UNAFFECTED = (
 SECURITY_AFFECTED_PKGS = (
     "{count} affected source package{plural_str} installed"
 )
+SECURITY_FIX_MISSING_ISSUE = (
+    "Error: a CVE or USN to fix is required, unless --scan is used.\n"
+    'Usage: "pro fix CVE-yyyy-nnnn", "pro fix USN-nnnn" or "pro fix --scan"'
+)
+SECURITY_FIX_FILE_READ_ERROR = (
+    "Unable to read security issues from {file}: {error}"
+)
+SECURITY_SCAN_WITH_ISSUE = (
+    'Error: "{issue_id}" cannot be fixed while scanning with --scan.'
+)
+SECURITY_FIX_JSON_DRY_RUN = (
+    "Error: the json format of pro fix is only supported with --dry-run."
+)
+SECURITY_FIX_PLAN_READ_ERROR = "Unable to read fix plans from {file}: {error}"
+SECURITY_FIX_PLAN_WITH_ISSUE = (
+    "Error: --plan cannot be used with security issues, --file, --scan"
+    " or --format json."
+)
+SECURITY_SCAN_UPDATING_DB = (
+    "Downloading security notices to the local security database..."
+)
+SECURITY_SCAN_DB_NON_ROOT = (
+    "The local security database is missing or outdated, and only root can"
+    " update it. Run 'sudo pro fix --scan' to update it."
+)
+SECURITY_SCAN_SUMMARY = (
+    "Scanned {pkg_count} installed source packages against {usn_count}"
+    " security notices."
+)
+SECURITY_SCAN_AFFECTED_PKG = "{pkg}: fixed in {version} ({pocket}) {usns}"
+SECURITY_SCAN_NOT_AFFECTED = (
+    OKGREEN_CHECK + " No installed package is affected by a known USN."
+)
 USN_FIXED = "{issue} is addressed."
 CVE_FIXED = "{issue} is resolved."
 CVE_FIXED_BY_LIVEPATCH = (
@@ -185,6 +218,10 @@ REFRESH_MESSAGES_SUCCESS = (
 REFRESH_MESSAGES_FAILURE = (
     "Unable to update Ubuntu Pro related APT and MOTD messages."
 )
+REFRESH_SECURITY_SUCCESS = (
+    "Successfully updated the local security database: {count} new notices."
+)
+REFRESH_SECURITY_FAILURE = "Unable to update the local security database."
 
 UPDATE_CHECK_CONTRACT_FAILURE = (
     """Failed to check for change in machine contract. Reason: {reason}"""
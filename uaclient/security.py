@@ -1,20 +1,47 @@
 import copy
 import enum
-import json
+import logging
 import os
 import socket
 import textwrap
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
-from uaclient import apt, exceptions, messages, serviceclient, system, util
+from uaclient import (
+    apt,
+    exceptions,
+    livepatch,
+    messages,
+    security_db,
+    serviceclient,
+    system,
+    util,
+)
 from uaclient.clouds.identity import (
     CLOUD_TYPE_TO_TITLE,
     PRO_CLOUDS,
     get_cloud_type,
 )
 from uaclient.config import UAConfig
+from uaclient.data_types import (
+    BoolDataValue,
+    DataObject,
+    EnumDataValue,
+    Field,
+    StringDataValue,
+    data_list,
+)
 from uaclient.defaults import BASE_UA_URL, PRINT_WRAP_WIDTH
 from uaclient.entitlements import entitlement_factory
 from uaclient.entitlements.entitlement_status import (
@@ -32,6 +59,9 @@ API_V1_CVE_TMPL = "cves/{cve}.json"
 API_V1_NOTICES = "notices.json"
 API_V1_NOTICE_TMPL = "notices/{notice}.json"
 
+# Default number of concurrent requests made to the Security API
+SECURITY_API_MAX_CONCURRENCY = 4
+
 UBUNTU_STANDARD_UPDATES_POCKET = "Ubuntu standard updates"
 UA_INFRA_POCKET = "Ubuntu Pro: ESM Infra"
 UA_APPS_POCKET = "Ubuntu Pro: ESM Apps"
@@ -49,7 +79,7 @@ ReleasedPackagesInstallResult = NamedTuple(
 
 
 @enum.unique
-class FixStatus(enum.Enum):
+class FixStatus(EnumDataValue):
     """
     An enum to represent the system status after fix operation
     """
@@ -59,11 +89,131 @@ class FixStatus(enum.Enum):
     SYSTEM_VULNERABLE_UNTIL_REBOOT = 2
 
 
+class FixPlanBinaryPackage(DataObject):
+    fields = [
+        Field("name", StringDataValue),
+        Field("installed_version", StringDataValue),
+        Field("fixed_version", StringDataValue, required=False),
+    ]
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        installed_version: str,
+        fixed_version: Optional[str]
+    ):
+        self.name = name
+        self.installed_version = installed_version
+        self.fixed_version = fixed_version
+
+
+class FixPlanSourcePackage(DataObject):
+    fields = [
+        Field("name", StringDataValue),
+        Field("status", StringDataValue),
+        Field("fixed_version", StringDataValue, required=False),
+        Field("pocket", StringDataValue, required=False),
+        Field("binary_packages", data_list(FixPlanBinaryPackage)),
+    ]
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        status: str,
+        fixed_version: Optional[str],
+        pocket: Optional[str],
+        binary_packages: List[FixPlanBinaryPackage]
+    ):
+        self.name = name
+        self.status = status
+        self.fixed_version = fixed_version
+        self.pocket = pocket
+        self.binary_packages = binary_packages
+
+
+class FixPlanUpgrade(DataObject):
+    fields = [
+        Field("pocket", StringDataValue),
+        Field("service", StringDataValue, required=False),
+        Field("binary_packages", data_list(StringDataValue)),
+    ]
+
+    def __init__(
+        self,
+        *,
+        pocket: str,
+        service: Optional[str],
+        binary_packages: List[str]
+    ):
+        self.pocket = pocket
+        self.service = service
+        self.binary_packages = binary_packages
+
+
+class FixPlan(DataObject):
+    """
+    What fixing a security issue takes, as computed by
+    plan_security_issue_fix without changing the system.
+    """
+
+    fields = [
+        Field("issue_id", StringDataValue),
+        Field("expected_status", FixStatus),
+        Field("livepatch_version", StringDataValue, required=False),
+        Field("affected_packages", data_list(FixPlanSourcePackage)),
+        Field("upgrades", data_list(FixPlanUpgrade)),
+        Field("requires_attach", BoolDataValue),
+        Field("services_to_enable", data_list(StringDataValue)),
+        Field("reboot_required", BoolDataValue),
+        Field("error", StringDataValue, required=False),
+    ]
+
+    def __init__(
+        self,
+        *,
+        issue_id: str,
+        expected_status: FixStatus,
+        livepatch_version: Optional[str] = None,
+        affected_packages: Optional[List[FixPlanSourcePackage]] = None,
+        upgrades: Optional[List[FixPlanUpgrade]] = None,
+        requires_attach: bool = False,
+        services_to_enable: Optional[List[str]] = None,
+        reboot_required: bool = False,
+        error: Optional[str] = None
+    ):
+        self.issue_id = issue_id
+        self.expected_status = expected_status
+        self.livepatch_version = livepatch_version
+        self.affected_packages = affected_packages or []
+        self.upgrades = upgrades or []
+        self.requires_attach = requires_attach
+        self.services_to_enable = services_to_enable or []
+        self.reboot_required = reboot_required
+        self.error = error
+
+
 class UASecurityClient(serviceclient.UAServiceClient):
 
     url_timeout = 20
     cfg_url_base_attr = "security_url"
     api_error_cls = exceptions.SecurityAPIError
+    cache_ttls = {
+        API_V1_CVES: 60 * 60,
+        API_V1_NOTICES: 60 * 60,
+        "cves/": 6 * 60 * 60,
+        "notices/": 6 * 60 * 60,
+    }
+
+    _db = None  # type: Optional[security_db.SecurityDB]
+
+    @property
+    def db(self) -> security_db.SecurityDB:
+        """Local security database consulted before the Security API."""
+        if self._db is None:
+            self._db = security_db.SecurityDB(self.cfg.data_dir)
+        return self._db
 
     def _get_query_params(
         self, query_params: Dict[str, Any]
@@ -81,9 +231,26 @@ class UASecurityClient(serviceclient.UAServiceClient):
 
         return extra_security_params
 
+    @property
+    def max_concurrency(self) -> int:
+        """Maximum number of requests made to the Security API at once.
+
+        Configured by the security_api_max_concurrency feature.
+        """
+        max_concurrency = self.cfg.features.get("security_api_max_concurrency")
+        if isinstance(max_concurrency, int) and max_concurrency > 0:
+            return max_concurrency
+        return SECURITY_API_MAX_CONCURRENCY
+
     @util.retry(socket.timeout, retry_sleeps=[1, 3, 5])
     def request_url(
-        self, path, data=None, headers=None, method=None, query_params=None
+        self,
+        path,
+        data=None,
+        headers=None,
+        method=None,
+        query_params=None,
+        use_cache=True,
     ):
         query_params = self._get_query_params(query_params)
         return super().request_url(
@@ -93,6 +260,7 @@ class UASecurityClient(serviceclient.UAServiceClient):
             method=method,
             query_params=query_params,
             potentially_sensitive=False,
+            use_cache=use_cache,
         )
 
     def get_cves(
@@ -130,9 +298,15 @@ class UASecurityClient(serviceclient.UAServiceClient):
 
         @return: CVE instance for JSON response from the Security API.
         """
+        cve_md = self.db.get_cve(
+            cve_id, max_age=security_db.SECURITY_DB_MAX_AGE
+        )
+        if cve_md:
+            return CVE(client=self, response=cve_md)
         cve_response, _headers = self.request_url(
             API_V1_CVE_TMPL.format(cve=cve_id)
         )
+        self.db.refresh_cve(cve_response)
         return CVE(client=self, response=cve_response)
 
     def get_notices(
@@ -142,11 +316,19 @@ class UASecurityClient(serviceclient.UAServiceClient):
         limit: Optional[int] = None,
         offset: Optional[int] = None,
         order: Optional[str] = None,
+        use_cache: bool = True,
     ) -> List["USN"]:
         """Query to match multiple-USNs.
 
+        @param use_cache: False to always request the Security API, so pages
+            of the same listing are consistent with each other.
+
         @return: Sorted list of USN instances based on the the JSON response.
         """
+        if details and not any((release, limit, offset, order)):
+            usns = self._get_notices_from_db(details)
+            if usns is not None:
+                return usns
         query_params = {
             "details": details,
             "release": release,
@@ -155,7 +337,7 @@ class UASecurityClient(serviceclient.UAServiceClient):
             "order": order,
         }
         usns_response, _headers = self.request_url(
-            API_V1_NOTICES, query_params=query_params
+            API_V1_NOTICES, query_params=query_params, use_cache=use_cache
         )
         return sorted(
             [
@@ -171,16 +353,46 @@ class UASecurityClient(serviceclient.UAServiceClient):
 
         @return: USN instance representing the JSON response.
         """
+        notice_md = self.db.get_notice(
+            notice_id, max_age=security_db.SECURITY_DB_MAX_AGE
+        )
+        if notice_md:
+            return USN(client=self, response=notice_md)
         notice_response, _headers = self.request_url(
             API_V1_NOTICE_TMPL.format(notice=notice_id)
         )
+        self.db.refresh_notice(notice_response)
         return USN(client=self, response=notice_response)
 
+    def _get_notices_from_db(self, cve_id: str) -> Optional[List["USN"]]:
+        """Return the USNs fixing cve_id from the local security database.
+
+        @return: Sorted list of USN instances or None when the database
+            does not know all the notices related to the CVE, or was not
+            synced recently.
+        """
+        if self.db.is_outdated:
+            return None
+        notices_ids = self.db.get_notices_ids_for_cve(cve_id)
+        if notices_ids is None:
+            return None
+        usns = []
+        for notice_id in notices_ids:
+            notice_md = self.db.get_notice(
+                notice_id, max_age=security_db.SECURITY_DB_MAX_AGE
+            )
+            if not notice_md:
+                return None
+            usns.append(USN(client=self, response=notice_md))
+        return sorted(usns, key=lambda x: x.id)
+
 
 # Model for Security API responses
 class CVEPackageStatus:
     """Class representing specific CVE PackageStatus on an Ubuntu series"""
 
+    __slots__ = ("response",)
+
     def __init__(self, cve_response: Dict[str, Any]):
         self.response = cve_response
 
@@ -250,6 +462,8 @@ class CVEPackageStatus:
 class CVE:
     """Class representing CVE response from the SecurityClient"""
 
+    __slots__ = ("client", "response", "_notices", "_packages_status")
+
     def __init__(self, client: UASecurityClient, response: Dict[str, Any]):
         self.response = response
         self.client = client
@@ -324,10 +538,27 @@ class CVE:
 class USN:
     """Class representing USN response from the SecurityClient"""
 
+    __slots__ = ("client", "response", "_cves", "_release_packages")
+
     def __init__(self, client: UASecurityClient, response: Dict[str, Any]):
         self.response = response
         self.client = client
 
+    @classmethod
+    def for_series(
+        cls,
+        client: UASecurityClient,
+        response: Dict[str, Any],
+        series: Optional[str] = None,
+    ) -> "USN":
+        """Build a USN keeping only the response data of one series.
+
+        :param series: Defaults to the series of this machine.
+        """
+        if not series:
+            series = system.get_platform_info()["series"]
+        return cls(client, security_db.get_series_notice(response, series))
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, USN):
             return False
@@ -451,26 +682,11 @@ def query_installed_source_pkg_versions() -> Dict[str, Dict[str, str]]:
     The dict keys will be source package name: "krb5". The value will be a dict
     with keys binary_pkg and version.
     """
-    status_field = "${db:Status-Status}"
-    out, _err = system.subp(
-        [
-            "dpkg-query",
-            "-f=${Package},${Source},${Version}," + status_field + "\n",
-            "-W",
-        ]
-    )
     installed_packages = {}  # type: Dict[str, Dict[str, str]]
-    for pkg_line in out.splitlines():
-        pkg_name, source_pkg_name, pkg_version, status = pkg_line.split(",")
-        if not source_pkg_name:
-            # some package don't define the Source
-            source_pkg_name = pkg_name
-        if "installed" not in status:
+    for pkg in apt.get_dpkg_status_index().values():
+        if "installed" not in pkg.status:
             continue
-        if source_pkg_name in installed_packages:
-            installed_packages[source_pkg_name][pkg_name] = pkg_version
-        else:
-            installed_packages[source_pkg_name] = {pkg_name: pkg_version}
+        installed_packages.setdefault(pkg.source, {})[pkg.name] = pkg.version
     return installed_packages
 
 
@@ -523,12 +739,23 @@ def merge_usn_released_binary_package_versions(
     return usn_pkg_versions
 
 
+def update_security_db(cfg: UAConfig) -> int:
+    """Download the security notices for this series to the local database.
+
+    @return: The number of notices stored.
+    """
+    client = UASecurityClient(cfg=cfg)
+    return client.db.sync(client)
+
+
 def get_related_usns(usn, client):
     """For a give usn, get the related USNs for it.
 
     For each CVE associated with the given USN, we capture
     other USNs that are related to the CVE. We consider those
-    USNs related to the original USN.
+    USNs related to the original USN. Related USNs are fetched
+    concurrently, with at most client.max_concurrency requests
+    in flight.
     """
 
     # If the usn does not have any associated cves on it,
@@ -537,69 +764,195 @@ def get_related_usns(usn, client):
     if not usn.cves:
         return [usn]
 
-    related_usns = {}
-    for cve in usn.cves:
-        for related_usn_id in cve.notices_ids:
-            if related_usn_id not in related_usns:
-                related_usns[related_usn_id] = client.get_notice(
-                    notice_id=related_usn_id
+    related_usn_ids = sorted(
+        {
+            related_usn_id
+            for cve in usn.cves
+            for related_usn_id in cve.notices_ids
+        }
+    )
+    if len(related_usn_ids) < 2:
+        related_usns = [
+            client.get_notice(notice_id=related_usn_id)
+            for related_usn_id in related_usn_ids
+        ]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(client.max_concurrency, len(related_usn_ids))
+        ) as executor:
+            related_usns = list(
+                executor.map(
+                    lambda related_usn_id: client.get_notice(
+                        notice_id=related_usn_id
+                    ),
+                    related_usn_ids,
                 )
+            )
 
-    return list(sorted(related_usns.values(), key=lambda x: x.id))
+    return list(sorted(related_usns, key=lambda x: x.id))
 
 
-def fix_security_issue_id(
-    cfg: UAConfig, issue_id: str, dry_run: bool = False
-) -> FixStatus:
-    if dry_run:
-        print(messages.SECURITY_DRY_RUN_WARNING)
+def get_vulnerable_source_packages(
+    client: UASecurityClient,
+    installed_packages: Dict[str, Dict[str, str]],
+    beta_pockets: Dict[str, bool],
+) -> Dict[str, Dict[str, Any]]:
+    """Check the installed packages against every USN in the local database.
 
-    issue_id = issue_id.upper()
+    :param client: UASecurityClient whose local database is scanned.
+    :param installed_packages: Installed binary package versions keyed by
+        source package, as returned by query_installed_source_pkg_versions.
+    :param beta_pockets: Dict keyed on service name: esm-infra, esm-apps
+        which is True for pockets whose fixes should be ignored.
+
+    :return: Dict keyed by affected source package name. Each value has the
+        keys: binary_packages, a dict of binary package name to the
+        (installed version, fixed version) pair, fixed_version, the highest
+        version required, pocket, the pocket source of that version, and
+        usns, the sorted ids of the USNs not yet applied.
+    """
+    usns = {}  # type: Dict[str, Optional[USN]]
+    vulnerable_pkgs = {}  # type: Dict[str, Dict[str, Any]]
+    for src_pkg, binary_pkgs in sorted(installed_packages.items()):
+        for usn_id in client.db.get_notices_ids_for_source_package(src_pkg):
+            if usn_id not in usns:
+                notice = client.db.get_notice(usn_id)
+                usns[usn_id] = (
+                    USN.for_series(client, notice, client.db.series)
+                    if notice
+                    else None
+                )
+            usn = usns[usn_id]
+            if not usn:
+                continue
+            try:
+                released_pkgs = usn.release_packages.get(src_pkg, {})
+            except exceptions.SecurityAPIMetadataError as e:
+                logging.debug("Skipping %s on scan: %s", usn_id, e)
+                usns[usn_id] = None
+                continue
+            for bin_pkg, bin_pkg_md in released_pkgs.items():
+                installed_version = binary_pkgs.get(bin_pkg)
+                if (
+                    not installed_version
+                    or beta_pockets.get(bin_pkg_md.get("pocket", "None"))
+                    or not apt.compare_versions(
+                        installed_version, bin_pkg_md["version"], "lt"
+                    )
+                ):
+                    continue
+                pkg_md = vulnerable_pkgs.setdefault(
+                    src_pkg,
+                    {
+                        "binary_packages": {},
+                        "fixed_version": bin_pkg_md["version"],
+                        "pocket": None,
+                        "usns": set(),
+                    },
+                )
+                pkg_md["usns"].add(usn_id)
+                prev_fixed_version = pkg_md["binary_packages"].get(
+                    bin_pkg, (None, None)
+                )[1]
+                if prev_fixed_version is None or apt.compare_versions(
+                    prev_fixed_version, bin_pkg_md["version"], "lt"
+                ):
+                    pkg_md["binary_packages"][bin_pkg] = (
+                        installed_version,
+                        bin_pkg_md["version"],
+                    )
+                if pkg_md["pocket"] is None or not apt.compare_versions(
+                    bin_pkg_md["version"], pkg_md["fixed_version"], "le"
+                ):
+                    pkg_md["fixed_version"] = bin_pkg_md["version"]
+                    pkg_md["pocket"] = CVEPackageStatus(
+                        {
+                            "description": bin_pkg_md["version"],
+                            "pocket": bin_pkg_md.get("pocket"),
+                        }
+                    ).pocket_source
+    for pkg_md in vulnerable_pkgs.values():
+        pkg_md["usns"] = sorted(pkg_md["usns"])
+    return vulnerable_pkgs
+
+
+def scan_security_issues(cfg: UAConfig) -> FixStatus:
+    """Report every installed package affected by a USN for this series.
+
+    USNs are read from the local security database, which is synced first
+    when it is missing or older than security_db.SECURITY_DB_MAX_AGE. Only
+    root can sync it, other users can scan while it is up to date.
+    """
     client = UASecurityClient(cfg=cfg)
+    if client.db.is_outdated:
+        if os.getuid() != 0:
+            raise exceptions.UserFacingError(
+                messages.SECURITY_SCAN_DB_NON_ROOT
+            )
+        print(messages.SECURITY_SCAN_UPDATING_DB)
+        client.db.sync(client)
     installed_packages = query_installed_source_pkg_versions()
+    beta_pockets = _get_beta_pockets(cfg)
+    vulnerable_pkgs = get_vulnerable_source_packages(
+        client, installed_packages, beta_pockets
+    )
 
-    # Used to filter out beta pockets during merge_usns
-    beta_pockets = {
-        "esm-apps": _is_pocket_used_by_beta_service(UA_APPS_POCKET, cfg),
-        "esm-infra": _is_pocket_used_by_beta_service(UA_INFRA_POCKET, cfg),
-    }
+    print(
+        messages.SECURITY_SCAN_SUMMARY.format(
+            pkg_count=len(installed_packages),
+            usn_count=len(client.db.index["notices"]),
+        )
+    )
+    if not vulnerable_pkgs:
+        print(messages.SECURITY_SCAN_NOT_AFFECTED)
+        return FixStatus.SYSTEM_NON_VULNERABLE
 
-    if "CVE" in issue_id:
-        # Check livepatch status for CVE in fixes before checking CVE api
-        status_stdout = None
-        try:
-            status_stdout, _ = system.subp(
-                [
-                    "canonical-livepatch",
-                    "status",
-                    "--verbose",
-                    "--format=json",
-                ]
+    count = len(vulnerable_pkgs)
+    print(
+        messages.SECURITY_AFFECTED_PKGS.format(
+            count=count, plural_str="s" if count > 1 else ""
+        )
+        + ":"
+    )
+    for src_pkg, pkg_md in sorted(vulnerable_pkgs.items()):
+        print(
+            textwrap.fill(
+                messages.SECURITY_SCAN_AFFECTED_PKG.format(
+                    pkg=src_pkg,
+                    version=pkg_md["fixed_version"],
+                    pocket=pkg_md["pocket"],
+                    usns=", ".join(pkg_md["usns"]),
+                ),
+                width=PRINT_WRAP_WIDTH,
+                subsequent_indent="    ",
             )
-        except exceptions.ProcessExecutionError:
-            pass
-        if status_stdout:
-            try:
-                parsed_patch = json.loads(status_stdout)["Status"][0][
-                    "Livepatch"
-                ]
-
-                if parsed_patch:
-                    fixes = parsed_patch.get("Fixes", [])
-                    if any(
-                        fix["Name"] == issue_id.lower() and fix["Patched"]
-                        for fix in fixes
-                    ):
-                        print(
-                            messages.CVE_FIXED_BY_LIVEPATCH.format(
-                                issue=issue_id,
-                                version=parsed_patch.get("Version", "N/A"),
-                            )
-                        )
-                        return FixStatus.SYSTEM_NON_VULNERABLE
-            except (ValueError, KeyError, IndexError):
-                pass
+        )
+    return FixStatus.SYSTEM_STILL_VULNERABLE
+
+
+def _get_livepatch_fix_version(issue_id: str) -> Optional[str]:
+    """Return the livepatch version patching a CVE, None if unpatched."""
+    livepatch_status = livepatch.get_status()
+    if issue_id.lower() in livepatch_status.fixed_cves:
+        return livepatch_status.version or "N/A"
+    return None
 
+
+def _get_issue_affected_packages(
+    client: UASecurityClient,
+    issue_id: str,
+    installed_packages: Dict[str, Dict[str, str]],
+    beta_pockets: Dict[str, bool],
+    print_header: bool = True,
+) -> Tuple[Dict[str, CVEPackageStatus], Dict[str, Dict[str, Dict[str, str]]]]:
+    """Fetch a CVE or USN and find the installed packages it affects.
+
+    Prints the issue header, unless print_header is False.
+
+    :return: Tuple of the affected source packages status and the binary
+        package versions released by the related USNs.
+    """
+    if "CVE" in issue_id:
         try:
             cve = client.get_cve(cve_id=issue_id)
             usns = client.get_notices(details=issue_id)
@@ -614,7 +967,8 @@ def fix_security_issue_id(
         affected_pkg_status = get_cve_affected_source_packages_status(
             cve=cve, installed_packages=installed_packages
         )
-        print(cve.get_url_header())
+        if print_header:
+            print(cve.get_url_header())
         usn_released_pkgs = merge_usn_released_binary_package_versions(
             usns, beta_pockets
         )
@@ -635,7 +989,8 @@ def fix_security_issue_id(
         usn_released_pkgs = merge_usn_released_binary_package_versions(
             usns, beta_pockets
         )
-        print(usn.get_url_header())
+        if print_header:
+            print(usn.get_url_header())
         if not usn.response["release_packages"]:
             # Since usn.release_packages filters to our current release only
             # check overall metadata and error if empty.
@@ -645,6 +1000,42 @@ def fix_security_issue_id(
                 ),
                 issue_id=issue_id,
             )
+    return affected_pkg_status, usn_released_pkgs
+
+
+def _get_beta_pockets(cfg: UAConfig) -> Dict[str, bool]:
+    """Used to filter out beta pockets during merge_usns."""
+    return {
+        "esm-apps": _is_pocket_used_by_beta_service(UA_APPS_POCKET, cfg),
+        "esm-infra": _is_pocket_used_by_beta_service(UA_INFRA_POCKET, cfg),
+    }
+
+
+def fix_security_issue_id(
+    cfg: UAConfig, issue_id: str, dry_run: bool = False
+) -> FixStatus:
+    if dry_run:
+        print(messages.SECURITY_DRY_RUN_WARNING)
+
+    issue_id = issue_id.upper()
+    client = UASecurityClient(cfg=cfg)
+    installed_packages = query_installed_source_pkg_versions()
+    beta_pockets = _get_beta_pockets(cfg)
+
+    if "CVE" in issue_id:
+        # Check livepatch status for CVE in fixes before checking CVE api
+        livepatch_version = _get_livepatch_fix_version(issue_id)
+        if livepatch_version:
+            print(
+                messages.CVE_FIXED_BY_LIVEPATCH.format(
+                    issue=issue_id, version=livepatch_version
+                )
+            )
+            return FixStatus.SYSTEM_NON_VULNERABLE
+
+    affected_pkg_status, usn_released_pkgs = _get_issue_affected_packages(
+        client, issue_id, installed_packages, beta_pockets
+    )
     return prompt_for_affected_packages(
         cfg=cfg,
         issue_id=issue_id,
@@ -655,6 +1046,367 @@ def fix_security_issue_id(
     )
 
 
+def fix_security_issue_ids(
+    cfg: UAConfig, issue_ids: List[str], dry_run: bool = False
+) -> FixStatus:
+    """Fix many CVEs or USNs at once, with a single package upgrade.
+
+    Every issue is analysed first, sharing the installed packages and
+    livepatch status. The binary packages all issues need are then upgraded
+    by one apt transaction, after checking the services their pockets
+    require, and the result of each issue is reported.
+
+    :return: The worst FixStatus across all issues.
+    """
+    issue_ids = sorted({issue_id.upper() for issue_id in issue_ids})
+    if len(issue_ids) == 1:
+        return fix_security_issue_id(cfg, issue_ids[0], dry_run=dry_run)
+
+    if dry_run:
+        print(messages.SECURITY_DRY_RUN_WARNING)
+
+    client = UASecurityClient(cfg=cfg)
+    installed_packages = query_installed_source_pkg_versions()
+    beta_pockets = _get_beta_pockets(cfg)
+
+    issue_status = {}  # type: Dict[str, FixStatus]
+    issue_plans = {}  # type: Dict[str, Dict[str, Set[str]]]
+    for issue_id in issue_ids:
+        print()
+        if "CVE" in issue_id:
+            livepatch_version = _get_livepatch_fix_version(issue_id)
+            if livepatch_version:
+                print(
+                    messages.CVE_FIXED_BY_LIVEPATCH.format(
+                        issue=issue_id, version=livepatch_version
+                    )
+                )
+                issue_status[issue_id] = FixStatus.SYSTEM_NON_VULNERABLE
+                continue
+        try:
+            (
+                affected_pkg_status,
+                usn_released_pkgs,
+            ) = _get_issue_affected_packages(
+                client, issue_id, installed_packages, beta_pockets
+            )
+            issue_plans[issue_id] = {}
+            issue_status[issue_id] = prompt_for_affected_packages(
+                cfg=cfg,
+                issue_id=issue_id,
+                affected_pkg_status=affected_pkg_status,
+                installed_packages=installed_packages,
+                usn_released_pkgs=usn_released_pkgs,
+                dry_run=dry_run,
+                upgrade_plan=issue_plans[issue_id],
+            )
+        except exceptions.UserFacingError as e:
+            print(e.msg)
+            issue_status[issue_id] = FixStatus.SYSTEM_STILL_VULNERABLE
+            issue_plans.pop(issue_id, None)
+
+    return _upgrade_issues_packages(
+        cfg, issue_ids, issue_plans, issue_status, dry_run
+    )
+
+
+def _upgrade_issues_packages(
+    cfg: UAConfig,
+    issue_ids: List[str],
+    issue_plans: Dict[str, Dict[str, Set[str]]],
+    issue_status: Dict[str, FixStatus],
+    dry_run: bool,
+) -> FixStatus:
+    """Upgrade the packages planned for many issues in one apt transaction.
+
+    :param issue_plans: The binary packages to upgrade for each issue,
+        keyed by pocket.
+    :param issue_status: The status of each issue once its packages are
+        upgraded, updated with the actual outcome.
+
+    :return: The worst FixStatus across all issues.
+    """
+    # Each binary package is upgraded along with the most restrictive
+    # pocket any issue needs it from
+    pockets = (UBUNTU_STANDARD_UPDATES_POCKET, UA_INFRA_POCKET, UA_APPS_POCKET)
+    pkg_pockets = {}  # type: Dict[str, str]
+    for pocket in pockets:
+        for plan in issue_plans.values():
+            for binary_pkg in plan.get(pocket, ()):
+                pkg_pockets[binary_pkg] = pocket
+
+    upgrade_pkgs = set()  # type: Set[str]
+    failed_pockets = set()  # type: Set[str]
+    if pkg_pockets:
+        print()
+        for pocket in pockets:
+            if pocket not in pkg_pockets.values():
+                continue
+            if _check_pocket_requirements(cfg, pocket, dry_run):
+                upgrade_pkgs.update(
+                    pkg
+                    for pkg, pkg_pocket in pkg_pockets.items()
+                    if pkg_pocket == pocket
+                )
+            else:
+                failed_pockets.add(pocket)
+        if upgrade_pkgs:
+            _run_packages_upgrade(sorted(upgrade_pkgs), dry_run)
+
+    reboot_required = bool(upgrade_pkgs) and system.should_reboot(
+        installed_pkgs=upgrade_pkgs
+    )
+    if reboot_required:
+        reboot_msg = messages.ENABLE_REBOOT_REQUIRED_TMPL.format(
+            operation="fix operation"
+        )
+        print(reboot_msg)
+        cfg.notice_file.add("", reboot_msg)
+
+    print()
+    for issue_id in issue_ids:
+        plan = issue_plans.get(issue_id, {})
+        plan_pkgs = {pkg for pkgs in plan.values() for pkg in pkgs}
+        if any(pkg_pockets[pkg] in failed_pockets for pkg in plan_pkgs):
+            issue_status[issue_id] = FixStatus.SYSTEM_STILL_VULNERABLE
+        elif (
+            plan_pkgs
+            and reboot_required
+            and issue_status[issue_id] == FixStatus.SYSTEM_NON_VULNERABLE
+        ):
+            issue_status[issue_id] = FixStatus.SYSTEM_VULNERABLE_UNTIL_REBOOT
+        if issue_status[issue_id] == FixStatus.SYSTEM_NON_VULNERABLE:
+            msg = messages.SECURITY_ISSUE_RESOLVED.format(issue=issue_id)
+        else:
+            msg = messages.SECURITY_ISSUE_NOT_RESOLVED.format(issue=issue_id)
+        print(util.handle_unicode_characters(msg))
+
+    return get_worst_fix_status(issue_status.values())
+
+
+def get_worst_fix_status(fix_statuses: Iterable[FixStatus]) -> FixStatus:
+    """Return the status to report for the fix of many issues."""
+    fix_statuses = set(fix_statuses)
+    if FixStatus.SYSTEM_STILL_VULNERABLE in fix_statuses:
+        return FixStatus.SYSTEM_STILL_VULNERABLE
+    if FixStatus.SYSTEM_VULNERABLE_UNTIL_REBOOT in fix_statuses:
+        return FixStatus.SYSTEM_VULNERABLE_UNTIL_REBOOT
+    return FixStatus.SYSTEM_NON_VULNERABLE
+
+
+def _get_pocket_service_name(pocket: str) -> Optional[str]:
+    if pocket == UA_INFRA_POCKET:
+        return "esm-infra"
+    elif pocket == UA_APPS_POCKET:
+        return "esm-apps"
+    return None
+
+
+def plan_security_issue_fix(
+    cfg: UAConfig,
+    issue_id: str,
+    client: Optional[UASecurityClient] = None,
+    installed_packages: Optional[Dict[str, Dict[str, str]]] = None,
+    beta_pockets: Optional[Dict[str, bool]] = None,
+) -> FixPlan:
+    """Work out what fixing a CVE or USN takes, without fixing it.
+
+    Nothing is printed nor changed on the system, so plans can be computed
+    concurrently and applied later with apply_fix_plans. The optional
+    arguments let callers share the system state between plans, they are
+    looked up when not provided.
+    """
+    issue_id = issue_id.upper()
+    if client is None:
+        client = UASecurityClient(cfg=cfg)
+    if installed_packages is None:
+        installed_packages = query_installed_source_pkg_versions()
+    if beta_pockets is None:
+        beta_pockets = _get_beta_pockets(cfg)
+
+    if "CVE" in issue_id:
+        livepatch_version = _get_livepatch_fix_version(issue_id)
+        if livepatch_version:
+            return FixPlan(
+                issue_id=issue_id,
+                expected_status=FixStatus.SYSTEM_NON_VULNERABLE,
+                livepatch_version=livepatch_version,
+            )
+
+    affected_packages = []  # type: List[FixPlanSourcePackage]
+    pocket_pkgs = defaultdict(set)  # type: Dict[str, Set[str]]
+    try:
+        affected_pkg_status, usn_released_pkgs = _get_issue_affected_packages(
+            client,
+            issue_id,
+            installed_packages,
+            beta_pockets,
+            print_header=False,
+        )
+        pkg_status_groups = group_by_usn_package_status(
+            affected_pkg_status, usn_released_pkgs
+        )
+        for status_value, pkg_status_group in sorted(
+            pkg_status_groups.items()
+        ):
+            released = status_value == "released"
+            for src_pkg, pkg_status in pkg_status_group:
+                usn_released_src = usn_released_pkgs.get(src_pkg, {})
+                binary_packages = []
+                for binary_pkg, version in sorted(
+                    installed_packages[src_pkg].items()
+                ):
+                    fixed_version = None
+                    if released:
+                        if binary_pkg not in usn_released_src:
+                            raise exceptions.SecurityAPIMetadataError(
+                                "{issue} metadata defines no fixed version"
+                                " for {pkg}.".format(
+                                    pkg=binary_pkg, issue=issue_id
+                                ),
+                                issue_id,
+                            )
+                        fixed_version = usn_released_src[binary_pkg]["version"]
+                        if not apt.compare_versions(
+                            fixed_version, version, "le"
+                        ):
+                            pocket_pkgs[pkg_status.pocket_source].add(
+                                binary_pkg
+                            )
+                    binary_packages.append(
+                        FixPlanBinaryPackage(
+                            name=binary_pkg,
+                            installed_version=version,
+                            fixed_version=fixed_version,
+                        )
+                    )
+                affected_packages.append(
+                    FixPlanSourcePackage(
+                        name=src_pkg,
+                        status=status_value,
+                        fixed_version=(
+                            pkg_status.fixed_version if released else None
+                        ),
+                        pocket=pkg_status.pocket_source if released else None,
+                        binary_packages=binary_packages,
+                    )
+                )
+    except exceptions.UserFacingError as e:
+        return FixPlan(
+            issue_id=issue_id,
+            expected_status=FixStatus.SYSTEM_STILL_VULNERABLE,
+            error=e.msg,
+        )
+
+    affected_packages.sort(key=lambda pkg: pkg.name)
+    upgrades = []
+    requires_attach = False
+    services_to_enable = []
+    for pocket in (
+        UBUNTU_STANDARD_UPDATES_POCKET,
+        UA_INFRA_POCKET,
+        UA_APPS_POCKET,
+    ):
+        if pocket not in pocket_pkgs:
+            continue
+        service = _get_pocket_service_name(pocket)
+        upgrades.append(
+            FixPlanUpgrade(
+                pocket=pocket,
+                service=service,
+                binary_packages=sorted(pocket_pkgs[pocket]),
+            )
+        )
+        if service:
+            status_cache = cfg.read_cache("status-cache") or {}
+            if not status_cache.get("attached", False):
+                requires_attach = True
+            ent = _get_service_for_pocket(pocket, cfg)
+            if ent and ent.user_facing_status()[0] != UserFacingStatus.ACTIVE:
+                services_to_enable.append(ent.name)
+
+    # Whether the upgrade itself requires a reboot is only known once it
+    # ran, this tells if one is already pending for the packages it touches
+    upgrade_pkgs = set().union(*pocket_pkgs.values())
+    reboot_required = bool(upgrade_pkgs) and system.should_reboot(
+        installed_pkgs=upgrade_pkgs
+    )
+    if any(pkg.status != "released" for pkg in affected_packages):
+        expected_status = FixStatus.SYSTEM_STILL_VULNERABLE
+    elif reboot_required:
+        expected_status = FixStatus.SYSTEM_VULNERABLE_UNTIL_REBOOT
+    else:
+        expected_status = FixStatus.SYSTEM_NON_VULNERABLE
+
+    return FixPlan(
+        issue_id=issue_id,
+        expected_status=expected_status,
+        affected_packages=affected_packages,
+        upgrades=upgrades,
+        requires_attach=requires_attach,
+        services_to_enable=services_to_enable,
+        reboot_required=reboot_required,
+    )
+
+
+def plan_security_issues_fix(
+    cfg: UAConfig, issue_ids: List[str]
+) -> List[FixPlan]:
+    """Plan the fix of many CVEs or USNs, sharing the system state.
+
+    The issues are planned concurrently.
+    """
+    issue_ids = sorted({issue_id.upper() for issue_id in issue_ids})
+    client = UASecurityClient(cfg=cfg)
+    installed_packages = query_installed_source_pkg_versions()
+    beta_pockets = _get_beta_pockets(cfg)
+
+    def plan_fix(issue_id: str) -> FixPlan:
+        return plan_security_issue_fix(
+            cfg,
+            issue_id,
+            client=client,
+            installed_packages=installed_packages,
+            beta_pockets=beta_pockets,
+        )
+
+    if len(issue_ids) < 2:
+        return [plan_fix(issue_id) for issue_id in issue_ids]
+    with ThreadPoolExecutor(
+        max_workers=min(client.max_concurrency, len(issue_ids))
+    ) as executor:
+        return list(executor.map(plan_fix, issue_ids))
+
+
+def apply_fix_plans(
+    cfg: UAConfig, plans: List[FixPlan], dry_run: bool = False
+) -> FixStatus:
+    """Upgrade the packages of fix plans in a single apt transaction.
+
+    :return: The worst FixStatus across all plans.
+    """
+    if dry_run:
+        print(messages.SECURITY_DRY_RUN_WARNING)
+
+    issue_plans = {}  # type: Dict[str, Dict[str, Set[str]]]
+    issue_status = {}  # type: Dict[str, FixStatus]
+    for plan in plans:
+        if plan.error:
+            print(plan.error)
+        issue_plans[plan.issue_id] = {
+            upgrade.pocket: set(upgrade.binary_packages)
+            for upgrade in plan.upgrades
+        }
+        if plan.expected_status == FixStatus.SYSTEM_STILL_VULNERABLE:
+            issue_status[plan.issue_id] = FixStatus.SYSTEM_STILL_VULNERABLE
+        else:
+            # Whether a reboot is needed is known after the upgrade
+            issue_status[plan.issue_id] = FixStatus.SYSTEM_NON_VULNERABLE
+    return _upgrade_issues_packages(
+        cfg, sorted(issue_status), issue_plans, issue_status, dry_run
+    )
+
+
 def get_affected_packages_from_cves(cves, installed_packages):
     affected_pkgs = {}  # type: Dict[str, CVEPackageStatus]
 
@@ -844,11 +1596,7 @@ def _format_packages_message(
 
 
 def _get_service_for_pocket(pocket: str, cfg: UAConfig):
-    service_to_check = "no-service-needed"
-    if pocket == UA_INFRA_POCKET:
-        service_to_check = "esm-infra"
-    elif pocket == UA_APPS_POCKET:
-        service_to_check = "esm-apps"
+    service_to_check = _get_pocket_service_name(pocket) or "no-service-needed"
 
     ent_cls = entitlement_factory(cfg=cfg, name=service_to_check)
     return ent_cls(cfg) if ent_cls else None
@@ -877,9 +1625,13 @@ def _handle_released_package_fixes(
     pkg_index: int,
     num_pkgs: int,
     dry_run: bool,
+    upgrade_plan: Optional[Dict[str, Set[str]]] = None,
 ) -> ReleasedPackagesInstallResult:
     """Handle the packages that could be fixed and have a released status.
 
+    When upgrade_plan is provided, the binary packages to upgrade are added
+    to it, keyed by pocket, instead of being upgraded right away.
+
     :returns: Tuple of
         boolean whether all packages were successfully upgraded,
         list of strings containing the packages that were not upgraded,
@@ -918,6 +1670,12 @@ def _handle_released_package_fixes(
                         all_already_installed = False
 
                 pkg_index += len(pkg_src_group)
+                if upgrade_plan is not None:
+                    if binary_pkgs:
+                        upgrade_plan.setdefault(pocket, set()).update(
+                            binary_pkgs
+                        )
+                    continue
                 upgrade_status &= upgrade_packages_and_attach(
                     cfg=cfg,
                     upgrade_pkgs=binary_pkgs,
@@ -964,12 +1722,17 @@ def prompt_for_affected_packages(
     installed_packages: Dict[str, Dict[str, str]],
     usn_released_pkgs: Dict[str, Dict[str, Dict[str, str]]],
     dry_run: bool,
+    upgrade_plan: Optional[Dict[str, Set[str]]] = None,
 ) -> FixStatus:
     """Process security CVE dict returning a CVEStatus object.
 
     Since CVEs point to a USN if active, get_notice may be called to fill in
     CVE title details.
 
+    When upgrade_plan is provided, the packages to upgrade are added to it,
+    keyed by pocket, and left for the caller to upgrade. The status returned
+    is then the one expected once they are upgraded.
+
     :returns: An FixStatus enum value corresponding to the system state
               after processing the affected packages
     """
@@ -1035,6 +1798,7 @@ def prompt_for_affected_packages(
         pkg_index=pkg_index,
         num_pkgs=count,
         dry_run=dry_run,
+        upgrade_plan=upgrade_plan,
     )
 
     unfixed_pkgs += released_pkgs_install_result.unfixed_pkgs
@@ -1042,6 +1806,13 @@ def prompt_for_affected_packages(
     if unfixed_pkgs:
         print(_format_unfixed_packages_msg(unfixed_pkgs))
 
+    if upgrade_plan is not None:
+        return (
+            FixStatus.SYSTEM_STILL_VULNERABLE
+            if unfixed_pkgs
+            else FixStatus.SYSTEM_NON_VULNERABLE
+        )
+
     if released_pkgs_install_result.fix_status:
         # fix_status is True if either:
         #  (1) we successfully installed all the packages we needed to
@@ -1298,6 +2069,20 @@ def upgrade_packages_and_attach(
     if not upgrade_pkgs:
         return True
 
+    if not _check_pocket_requirements(cfg, pocket, dry_run):
+        return False
+
+    _run_packages_upgrade(upgrade_pkgs, dry_run)
+    return True
+
+
+def _check_pocket_requirements(
+    cfg: UAConfig, pocket: str, dry_run: bool
+) -> bool:
+    """Verify packages from pocket can be installed, prompting if needed.
+
+    :return: True if the system can install packages from the pocket.
+    """
     # If we are running on --dry-run mode, we don't need to be root
     # to understand what will happen with the system
     if os.getuid() != 0 and not dry_run:
@@ -1322,6 +2107,10 @@ def upgrade_packages_and_attach(
             # User subscription does not have required service enabled
             return False
 
+    return True
+
+
+def _run_packages_upgrade(upgrade_pkgs: List[str], dry_run: bool) -> None:
     print(
         colorize_commands(
             [
@@ -1339,5 +2128,3 @@ def upgrade_packages_and_attach(
             error_msg=messages.APT_INSTALL_FAILED.msg,
             env={"DEBIAN_FRONTEND": "noninteractive"},
         )
-
-    return True
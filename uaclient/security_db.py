@@ -0,0 +1,389 @@
+"""
+Local store of Security API notices and CVEs for the current Ubuntu series.
+
+Each notice and CVE document is kept in its own file under
+<data_dir>/security/<series>/ so resolving an issue only reads the documents
+it needs. The index.json file maps CVE ids and source package names to the
+notices that reference them, which is enough to answer the lookups done by
+`pro fix` without reaching the Security API.
+
+Documents are only served while they are younger than SECURITY_DB_MAX_AGE,
+going by the time their file was written, and the index only while the last
+sync is. Older data is fetched from the Security API again.
+
+A SecurityDB can be shared by threads: the index is only read and updated
+while holding the lock of the database.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from uaclient import files, system
+
+SECURITY_DB_SUBDIR = "security"
+SECURITY_DB_INDEX_FILE = "index.json"
+SECURITY_DB_NOTICES_SUBDIR = "notices"
+SECURITY_DB_CVES_SUBDIR = "cves"
+SECURITY_DB_SYNC_PAGE_SIZE = 50
+SECURITY_DB_MAX_AGE = 24 * 60 * 60  # seconds
+
+LOG = logging.getLogger(__name__)
+
+
+def _get_source_package_names(
+    notice: Dict[str, Any], series: str
+) -> List[str]:
+    """Return the source packages a notice releases fixes for on series."""
+    source_pkgs = set()
+    for pkg in notice.get("release_packages", {}).get(series, []):
+        if pkg.get("is_source"):
+            source_pkgs.add(pkg["name"])
+        elif "/" in pkg.get("source_link", ""):
+            source_pkgs.add(pkg["source_link"].split("/")[-1])
+    return sorted(source_pkgs)
+
+
+def _get_issue_id(document: Any) -> Optional[str]:
+    if isinstance(document, dict) and isinstance(document.get("id"), str):
+        return document["id"].upper()
+    return None
+
+
+def get_series_notice(notice: Dict[str, Any], series: str) -> Dict[str, Any]:
+    """Return a copy of a notice document without the data of other series.
+
+    Other series are kept in release_packages with no packages, so the copy
+    still tells whether the notice released fixes at all.
+    """
+    series_notice = dict(notice)
+    if isinstance(notice.get("release_packages"), dict):
+        series_notice["release_packages"] = {
+            release: pkgs if release == series else []
+            for release, pkgs in notice["release_packages"].items()
+        }
+    if isinstance(notice.get("cves"), list):
+        series_notice["cves"] = [
+            get_series_cve(cve, series) if isinstance(cve, dict) else cve
+            for cve in notice["cves"]
+        ]
+    return series_notice
+
+
+def get_series_cve(cve: Dict[str, Any], series: str) -> Dict[str, Any]:
+    """Return a copy of a CVE document without the data of other series."""
+    series_cve = dict(cve)
+    if isinstance(cve.get("packages"), list):
+        series_cve["packages"] = []
+        for pkg in cve["packages"]:
+            statuses = [
+                status
+                for status in pkg.get("statuses", [])
+                if status.get("release_codename") == series
+            ]
+            if statuses:
+                series_cve["packages"].append(dict(pkg, statuses=statuses))
+    if isinstance(cve.get("notices"), list):
+        series_cve["notices"] = [
+            get_series_notice(notice, series)
+            if isinstance(notice, dict)
+            else notice
+            for notice in cve["notices"]
+        ]
+    return series_cve
+
+
+class SecurityDB:
+    """Per-series store of Security API documents indexed by issue id."""
+
+    def __init__(self, data_dir: str, series: Optional[str] = None):
+        if not series:
+            series = system.get_platform_info()["series"]
+        self.series = series
+        self.directory = os.path.join(data_dir, SECURITY_DB_SUBDIR, series)
+        self._index_file = files.UAFile(
+            SECURITY_DB_INDEX_FILE, self.directory, private=False
+        )
+        self._index = None  # type: Optional[Dict[str, Any]]
+        self._lock = threading.RLock()
+
+    @property
+    def is_present(self) -> bool:
+        return self._index_file.is_present
+
+    @property
+    def index(self) -> Dict[str, Any]:
+        """The lookup tables of this database, loaded on first access.
+
+        Issue ids are kept in sets, they are written out as sorted lists.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            return self._index
+
+    def _load_index(self) -> Dict[str, Any]:
+        content = self._index_file.read()
+        index = {}  # type: Dict[str, Any]
+        if content:
+            try:
+                index = json.loads(content)
+            except ValueError:
+                LOG.warning(
+                    "Ignoring invalid security database index: %s",
+                    self._index_file.path,
+                )
+        index["notices"] = set(index.get("notices", []))
+        index["cves"] = set(index.get("cves", []))
+        for key in ("cve_notices", "source_notices"):
+            index[key] = {
+                issue_id: set(notices_ids)
+                for issue_id, notices_ids in index.get(key, {}).items()
+            }
+        return index
+
+    @property
+    def is_outdated(self) -> bool:
+        """True when the last sync is older than SECURITY_DB_MAX_AGE."""
+        synced_at = self.index.get("synced_at")
+        if not isinstance(synced_at, (int, float)):
+            return True
+        return not 0 <= time.time() - synced_at < SECURITY_DB_MAX_AGE
+
+    def _document_file(self, subdir: str, issue_id: str) -> files.UAFile:
+        return files.UAFile(
+            "{}.json".format(issue_id),
+            os.path.join(self.directory, subdir),
+            private=False,
+        )
+
+    def _read_document(
+        self, subdir: str, issue_id: str, max_age: Optional[float]
+    ) -> Optional[Dict[str, Any]]:
+        document_file = self._document_file(subdir, issue_id)
+        if max_age is not None:
+            try:
+                age = time.time() - os.stat(document_file.path).st_mtime
+            except OSError:
+                return None
+            if not 0 <= age < max_age:
+                return None
+        content = document_file.read()
+        if not content:
+            return None
+        try:
+            return json.loads(content)
+        except ValueError:
+            return None
+
+    def get_notice(
+        self, notice_id: str, max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the stored notice document or None when unknown.
+
+        :param max_age: When set, also return None for a document stored
+            longer than max_age seconds ago.
+        """
+        notice_id = notice_id.upper()
+        if notice_id not in self.index["notices"]:
+            return None
+        return self._read_document(
+            SECURITY_DB_NOTICES_SUBDIR, notice_id, max_age
+        )
+
+    def get_cve(
+        self, cve_id: str, max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the stored CVE document or None when unknown.
+
+        :param max_age: When set, also return None for a document stored
+            longer than max_age seconds ago.
+        """
+        cve_id = cve_id.upper()
+        if cve_id not in self.index["cves"]:
+            return None
+        return self._read_document(SECURITY_DB_CVES_SUBDIR, cve_id, max_age)
+
+    def get_notices_ids_for_cve(self, cve_id: str) -> Optional[List[str]]:
+        """Return ids of the notices fixing a CVE, None when unknown."""
+        with self._lock:
+            notices_ids = self.index["cve_notices"].get(cve_id.upper())
+            if notices_ids is None:
+                return None
+            return sorted(notices_ids)
+
+    def get_notices_ids_for_source_package(self, src_pkg: str) -> List[str]:
+        """Return ids of the notices releasing fixes for a source package."""
+        with self._lock:
+            return sorted(self.index["source_notices"].get(src_pkg, []))
+
+    def add_notice(self, notice: Dict[str, Any]) -> None:
+        """Store a notice document and index its CVEs and source packages.
+
+        Only the data of the database series is kept. Full CVE documents
+        embedded in the notice are stored as well. Call save() to persist
+        the updated index.
+        """
+        notice = get_series_notice(notice, self.series)
+        notice_id = notice["id"].upper()
+        with self._lock:
+            self._document_file(SECURITY_DB_NOTICES_SUBDIR, notice_id).write(
+                json.dumps(notice)
+            )
+            index = self.index
+            index["notices"].add(notice_id)
+            for cve_id in notice.get("cves_ids", []):
+                index["cve_notices"].setdefault(cve_id.upper(), set()).add(
+                    notice_id
+                )
+            for src_pkg in _get_source_package_names(notice, self.series):
+                index["source_notices"].setdefault(src_pkg, set()).add(
+                    notice_id
+                )
+            for cve in notice.get("cves", []):
+                if isinstance(cve, dict) and "packages" in cve:
+                    self.add_cve(cve)
+
+    def add_cve(self, cve: Dict[str, Any]) -> None:
+        """Store the data of a CVE document for the database series.
+
+        Call save() to persist the updated index.
+        """
+        cve = get_series_cve(cve, self.series)
+        cve_id = cve["id"].upper()
+        with self._lock:
+            self._document_file(SECURITY_DB_CVES_SUBDIR, cve_id).write(
+                json.dumps(cve)
+            )
+            self.index["cves"].add(cve_id)
+
+    def refresh_notice(self, notice: Dict[str, Any]) -> None:
+        """Replace a stored notice by a copy fetched from the Security API.
+
+        Notices the database does not know are left out, they are added by
+        sync. Failures to write are only logged.
+        """
+        if _get_issue_id(notice) in self.index["notices"]:
+            self._refresh(self.add_notice, notice)
+
+    def refresh_cve(self, cve: Dict[str, Any]) -> None:
+        """Replace a stored CVE by a copy fetched from the Security API.
+
+        CVEs the database does not know are left out, they are added by
+        sync. Failures to write are only logged.
+        """
+        if _get_issue_id(cve) in self.index["cves"]:
+            self._refresh(self.add_cve, cve)
+
+    def _refresh(
+        self,
+        add: Callable[[Dict[str, Any]], None],
+        document: Dict[str, Any],
+    ) -> None:
+        try:
+            with self._lock:
+                add(document)
+                self.save()
+        except OSError as e:
+            LOG.debug("Unable to refresh %s: %s", document["id"], e)
+
+    def save(self) -> None:
+        """Write the index out.
+
+        The index is written to a temporary file first, then renamed over
+        index.json, so readers never see a partly written index.
+        """
+        with self._lock:
+            index = dict(self.index)
+            index["notices"] = sorted(index["notices"])
+            index["cves"] = sorted(index["cves"])
+            for key in ("cve_notices", "source_notices"):
+                index[key] = {
+                    issue_id: sorted(notices_ids)
+                    for issue_id, notices_ids in index[key].items()
+                }
+            tmp_file = files.UAFile(
+                "{}.{}.tmp".format(SECURITY_DB_INDEX_FILE, os.getpid()),
+                self.directory,
+                private=False,
+            )
+            tmp_file.write(json.dumps(index, sort_keys=True))
+            os.replace(tmp_file.path, self._index_file.path)
+
+    @property
+    def high_water_mark(self) -> Optional[Dict[str, str]]:
+        """The id and published time of the newest notice synced."""
+        return self.index.get("high_water_mark")
+
+    def _is_new_notice(
+        self, notice: Dict[str, Any], mark: Optional[Dict[str, str]]
+    ) -> bool:
+        """Return True if the notice is newer than the high-water mark."""
+        if not mark:
+            return True
+        published = notice.get("published", "")
+        if published != mark["published"]:
+            return published > mark["published"]
+        return notice["id"].upper() not in self.index["notices"]
+
+    def _update_high_water_mark(self, notice: Dict[str, Any]) -> None:
+        mark = self.high_water_mark
+        published = notice.get("published", "")
+        if not mark or published > mark["published"]:
+            self.index["high_water_mark"] = {
+                "notice_id": notice["id"].upper(),
+                "published": published,
+            }
+
+    def sync(self, client) -> int:
+        """Fetch the notices published since the last sync and store them.
+
+        Notices are requested newest first, one page at a time, until a page
+        reaches a notice at or below the high-water mark. On the first sync
+        every notice published for this series is fetched.
+
+        Pages bypass the HTTP response cache: a cached page next to a fresh
+        one would be offset by the notices published in between, and the
+        notices falling between the two pages would never be stored. A
+        notice published during the sync only shifts the following pages
+        down, repeating notices already stored.
+
+        :param client: UASecurityClient used to page through the notices.
+
+        :return: The number of notices stored.
+        """
+        mark = self.high_water_mark
+        offset = 0
+        num_notices = 0
+        while True:
+            usns = client.get_notices(
+                release=self.series,
+                limit=SECURITY_DB_SYNC_PAGE_SIZE,
+                offset=offset,
+                order="newest",
+                use_cache=False,
+            )
+            new_usns = [
+                usn for usn in usns if self._is_new_notice(usn.response, mark)
+            ]
+            for usn in new_usns:
+                self.add_notice(usn.response)
+                self._update_high_water_mark(usn.response)
+            num_notices += len(new_usns)
+            offset += SECURITY_DB_SYNC_PAGE_SIZE
+            if (
+                len(new_usns) < len(usns)
+                or len(usns) < SECURITY_DB_SYNC_PAGE_SIZE
+            ):
+                break
+        self.index["synced_at"] = time.time()
+        self.save()
+        LOG.debug(
+            "Synced %d new notices to the %s security database",
+            num_notices,
+            self.series,
+        )
+        return num_notices
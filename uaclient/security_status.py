@@ -1,17 +1,39 @@
+import hashlib
+import json
+import logging
 from collections import defaultdict
 from enum import Enum
-from typing import Any, DefaultDict, Dict, List, Tuple  # noqa: F401
+from typing import (  # noqa: F401
+    Any,
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from apt import Cache  # type: ignore
 from apt import package as apt_package
 
+from uaclient import apt, system
 from uaclient.config import UAConfig
-from uaclient.status import status
+from uaclient.entitlements import entitlement_factory
+from uaclient.entitlements.entitlement_status import (
+    ContractStatus,
+    UserFacingStatus,
+)
+from uaclient.entitlements.repo import RepoEntitlement
 from uaclient.system import get_platform_info
 
 series = get_platform_info()["series"]
 
 ESM_SERVICES = ("esm-infra", "esm-apps")
+SECURITY_STATUS_SCHEMA_VERSION = "0.1"
+SECURITY_STATUS_CACHE_VERSION = 3
 
 
 ORIGIN_INFORMATION_TO_SERVICE = {
@@ -21,6 +43,18 @@ ORIGIN_INFORMATION_TO_SERVICE = {
 }
 
 
+PackageFileOrigin = NamedTuple(
+    "PackageFileOrigin",
+    [
+        ("origin", str),
+        ("archive", str),
+        ("component", str),
+        ("site", str),
+        ("service_name", str),
+    ],
+)
+
+
 class UpdateStatus(Enum):
     "Represents the availability of a security package."
     AVAILABLE = "upgrade_available"
@@ -29,7 +63,45 @@ class UpdateStatus(Enum):
     UNAVAILABLE = "upgrade_unavailable"
 
 
-def get_origin_for_package(package: apt_package.Package) -> str:
+class OriginIndex:
+    """Classification of the package files of an apt cache.
+
+    Most versions come from a handful of package files, so each package
+    file is classified the first time it is seen and looked up by its id
+    afterwards. Package file ids are only meaningful for the apt cache they
+    come from, so an index must not be shared between caches.
+    """
+
+    def __init__(self) -> None:
+        self._origins = {}  # type: Dict[int, PackageFileOrigin]
+
+    def get_origins(
+        self, version: apt_package.Version
+    ) -> List[PackageFileOrigin]:
+        # python-apt only exposes the package files of a version through
+        # its apt_pkg version; Version.origins builds and checks the trust
+        # of a new Origin for each of them on every call.
+        origins = []
+        for package_file, _index in version._cand.file_list:
+            origin = self._origins.get(package_file.id)
+            if origin is None:
+                origin = PackageFileOrigin(
+                    origin=package_file.origin,
+                    archive=package_file.archive,
+                    component=package_file.component,
+                    site=package_file.site,
+                    service_name=ORIGIN_INFORMATION_TO_SERVICE.get(
+                        (package_file.origin, package_file.archive), ""
+                    ),
+                )
+                self._origins[package_file.id] = origin
+            origins.append(origin)
+        return origins
+
+
+def get_origin_for_package(
+    package: apt_package.Package, origin_index: OriginIndex
+) -> str:
     """
     Returns the origin for a package installed in the system.
 
@@ -37,7 +109,7 @@ def get_origin_for_package(package: apt_package.Package) -> str:
     We check the available versions (installed, candidate) to determine the
     most reasonable origin for the package.
     """
-    available_origins = package.installed.origins
+    available_origins = origin_index.get_origins(package.installed)
 
     # If the installed version for a package has a single origin, it means that
     # only the local dpkg reference is there. Then, we check if there is a
@@ -46,31 +118,25 @@ def get_origin_for_package(package: apt_package.Package) -> str:
     if len(available_origins) == 1:
         if package.installed == package.candidate:
             return "unknown"
-        available_origins = package.candidate.origins
+        available_origins = origin_index.get_origins(package.candidate)
 
     for origin in available_origins:
-        service = ORIGIN_INFORMATION_TO_SERVICE.get(
-            (origin.origin, origin.archive), ""
-        )
-        if service in ESM_SERVICES:
-            return service
+        if origin.service_name in ESM_SERVICES:
+            return origin.service_name
         if origin.origin == "Ubuntu":
             return origin.component
 
     return "third-party"
 
 
-def get_service_name(origins: List[apt_package.Origin]) -> Tuple[str, str]:
+def get_service_name(origins: List[PackageFileOrigin]) -> Tuple[str, str]:
     """
     Translates the archive name in the version origin to an Ubuntu Pro service
     name.
     """
     for origin in origins:
-        service = ORIGIN_INFORMATION_TO_SERVICE.get(
-            (origin.origin, origin.archive)
-        )
-        if service:
-            return service, origin.site
+        if origin.service_name:
+            return origin.service_name, origin.site
     return ("", "")
 
 
@@ -92,7 +158,7 @@ def get_update_status(service_name: str, ua_info: Dict[str, Any]) -> str:
 
 
 def filter_security_updates(
-    packages: List[apt_package.Package],
+    packages: List[apt_package.Package], origin_index: OriginIndex
 ) -> List[apt_package.Version]:
     """Filters a list of packages looking for available security updates.
 
@@ -102,92 +168,369 @@ def filter_security_updates(
     return [
         version
         for package in packages
-        for version in package.versions
-        if version > package.installed
-        and any(
-            (origin.origin, origin.archive) in ORIGIN_INFORMATION_TO_SERVICE
-            for origin in version.origins
-        )
+        for version, _origins in _iter_security_updates(package, origin_index)
     ]
 
 
+def _iter_security_updates(
+    package: apt_package.Package, origin_index: OriginIndex
+) -> Iterator[Tuple[apt_package.Version, List[PackageFileOrigin]]]:
+    """Yield the security updates of a package along with their origins."""
+    for version in package.versions:
+        if version > package.installed:
+            origins = origin_index.get_origins(version)
+            if any(origin.service_name for origin in origins):
+                yield version, origins
+
+
 def get_ua_info(cfg: UAConfig) -> Dict[str, Any]:
-    """Returns the Pro information based on the config object."""
+    """Returns the Pro information based on the config object.
+
+    Only the ESM services are looked at. Their entitlements come from the
+    machine token and whether they are enabled from the apt policy, so
+    neither the contract server nor the other services are queried.
+    """
     ua_info = {
         "attached": False,
         "enabled_services": [],
         "entitled_services": [],
     }  # type: Dict[str, Any]
 
-    status_dict = status(cfg=cfg, show_all=True)
-    if status_dict["attached"]:
-        ua_info["attached"] = True
-        for service in status_dict["services"]:
-            if service["name"] in ESM_SERVICES:
-                if service["entitled"] == "yes":
-                    ua_info["entitled_services"].append(service["name"])
-                if service["status"] == "enabled":
-                    ua_info["enabled_services"].append(service["name"])
+    if not cfg.is_attached:
+        return ua_info
+
+    ua_info["attached"] = True
+    for service in ESM_SERVICES:
+        ent = entitlement_factory(cfg=cfg, name=service)(cfg)
+        if ent.contract_status() != ContractStatus.ENTITLED:
+            continue
+        ua_info["entitled_services"].append(service)
+        ent_status, _ = ent.user_facing_status()
+        if ent_status == UserFacingStatus.ACTIVE:
+            ua_info["enabled_services"].append(service)
 
     return ua_info
 
 
-def security_status(cfg: UAConfig) -> Dict[str, Any]:
-    """Returns the status of security updates on a system.
+def _get_cache_key(cfg: UAConfig) -> Dict[str, Any]:
+    """Return what the security status of this machine depends on.
 
-    The returned dict has a 'packages' key with a list of all installed
-    packages which can receive security updates, with or without ESM,
-    reflecting the availability of the update based on the Pro status.
-
-    There is also a summary with the Ubuntu Pro information and the package
-    counts.
+    The Pro information depends on the machine token and on the ESM
+    services enabled on the machine, while the package information depends
+    on the apt lists and on the packages installed by dpkg.
     """
-    ua_info = get_ua_info(cfg)
-
-    summary = {"ua": ua_info}  # type: Dict[str, Any]
-    packages = []
-    cache = Cache()
-
-    installed_packages = [package for package in cache if package.is_installed]
-    summary["num_installed_packages"] = len(installed_packages)
-
-    package_count = defaultdict(int)  # type: DefaultDict[str, int]
-    update_count = defaultdict(int)  # type: DefaultDict[str, int]
-
-    for package in installed_packages:
-        package_origin = get_origin_for_package(package)
-        package_count[package_origin] += 1
-
-    security_upgradable_versions = filter_security_updates(installed_packages)
-
-    for candidate in security_upgradable_versions:
-        service_name, origin_site = get_service_name(candidate.origins)
-        status = get_update_status(service_name, ua_info)
-        update_count[service_name] += 1
-        packages.append(
+    try:
+        machine_token = hashlib.sha256(
+            system.load_file(cfg.machine_token_file.public_file.path).encode(
+                "utf-8"
+            )
+        ).hexdigest()  # type: Optional[str]
+    except OSError:
+        machine_token = None
+    return {
+        "version": SECURITY_STATUS_CACHE_VERSION,
+        "series": series,
+        "dpkg_status": system.get_file_fingerprint(apt.DPKG_STATUS_PATH),
+        "apt_cache_time": apt.get_apt_cache_time(),
+        "machine_token": machine_token,
+        "esm_services": {
+            service: system.get_file_fingerprint(
+                RepoEntitlement.repo_list_file_tmpl.format(name=service)
+            )
+            for service in ESM_SERVICES
+        },
+    }
+
+
+def _read_security_status_cache(cfg: UAConfig) -> Optional[Dict[str, Any]]:
+    try:
+        cache = json.loads(system.load_file(cfg.data_path("security-status")))
+        if cache["key"]["version"] != SECURITY_STATUS_CACHE_VERSION:
+            return None
+        return cache
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_security_status_cache(
+    cfg: UAConfig,
+    key: Dict[str, Any],
+    ua_info: Dict[str, Any],
+    package_count: Dict[str, int],
+    updates: List[Dict[str, Any]],
+    installed: Dict[str, List[str]],
+) -> None:
+    content = json.dumps(
+        {
+            "key": key,
+            "ua": ua_info,
+            "package_count": package_count,
+            "updates": updates,
+            "installed": installed,
+        }
+    )
+    try:
+        cfg.write_cache("security-status", content)
+    except OSError as e:
+        logging.debug("Unable to write security status cache: %s", e)
+
+
+def _get_package_updates(
+    package: apt_package.Package, origin_index: OriginIndex
+) -> List[Dict[str, Any]]:
+    """Return the security updates available for an installed package."""
+    updates = []
+    for candidate, origins in _iter_security_updates(package, origin_index):
+        service_name, origin_site = get_service_name(origins)
+        updates.append(
             {
-                "package": candidate.package.name,
+                "package": package.name,
                 "version": candidate.version,
                 "service_name": service_name,
-                "status": status,
                 "origin": origin_site,
                 "download_size": candidate.size,
             }
         )
+    return updates
+
 
-    summary["num_main_packages"] = package_count["main"]
-    summary["num_restricted_packages"] = package_count["restricted"]
-    summary["num_universe_packages"] = package_count["universe"]
-    summary["num_multiverse_packages"] = package_count["multiverse"]
-    summary["num_third_party_packages"] = package_count["third-party"]
-    summary["num_unknown_packages"] = package_count["unknown"]
-    summary["num_esm_infra_packages"] = package_count["esm-infra"]
-    summary["num_esm_apps_packages"] = package_count["esm-apps"]
+def _iter_classified_updates(
+    packages: Iterable[apt_package.Package],
+    origin_index: OriginIndex,
+    package_count: DefaultDict[str, int],
+    installed: Dict[str, List[str]],
+) -> Iterator[Dict[str, Any]]:
+    """Count the installed packages by origin and yield their updates.
+
+    Packages are looked at one at a time. Only the counters and the version
+    and origin of each package, in installed, are kept, so memory does not
+    grow with the apt objects of the installed packages.
+    """
+    for package in packages:
+        if package.is_installed:
+            origin = get_origin_for_package(package, origin_index)
+            package_count[origin] += 1
+            installed[package.name] = [package.installed.version, origin]
+            yield from _get_package_updates(package, origin_index)
+
+
+def _get_changed_package_names(
+    installed: Dict[str, List[str]],
+    dpkg_index: Dict[str, apt.InstalledPackage],
+) -> Set[str]:
+    """Return the names of packages installed, removed or changed by dpkg.
+
+    Names are returned without the architecture qualifier apt adds to
+    foreign architecture packages, as dpkg_index is keyed by those.
+    """
+    known_names = set()
+    changed_names = set()
+    for name, (version, _origin) in installed.items():
+        name = name.partition(":")[0]
+        known_names.add(name)
+        dpkg_package = dpkg_index.get(name)
+        if dpkg_package is None or dpkg_package.version != version:
+            changed_names.add(name)
+    for name, dpkg_package in dpkg_index.items():
+        if name not in known_names and dpkg_package.status == "installed":
+            changed_names.add(name)
+    return changed_names
+
+
+def _update_classification(
+    apt_cache: Cache,
+    origin_index: OriginIndex,
+    cache: Dict[str, Any],
+    dpkg_index: Dict[str, apt.InstalledPackage],
+) -> Optional[
+    Tuple[Dict[str, int], List[Dict[str, Any]], Dict[str, List[str]]]
+]:
+    """Classify again only the packages dpkg changed since the cache.
+
+    Returns the updated package counters, updates and installed packages,
+    or None if a package dpkg installed can't be found in the apt cache, as
+    a full walk of the cache is needed then.
+    """
+    installed = dict(cache["installed"])
+    package_count = defaultdict(
+        int, cache["package_count"]
+    )  # type: DefaultDict[str, int]
+    apt_names = defaultdict(set)  # type: DefaultDict[str, Set[str]]
+    for apt_name in installed:
+        apt_names[apt_name.partition(":")[0]].add(apt_name)
+
+    changed_apt_names = set()
+    packages = []
+    for name in _get_changed_package_names(installed, dpkg_index):
+        names = apt_names[name] | {name}
+        changed_apt_names |= names
+        for apt_name in names & set(installed):
+            package_count[installed.pop(apt_name)[1]] -= 1
+
+        found = False
+        for apt_name in sorted(names):
+            package = apt_cache[apt_name] if apt_name in apt_cache else None
+            if package is not None and package.is_installed:
+                packages.append(package)
+                found = True
+        dpkg_package = dpkg_index.get(name)
+        if not found and dpkg_package and dpkg_package.status == "installed":
+            return None
+
+    updates = [
+        update
+        for update in cache["updates"]
+        if update["package"] not in changed_apt_names
+    ]
+    updates.extend(
+        _iter_classified_updates(
+            packages, origin_index, package_count, installed
+        )
+    )
+    updates.sort(key=lambda update: update["package"])
+    return (
+        {origin: count for origin, count in package_count.items() if count},
+        updates,
+        installed,
+    )
+
+
+def _get_summary(
+    ua_info: Dict[str, Any],
+    package_count: Dict[str, int],
+    updates: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    summary = {"ua": ua_info}  # type: Dict[str, Any]
+    summary["num_installed_packages"] = sum(package_count.values())
+
+    update_count = defaultdict(int)  # type: DefaultDict[str, int]
+    for update in updates:
+        update_count[update["service_name"]] += 1
+
+    summary["num_main_packages"] = package_count.get("main", 0)
+    summary["num_restricted_packages"] = package_count.get("restricted", 0)
+    summary["num_universe_packages"] = package_count.get("universe", 0)
+    summary["num_multiverse_packages"] = package_count.get("multiverse", 0)
+    summary["num_third_party_packages"] = package_count.get("third-party", 0)
+    summary["num_unknown_packages"] = package_count.get("unknown", 0)
+    summary["num_esm_infra_packages"] = package_count.get("esm-infra", 0)
+    summary["num_esm_apps_packages"] = package_count.get("esm-apps", 0)
 
     summary["num_esm_infra_updates"] = update_count["esm-infra"]
     summary["num_esm_apps_updates"] = update_count["esm-apps"]
     summary["num_standard_security_updates"] = update_count[
         "standard-security"
     ]
+    return summary
+
+
+def _get_update_record(
+    ua_info: Dict[str, Any], update: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "package": update["package"],
+        "version": update["version"],
+        "service_name": update["service_name"],
+        "status": get_update_status(update["service_name"], ua_info),
+        "origin": update["origin"],
+        "download_size": update["download_size"],
+    }
+
+
+def iter_security_status(
+    cfg: UAConfig,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield the package updates of security-status as they are found.
+
+    Each update is yielded as a ("package", record) pair as soon as its
+    package is classified, and the summary as a ("summary", summary) pair
+    last, as it counts every installed package. See security_status for
+    the content of both.
+
+    Installed packages are classified while walking the apt cache and only
+    the number of packages of each origin, the security updates and the
+    version and origin of each package are kept. The result is kept in the
+    data directory. While the machine token, ESM services, apt lists and
+    installed packages are unchanged it is returned without opening the apt
+    cache. When only the machine token changed, the packages are not
+    classified again, and when dpkg changed, just the packages it
+    installed, removed or upgraded are.
+    """
+    key = _get_cache_key(cfg)
+    cache = _read_security_status_cache(cfg) or {"key": {}}
+
+    def unchanged(*fields: str) -> bool:
+        return all(cache["key"].get(field) == key[field] for field in fields)
+
+    if unchanged("series", "machine_token", "esm_services"):
+        ua_info = cache["ua"]
+    else:
+        ua_info = get_ua_info(cfg)
+
+    classification = None
+    if unchanged("series", "dpkg_status", "apt_cache_time", "esm_services"):
+        classification = (
+            cache["package_count"],
+            cache["updates"],
+            cache["installed"],
+        )
+    else:
+        apt_cache = Cache()
+        origin_index = OriginIndex()
+        if unchanged("series", "apt_cache_time", "esm_services"):
+            classification = _update_classification(
+                apt_cache, origin_index, cache, apt.get_dpkg_status_index()
+            )
+
+    if classification is not None:
+        package_count, updates, installed = classification
+        for update in updates:
+            yield "package", _get_update_record(ua_info, update)
+    else:
+        counts = defaultdict(int)  # type: DefaultDict[str, int]
+        updates = []
+        installed = {}
+        for update in _iter_classified_updates(
+            apt_cache, origin_index, counts, installed
+        ):
+            updates.append(update)
+            yield "package", _get_update_record(ua_info, update)
+        package_count = dict(counts)
+
+    if cache["key"] != key:
+        _write_security_status_cache(
+            cfg, key, ua_info, package_count, updates, installed
+        )
+    yield "summary", _get_summary(ua_info, package_count, updates)
 
-    return {"_schema_version": "0.1", "summary": summary, "packages": packages}
+
+def get_security_status(
+    cfg: UAConfig,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Returns the summary of security-status and its package updates."""
+    summary = {}  # type: Dict[str, Any]
+    packages = []
+    for kind, record in iter_security_status(cfg):
+        if kind == "summary":
+            summary = record
+        else:
+            packages.append(record)
+    return summary, packages
+
+
+def security_status(cfg: UAConfig) -> Dict[str, Any]:
+    """Returns the status of security updates on a system.
+
+    The returned dict has a 'packages' key with a list of all installed
+    packages which can receive security updates, with or without ESM,
+    reflecting the availability of the update based on the Pro status.
+
+    There is also a summary with the Ubuntu Pro information and the package
+    counts.
+    """
+    summary, packages = get_security_status(cfg)
+    return {
+        "_schema_version": SECURITY_STATUS_SCHEMA_VERSION,
+        "summary": summary,
+        "packages": packages,
+    }
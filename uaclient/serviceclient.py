@@ -6,7 +6,7 @@ from typing import Any, Dict, Optional, Tuple, Type
 from urllib import error
 from urllib.parse import urlencode
 
-from uaclient import config, exceptions, system, util, version
+from uaclient import config, exceptions, http_cache, system, util, version
 
 
 class UAServiceClient(metaclass=abc.ABCMeta):
@@ -15,6 +15,13 @@ class UAServiceClient(metaclass=abc.ABCMeta):
     # Cached serviceclient_url_responses if provided in uaclient.conf
     # via features: {serviceclient_url_responses: /some/file.json}
     _response_overlay = None  # type: Dict[str, Any]
+    # Seconds GET responses are served from the HTTP cache without contacting
+    # the server, keyed by path. Keys ending in "/" match any path below them.
+    # Paths not listed are never cached.
+    # A TTL of 0 still caches the response, so that it is revalidated with a
+    # conditional request instead of being fetched again.
+    cache_ttls = {}  # type: Dict[str, int]
+    _http_cache = None  # type: Optional[http_cache.HTTPResponseCache]
 
     @property
     @abc.abstractmethod
@@ -42,6 +49,31 @@ class UAServiceClient(metaclass=abc.ABCMeta):
             "content-type": "application/json",
         }
 
+    @property
+    def http_cache(self) -> http_cache.HTTPResponseCache:
+        """HTTP response cache, private to root or to the calling user."""
+        if self._http_cache is None:
+            if self.cfg.root_mode:
+                directory = os.path.join(
+                    self.cfg.data_dir,
+                    config.PRIVATE_SUBDIR,
+                    http_cache.HTTP_CACHE_SUBDIR,
+                )
+            else:
+                directory = http_cache.get_user_cache_dir()
+            self._http_cache = http_cache.HTTPResponseCache(directory)
+        return self._http_cache
+
+    def _get_cache_ttl(self, path: str) -> Optional[int]:
+        """Return the cache TTL of a path, None if it is not cacheable."""
+        for cache_path, ttl in self.cache_ttls.items():
+            cache_path = cache_path.lstrip("/")
+            if path == cache_path or (
+                cache_path.endswith("/") and path.startswith(cache_path)
+            ):
+                return ttl
+        return None
+
     def request_url(
         self,
         path,
@@ -50,6 +82,7 @@ class UAServiceClient(metaclass=abc.ABCMeta):
         method=None,
         query_params=None,
         potentially_sensitive: bool = True,
+        use_cache: bool = True,
     ):
         path = path.lstrip("/")
         if not headers:
@@ -66,8 +99,18 @@ class UAServiceClient(metaclass=abc.ABCMeta):
                 k: v for k, v in sorted(query_params.items()) if v is not None
             }
             url += "?" + urlencode(filtered_params)
+        cache_ttl = None
+        cached = None
+        if use_cache and (method or "GET") == "GET" and not data:
+            cache_ttl = self._get_cache_ttl(path)
+        if cache_ttl is not None:
+            cached = self.http_cache.get(url, headers)
+            if cached:
+                if cached.is_fresh(cache_ttl):
+                    return cached.content, cached.headers
+                headers = dict(headers, **cached.validator_headers())
         try:
-            response, headers = util.readurl(
+            response, response_headers = util.readurl(
                 url=url,
                 data=data,
                 headers=headers,
@@ -76,6 +119,9 @@ class UAServiceClient(metaclass=abc.ABCMeta):
                 potentially_sensitive=potentially_sensitive,
             )
         except error.URLError as e:
+            if cached and getattr(e, "code", None) == 304:
+                self.http_cache.touch(cached)
+                return cached.content, cached.headers
             body = None
             if hasattr(e, "body"):
                 body = e.body  # type: ignore
@@ -93,7 +139,12 @@ class UAServiceClient(metaclass=abc.ABCMeta):
             raise exceptions.UrlError(
                 e, code=getattr(e, "code", None), headers=headers, url=url
             )
-        return response, headers
+        if cache_ttl is not None:
+            self.http_cache.put(url, headers, response, response_headers)
+        elif self.cache_ttls and (data or method not in (None, "GET")):
+            # Writes may change what the same resource returns on GET
+            self.http_cache.invalidate(url.split("?")[0])
+        return response, response_headers
 
     def _get_response_overlay(self, url: str):
         """Return a list of fake response dicts for a given URL.
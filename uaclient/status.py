@@ -1,23 +1,38 @@
 import copy
+import hashlib
+import json
 import logging
 import os
 import sys
 import textwrap
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
-
-from uaclient import event_logger, exceptions, messages, system, util, version
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa: F401
+
+from uaclient import (
+    apt,
+    event_logger,
+    exceptions,
+    livepatch,
+    messages,
+    system,
+    util,
+    version,
+)
 from uaclient.config import UAConfig
 from uaclient.contract import get_available_resources, get_contract_information
 from uaclient.defaults import ATTACH_FAIL_DATE_FORMAT, PRINT_WRAP_WIDTH
-from uaclient.entitlements import entitlement_factory
+from uaclient.entitlements import UAEntitlement, entitlement_factory
 from uaclient.entitlements.entitlement_status import (
     ContractStatus,
     UserFacingAvailability,
     UserFacingConfigStatus,
     UserFacingStatus,
 )
+from uaclient.entitlements.fips import FIPSCommonEntitlement
+from uaclient.entitlements.repo import RepoEntitlement
+from uaclient.livepatch import LIVEPATCH_CMD
 from uaclient.messages import TxtColor
 
 event = event_logger.get_event_logger()
@@ -58,6 +73,21 @@ STATUS_COLOR = {
 }
 
 
+# Services are checked concurrently, as most of their checks wait on commands
+STATUS_MAX_WORKERS = 8
+
+# Key of the status-cache holding the inputs of the service checks
+STATUS_INPUTS_KEY = "_status_inputs"
+# Inputs every service check depends on, see _StatusInputs
+STATUS_COMMON_INPUTS = (
+    "version",
+    "machine_token",
+    "features",
+    "resources",
+    "kernel",
+    "dpkg",
+)
+
 STATUS_UNATTACHED_TMPL = "{name: <17}{available: <11}{description}"
 
 STATUS_SIMULATED_TMPL = """\
@@ -147,6 +177,119 @@ def _attached_service_status(ent, inapplicable_resources) -> Dict[str, Any]:
     }
 
 
+class _StatusInputs:
+    """Fingerprints of what the service status checks read.
+
+    Each fingerprint is only computed when a service depending on it is
+    looked at. They are compared with the fingerprints stored in the
+    status-cache to tell which services must be checked again.
+    """
+
+    def __init__(self, cfg: UAConfig, resources: List[Dict[str, Any]]):
+        self.fingerprints = {}  # type: Dict[str, Any]
+        self._getters = {
+            "version": version.get_version,
+            "machine_token": lambda: _get_file_hash(
+                cfg.machine_token_file.public_file.path
+            ),
+            "features": lambda: cfg.features,
+            "resources": lambda: hashlib.sha256(
+                json.dumps(resources, sort_keys=True).encode("utf-8")
+            ).hexdigest(),
+            "kernel": lambda: system.get_kernel_info().uname_release,
+            "dpkg": lambda: system.get_file_fingerprint(apt.DPKG_STATUS_PATH),
+            "apt": lambda: [
+                apt.get_apt_config_fingerprint(),
+                apt.get_apt_cache_time(),
+            ],
+            "fips": lambda: _get_file_hash(
+                FIPSCommonEntitlement.FIPS_PROC_FILE
+            ),
+            "reboot_required": lambda: [
+                system.get_file_fingerprint(system.REBOOT_FILE_CHECK_PATH),
+                system.get_file_fingerprint(system.REBOOT_PKGS_FILE_PATH),
+            ],
+            "livepatch": _get_livepatch_fingerprint,
+        }  # type: Dict[str, Callable[[], Any]]
+
+    def get(self, key: str) -> Any:
+        if key not in self.fingerprints:
+            self.fingerprints[key] = self._getters[key]()
+        return self.fingerprints[key]
+
+
+def _get_file_hash(path: str) -> Optional[str]:
+    try:
+        return hashlib.sha256(
+            system.load_file(path).encode("utf-8")
+        ).hexdigest()
+    except OSError:
+        return None
+
+
+def _get_livepatch_fingerprint() -> Optional[List[Any]]:
+    if not system.which(LIVEPATCH_CMD):
+        return None
+    livepatch_status = livepatch.get_status()
+    return [
+        livepatch_status.enabled,
+        livepatch_status.error,
+        livepatch_status.version,
+        sorted(livepatch_status.fixed_cves),
+    ]
+
+
+def _get_service_status_inputs(ent: UAEntitlement) -> List[str]:
+    """Return the inputs the status of ent depends on.
+
+    Besides its own, the status of a service depends on the inputs of
+    the services that can block it.
+    """
+    inputs = list(STATUS_COMMON_INPUTS) + list(ent.status_inputs)
+    for service in ent.incompatible_services:
+        inputs.extend(service.entitlement.status_inputs)
+    return sorted(set(inputs))
+
+
+def invalidate_status_cache(cfg: UAConfig) -> None:
+    """Make the next status() check every service again.
+
+    Used after operations that change the state of services, in case they
+    changed something the stored fingerprints don't cover.
+    """
+    status_cache = cfg.read_cache("status-cache")
+    if status_cache and status_cache.pop(STATUS_INPUTS_KEY, None):
+        cfg.write_cache("status-cache", status_cache)
+
+
+def _prefetch_service_status_inputs(ents: List[UAEntitlement]) -> None:
+    """Compute the inputs shared by the service status checks up front.
+
+    They are all memoized, so the checks running concurrently reuse them
+    instead of racing to run the same commands. Failures are left for the
+    checks that need those inputs to report.
+    """
+    prefetches = [
+        system.get_platform_info,
+        system.get_kernel_info,
+    ]  # type: List[Callable[[], Any]]
+    if any(
+        isinstance(ent, RepoEntitlement)
+        and ent.contract_status() == ContractStatus.ENTITLED
+        for ent in ents
+    ):
+        prefetches.append(
+            lambda: apt.get_apt_policy(
+                error_msg=messages.APT_POLICY_FAILED.msg
+            )
+        )
+    for prefetch in prefetches:
+        try:
+            prefetch()
+        except (exceptions.UserFacingError, OSError) as e:
+            LOG.debug("Unable to prefetch service status input: %s", e)
+
+
 def _attached_status(cfg: UAConfig) -> Dict[str, Any]:
     """Return configuration of attached status as a dictionary."""
 
@@ -200,6 +343,7 @@ def _attached_status(cfg: UAConfig) -> Dict[str, Any]:
         if not resource.get("available")
     }
 
+    ents = []
     for resource in resources:
         try:
             ent_cls = entitlement_factory(
@@ -207,10 +351,51 @@ def _attached_status(cfg: UAConfig) -> Dict[str, Any]:
             )
         except exceptions.EntitlementNotFoundError:
             continue
-        ent = ent_cls(cfg)
-        response["services"].append(
-            _attached_service_status(ent, inapplicable_resources)
-        )
+        ents.append(ent_cls(cfg))
+
+    # Reuse the statuses of the last run whose inputs didn't change
+    status_cache = cfg.read_cache("status-cache") or {}
+    previous_inputs = status_cache.get(STATUS_INPUTS_KEY) or {}
+    previous_fingerprints = previous_inputs.get("fingerprints", {})
+    previous_services = previous_inputs.get("services", {})
+    inputs = _StatusInputs(cfg, resources)
+    services = {}  # type: Dict[str, Dict[str, Any]]
+    ents_to_check = []
+    for ent in ents:
+        fingerprints = {
+            key: inputs.get(key) for key in _get_service_status_inputs(ent)
+        }
+        if ent.name in previous_services and all(
+            key in previous_fingerprints
+            and previous_fingerprints[key] == fingerprint
+            for key, fingerprint in fingerprints.items()
+        ):
+            services[ent.name] = previous_services[ent.name]
+        else:
+            ents_to_check.append(ent)
+
+    if ents_to_check:
+        _prefetch_service_status_inputs(ents_to_check)
+        with ThreadPoolExecutor(
+            max_workers=min(STATUS_MAX_WORKERS, len(ents_to_check))
+        ) as executor:
+            services.update(
+                zip(
+                    [ent.name for ent in ents_to_check],
+                    executor.map(
+                        lambda ent: _attached_service_status(
+                            ent, inapplicable_resources
+                        ),
+                        ents_to_check,
+                    ),
+                )
+            )
+
+    response["services"].extend(services[ent.name] for ent in ents)
+    response[STATUS_INPUTS_KEY] = {
+        "fingerprints": inputs.fingerprints,
+        "services": services,
+    }
     response["services"].sort(key=lambda x: x.get("name", ""))
 
     support = cfg.machine_token_file.entitlements.get("support", {}).get(
@@ -340,7 +525,9 @@ def status(cfg: UAConfig, show_all: bool = False) -> Dict[str, Any]:
     to report detailed availability of different resources for this
     machine.
 
-    Write the status-cache when called by root.
+    Write the status-cache when called by root. Along with the status, it
+    keeps the fingerprints of the inputs of every service check, so later
+    calls only check again the services whose inputs changed.
     """
     if cfg.is_attached:
         response = _attached_status(cfg)
@@ -348,9 +535,13 @@ def status(cfg: UAConfig, show_all: bool = False) -> Dict[str, Any]:
         response = _unattached_status(cfg)
 
     response.update(_get_config_status(cfg))
+    status_inputs = response.pop(STATUS_INPUTS_KEY, None)
 
     if cfg.root_mode:
-        cfg.write_cache("status-cache", response)
+        status_cache = dict(response)
+        if status_inputs:
+            status_cache[STATUS_INPUTS_KEY] = status_inputs
+        cfg.write_cache("status-cache", status_cache)
 
         # Try to remove fix reboot notices if not applicable
         if not system.should_reboot():
@@ -365,6 +365,19 @@ def is_exe(path: str) -> bool:
     return os.path.isfile(path) and os.access(path, os.X_OK)
 
 
+def get_file_fingerprint(path: str) -> Optional[List[int]]:
+    """Return the mtime in nanoseconds and size of path, if it exists.
+
+    Used to tell whether a file changed since a result derived from it was
+    cached.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
 def load_file(filename: str, decode: bool = True) -> str:
     """Read filename and decode content."""
     logging.debug("Reading file: %s", filename)
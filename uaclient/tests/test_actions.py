@@ -2,7 +2,11 @@ import mock
 import pytest
 
 from uaclient import exceptions, messages
-from uaclient.actions import attach_with_token, auto_attach
+from uaclient.actions import (
+    attach_with_token,
+    auto_attach,
+    prefetch_resource_machine_access,
+)
 from uaclient.exceptions import ContractAPIError, NonAutoAttachImageError
 from uaclient.tests.test_cli_auto_attach import fake_instance_factory
 
@@ -141,3 +145,23 @@ class TestAutoAttach:
             auto_attach(cfg, fake_instance_factory())
 
         assert unexpected_error == excinfo.value
+
+
+class TestPrefetchResourceMachineAccess:
+    @mock.patch("uaclient.contract.prefetch_resource_machine_access")
+    def test_prefetches_repo_services_and_the_services_they_require(
+        self, m_prefetch, FakeConfig
+    ):
+        cfg = FakeConfig.for_attached_machine()
+        with mock.patch(
+            "uaclient.entitlements.repo.RepoEntitlement."
+            "needs_resource_machine_access",
+            new_callable=mock.PropertyMock,
+            return_value=True,
+        ):
+            prefetch_resource_machine_access(
+                cfg, ["ros", "livepatch", "invalid"]
+            )
+        assert [
+            mock.call(cfg, ["ros", "esm-infra", "esm-apps"])
+        ] == m_prefetch.call_args_list
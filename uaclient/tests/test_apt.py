@@ -19,6 +19,12 @@ from uaclient.apt import (
     APT_PROXY_CONF_FILE,
     APT_RETRIES,
     KEYRINGS_DIR,
+    AptPolicy,
+    AptPolicySource,
+    DebianVersion,
+    InstalledPackage,
+    _get_dpkg_status_index,
+    _parse_dpkg_status,
     add_apt_auth_conf_entry,
     add_auth_apt_repo,
     add_ppa_pinning,
@@ -28,14 +34,19 @@ from uaclient.apt import (
     find_apt_list_files,
     get_apt_cache_policy,
     get_apt_cache_time,
+    get_apt_config_fingerprint,
+    get_apt_policy,
+    get_dpkg_status_index,
     get_installed_packages,
     is_installed,
+    parse_version,
     remove_apt_list_files,
     remove_auth_apt_repo,
     remove_repo_from_apt_auth_file,
     restore_commented_apt_list_file,
     run_apt_update_command,
     setup_apt_proxy,
+    version_compare,
 )
 from uaclient.entitlements.base import UAEntitlement
 from uaclient.entitlements.repo import RepoEntitlement
@@ -839,27 +850,188 @@ class TestRestoreCommentAptListFile:
         assert expected == list_file.read()
 
 
-class TestGetInstalledPackages:
-    @mock.patch("uaclient.apt.system.subp", return_value=("", ""))
-    def test_correct_command_called(self, m_subp):
-        get_installed_packages()
+DPKG_STATUS = """\
+Package: a
+Status: install ok installed
+Version: 1.2
+Description: a package
+ spanning lines
+ Package: not-a-package
 
-        expected_call = mock.call(
-            ["dpkg-query", "-W", "--showformat=${Package}\\n"]
-        )
-        assert [expected_call] == m_subp.call_args_list
+Package: b
+Status: deinstall ok config-files
+Source: bsrc
+Version: 1.2
+
+Package: c
+Status: purge ok not-installed
+
+Package: libd1
+Status: install ok installed
+Source: dsrc (2.0-1)
+Version: 2.0-1build1
+
+Package: libd1
+Status: install ok half-installed
+Source: dsrc (2.0-1)
+Version: 2.0-1build1
+"""
+
+
+@pytest.fixture
+def dpkg_status(tmpdir):
+    status_file = tmpdir.join("status")
+    status_file.write(DPKG_STATUS)
+    with mock.patch("uaclient.apt.DPKG_STATUS_PATH", status_file.strpath):
+        with mock.patch(
+            "uaclient.apt.DPKG_STATUS_CACHE_PATH",
+            tmpdir.join("cache", "dpkg-status.json").strpath,
+        ):
+            yield status_file
+
+
+class TestGetDpkgStatusIndex:
+    def test_status_file_is_parsed(self, dpkg_status):
+        assert {
+            "a": InstalledPackage("a", "a", "1.2", "installed"),
+            "b": InstalledPackage("b", "bsrc", "1.2", "config-files"),
+            "libd1": InstalledPackage(
+                "libd1", "dsrc", "2.0-1build1", "installed"
+            ),
+        } == get_dpkg_status_index()
+
+    def test_missing_status_file_means_no_packages(self, tmpdir):
+        with mock.patch(
+            "uaclient.apt.DPKG_STATUS_PATH", tmpdir.join("status").strpath
+        ):
+            assert {} == get_dpkg_status_index()
+
+    def test_index_is_cached_until_status_file_changes(
+        self, dpkg_status, tmpdir
+    ):
+        with mock.patch(
+            "uaclient.apt._parse_dpkg_status", wraps=_parse_dpkg_status
+        ) as m_parse:
+            get_dpkg_status_index()
+            get_dpkg_status_index()
+            assert 1 == m_parse.call_count
+
+            # A new process reads the index from the on-disk cache
+            _get_dpkg_status_index.cache_clear()
+            assert ["a", "b", "libd1"] == sorted(get_dpkg_status_index())
+            assert 1 == m_parse.call_count
+
+            dpkg_status.write("Package: e\nStatus: install ok installed\n")
+            assert ["e"] == list(get_dpkg_status_index())
+            assert 2 == m_parse.call_count
+
+    def test_installed_packages_and_is_installed(self, dpkg_status):
+        assert ["a", "b", "libd1"] == sorted(get_installed_packages())
+        assert is_installed("a")
+        assert not is_installed("c")
+
+
+class TestGetAptConfigFingerprint:
+    def test_fingerprint_changes_with_sources_and_preferences(self, tmpdir):
+        sources_list = tmpdir.join("sources.list")
+        sources_dir = tmpdir.mkdir("sources.list.d")
+        preferences_dir = tmpdir.mkdir("preferences.d")
+        sources_list.write("deb http://archive.ubuntu.com/ubuntu focal main")
+        with mock.patch(
+            "uaclient.apt.APT_SOURCES_PATHS",
+            (sources_list.strpath, sources_dir.strpath),
+        ), mock.patch(
+            "uaclient.apt.APT_PREFERENCES_PATHS",
+            (tmpdir.join("preferences").strpath, preferences_dir.strpath),
+        ):
+            fingerprints = [get_apt_config_fingerprint()]
+            assert fingerprints[0] == get_apt_config_fingerprint()
+
+            sources_dir.join("ubuntu-esm-infra.list").write("deb ...")
+            fingerprints.append(get_apt_config_fingerprint())
+            preferences_dir.join("ubuntu-esm-infra").write("Pin: ...")
+            fingerprints.append(get_apt_config_fingerprint())
+            sources_list.write("deb http://archive.ubuntu.com/ubuntu jammy")
+            fingerprints.append(get_apt_config_fingerprint())
+
+        assert 4 == len(set(repr(f) for f in fingerprints))
+
+
+APT_POLICY_OUTPUT = """\
+Package files:
+ 100 /var/lib/dpkg/status
+     release a=now
+ 510 https://esm.ubuntu.com/infra/ubuntu focal-infra-security/main all Packages
+     release v=20.04,o=UbuntuESM,a=focal-infra-security,n=focal,c=main,b=amd64
+     origin esm.ubuntu.com
+-32768 https://esm.ubuntu.com/apps/ubuntu/ focal-apps-updates/main all Packages
+     release v=20.04,o=UbuntuESMApps,a=focal-apps-updates,n=focal,c=main
+     origin esm.ubuntu.com
+ 500 http://archive.ubuntu.com/ubuntu focal/universe amd64 Packages
+     release v=20.04,o=Ubuntu,a=focal,n=focal,l=Ubuntu,c=universe,b=amd64
+     origin archive.ubuntu.com
+ 500 http://archive.ubuntu.com/ubuntu focal/main amd64 Packages
+     release v=20.04,o=Ubuntu,a=focal,n=focal,l=Ubuntu,c=main,b=amd64
+     origin archive.ubuntu.com
+Pinned packages:
+     ubuntu-advantage-tools -> 27.11 with priority 1001
+"""
+
+
+class TestAptPolicy:
+    def test_from_output_indexes_package_files_by_url(self):
+        policy = AptPolicy.from_output(APT_POLICY_OUTPUT)
+
+        assert 5 == len(policy.sources)
+        assert [
+            AptPolicySource(
+                pin=510,
+                url="https://esm.ubuntu.com/infra/ubuntu",
+                suite="focal-infra-security",
+                component="main",
+                origin="UbuntuESM",
+                site="esm.ubuntu.com",
+            )
+        ] == policy.get_sources("https://esm.ubuntu.com/infra/ubuntu/")
+        assert [-32768] == [
+            source.pin
+            for source in policy.get_sources(
+                "https://esm.ubuntu.com/apps/ubuntu"
+            )
+        ]
+        assert ["universe", "main"] == [
+            source.component
+            for source in policy.get_sources(
+                "http://archive.ubuntu.com/ubuntu"
+            )
+        ]
+        assert [] == policy.get_sources("https://esm.ubuntu.com/ubuntu")
 
-    @mock.patch("uaclient.apt.system.subp", return_value=("", ""))
-    def test_empty_output_means_empty_list(self, m_subp):
-        assert [] == get_installed_packages()
+    @mock.patch("uaclient.apt.system.get_file_fingerprint")
+    @mock.patch("uaclient.apt.get_apt_config_fingerprint")
+    @mock.patch("uaclient.apt.system.subp")
+    def test_policy_is_parsed_again_when_apt_config_changes(
+        self, m_subp, m_fingerprint, _m_file_fingerprint
+    ):
+        m_subp.side_effect = [
+            (APT_POLICY_OUTPUT, ""),
+            ("", ""),
+            ("update", ""),
+            (APT_POLICY_OUTPUT, ""),
+        ]
+        m_fingerprint.return_value = [[1, 2]]
 
-    @mock.patch("uaclient.apt.system.subp", return_value=("a\nb\n", ""))
-    def test_lines_are_split(self, m_subp):
-        assert ["a", "b"] == get_installed_packages()
+        policy = get_apt_policy()
+        assert policy is get_apt_policy()
+        assert 1 == m_subp.call_count
 
-    @mock.patch("uaclient.apt.system.subp", return_value=("a\nb", ""))
-    def test_assert_missing_eof_newline_works(self, m_subp):
-        assert ["a", "b"] == get_installed_packages()
+        m_fingerprint.return_value = [[1, 2], [3, 4]]
+        assert [] == get_apt_policy().sources
+        assert 2 == m_subp.call_count
+
+        run_apt_update_command()
+        assert 5 == len(get_apt_policy().sources)
+        assert 4 == m_subp.call_count
 
 
 class TestRunAptCommand:
@@ -1049,11 +1221,11 @@ class TestAptIsInstalled:
             (False, ("foo", "bar")),
         ),
     )
-    @mock.patch("uaclient.apt.get_installed_packages")
+    @mock.patch("uaclient.apt.get_dpkg_status_index")
     def test_is_installed_pkgs(
-        self, m_get_installed_pkgs, expected, installed_pkgs
+        self, m_get_dpkg_status_index, expected, installed_pkgs
     ):
-        m_get_installed_pkgs.return_value = installed_pkgs
+        m_get_dpkg_status_index.return_value = dict.fromkeys(installed_pkgs)
         assert expected == is_installed("test")
 
 
@@ -1079,6 +1251,200 @@ class TestCompareVersion:
         with mock.patch("uaclient.system._subp", side_effect=_subp):
             assert expected_result is compare_versions(ver1, ver2, relation)
 
+    @pytest.mark.parametrize(
+        "ver1,ver2,relation,expected_result",
+        (
+            ("1.0", "1.0-0", "eq", True),
+            ("0:1.0", "1.0", "eq", True),
+            ("1:0.9", "2.0", "gt", True),
+            ("1.0~~", "1.0~", "<<", True),
+            ("1.0~", "1.0", "<<", True),
+            ("1.0", "1.0a", "<<", True),
+            ("1.0a", "1.0+", "<<", True),
+            ("1.00", "1.0", "=", True),
+            ("1.0-1ubuntu1.1", "1.0-1ubuntu1", ">>", True),
+            ("1.2.3-4-5", "1.2.3-4", "gt", True),
+            ("1.0", "1.0", "ne", False),
+            ("1.0-", "1.0", "eq", False),
+            ("x:1.0", "1.0", "eq", False),
+            # Empty versions are lower than any other, as for dpkg
+            ("", "1.0", "lt", True),
+            ("", "0~", "lt", True),
+            ("1.0", "", "gt", True),
+            ("", "", "eq", True),
+            ("<unknown>", "", "eq", True),
+            (" ", "1.0", "lt", False),
+        ),
+    )
+    def test_compare_versions_without_dpkg(
+        self, ver1, ver2, relation, expected_result
+    ):
+        """compare_versions follows dpkg ordering without forking dpkg."""
+        with mock.patch("uaclient.system.subp") as m_subp:
+            assert expected_result is compare_versions(ver1, ver2, relation)
+        assert 0 == m_subp.call_count
+
+    def test_compare_versions_invalid_relation(self):
+        with pytest.raises(ValueError):
+            compare_versions("1.0", "2.0", "less")
+
+    @pytest.mark.skipif(
+        not os.path.exists("/usr/bin/dpkg"), reason="dpkg is not available"
+    )
+    def test_version_ordering_matches_dpkg(self, _subp):
+        """Sorting with DebianVersion agrees with dpkg --compare-versions."""
+        versions = [
+            "2:4.3.11+dfsg-0ubuntu0.16.04.30",
+            "1.0-1ubuntu1",
+            "1.0~rc1",
+            "2.1~18.04.1",
+            "1.0-1~bpo1",
+            "1.0.1",
+            "2.10",
+            "1.0+b1",
+            "1.0a",
+            "2:4.3.11+dfsg-0ubuntu0.16.04.3",
+            "1.0~~",
+            "1:0.9",
+            "1.0-1",
+            "2.9",
+            "1.0",
+            "2.1",
+        ]
+        ordered = sorted(versions, key=parse_version)
+        for lower, higher in zip(ordered, ordered[1:]):
+            _subp(["dpkg", "--compare-versions", lower, "le", higher])
+
+    def test_debian_version_parts(self):
+        version = parse_version("2:4.3.11+dfsg-0ubuntu0.16.04.30")
+        assert isinstance(version, DebianVersion)
+        assert 2 == version.epoch
+        assert "4.3.11+dfsg" == version.upstream
+        assert "0ubuntu0.16.04.30" == version.revision
+        assert "2:4.3.11+dfsg-0ubuntu0.16.04.30" == str(version)
+
+
+class TestDebianVersion:
+    @pytest.mark.parametrize(
+        "version,epoch,upstream,revision",
+        (
+            ("1.0", 0, "1.0", ""),
+            ("0:1.0", 0, "1.0", ""),
+            ("10:1.0-1", 10, "1.0", "1"),
+            ("1:2.0:1-1", 1, "2.0:1", "1"),
+            ("1.2-3-4", 0, "1.2-3", "4"),
+            ("1.0~rc1-0ubuntu1~ppa1", 0, "1.0~rc1", "0ubuntu1~ppa1"),
+        ),
+    )
+    def test_from_string(self, version, epoch, upstream, revision):
+        """Epochs split on the first colon, revisions on the last hyphen."""
+        parsed = DebianVersion.from_string(version)
+        assert epoch == parsed.epoch
+        assert upstream == parsed.upstream
+        assert revision == parsed.revision
+
+    @pytest.mark.parametrize(
+        "version", ("", " ", "1.0 1", "x:1.0", "1:", ":1.0", "-1", "1.0-")
+    )
+    def test_from_string_rejects_invalid_versions(self, version):
+        with pytest.raises(ValueError):
+            DebianVersion.from_string(version)
+
+    @pytest.mark.parametrize(
+        "lower,higher",
+        (
+            # The epoch takes precedence over everything else
+            ("9.9-9", "1:0.1"),
+            ("1:9.9", "2:0.1"),
+            ("1:2.0-1", "10:1.0-1"),
+            # ~ sorts before anything, even the end of the version
+            ("1.0~~", "1.0~"),
+            ("1.0~~a", "1.0~"),
+            ("1.0~", "1.0"),
+            ("1.0~rc1", "1.0"),
+            ("1.0-1~bpo1", "1.0-1"),
+            ("1.0-0ubuntu1~18.04.1", "1.0-0ubuntu1"),
+            # Hyphens belong to the upstream version but the last one
+            ("1.2-3-4", "1.2-3-5"),
+            ("1.2-3-4", "1.2-4-1"),
+            ("1.2-3", "1.2-3-1"),
+            ("1.2-10", "1.2-10-1"),
+        ),
+    )
+    def test_ordering(self, lower, higher):
+        assert parse_version(lower) < parse_version(higher)
+        assert parse_version(higher) > parse_version(lower)
+        assert parse_version(lower) != parse_version(higher)
+
+    @pytest.mark.parametrize(
+        "version1,version2",
+        (
+            ("0:1.0", "1.0"),
+            ("1.0", "1.0-0"),
+            ("1.00", "1.0"),
+            ("01:1", "1:1"),
+            ("1.", "1.0"),
+            ("1.0a0", "1.0a"),
+        ),
+    )
+    def test_equal_versions_hash_equal(self, version1, version2):
+        assert parse_version(version1) == parse_version(version2)
+        assert hash(parse_version(version1)) == hash(parse_version(version2))
+        assert 1 == len({parse_version(version1), parse_version(version2)})
+
+    def test_different_versions_hash_apart(self):
+        versions = ["1.0", "1.1", "1.0-1", "1.0~", "1.0a", "2.0", "1:1.0"]
+        assert len(versions) == len(
+            {hash(parse_version(version)) for version in versions}
+        )
+
+    @pytest.mark.skipif(
+        not os.path.exists("/usr/bin/dpkg"), reason="dpkg is not available"
+    )
+    def test_compare_matches_dpkg_on_every_pair(self):
+        """Each pair of the corpus compares as dpkg --compare-versions."""
+        corpus = [
+            "",
+            "0",
+            "1.0",
+            "1.0-0",
+            "0:1.0-1",
+            "1:0.9",
+            "2:0",
+            "1.0~",
+            "1.0~~",
+            "1.0~rc1-1",
+            "1.0-1~bpo1",
+            "1.0+b1",
+            "1.0a",
+            "1.0.1",
+            "1.00",
+            "1.2-3-4",
+            "1.2-3-4~ppa1",
+            "1.2-10",
+            "1.2-3",
+            "1.10",
+            "1.9",
+            "1:2.0:1-1",
+            "2.1~18.04.1",
+            "4.3.11+dfsg-0ubuntu0.16.04.30",
+            "4.3.11+dfsg-0ubuntu0.16.04.3",
+        ]
+        relations = {-1: "lt", 0: "eq", 1: "gt"}
+        for index, version1 in enumerate(corpus):
+            for version2 in corpus[index:]:
+                result = version_compare(version1, version2)
+                relation = relations[(result > 0) - (result < 0)]
+                assert 0 == subprocess.call(
+                    [
+                        "dpkg",
+                        "--compare-versions",
+                        version1,
+                        relation,
+                        version2,
+                    ]
+                ), "{} {} {}".format(version1, relation, version2)
+
 
 class TestAptCacheTime:
     @pytest.mark.parametrize(
@@ -557,10 +557,13 @@ class TestActionAttach:
         cfg = FakeConfig()
 
         m_enable_order.return_value = ["test1", "test2"]
-        m_process_entitlement_delta.side_effect = [
-            ({"test": 123}, True),
-            UserFacingError("error"),
-        ]
+
+        def process_entitlement_delta(cfg, orig_access, new_access, **kwargs):
+            if new_access["entitlement"]["type"] == "test2":
+                raise UserFacingError("error")
+            return {"test": 123}, True
+
+        m_process_entitlement_delta.side_effect = process_entitlement_delta
         m_request_url.return_value = (
             {
                 "machineToken": "not-null",
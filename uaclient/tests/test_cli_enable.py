@@ -34,6 +34,14 @@ Flags:
 """
 
 
+@pytest.fixture(autouse=True)
+def m_prefetch_resource_machine_access():
+    with mock.patch(
+        "uaclient.cli.actions.prefetch_resource_machine_access"
+    ) as m_prefetch:
+        yield m_prefetch
+
+
 @mock.patch("uaclient.cli.os.getuid")
 @mock.patch("uaclient.contract.request_updated_contract")
 class TestActionEnable:
@@ -844,6 +852,7 @@ class TestActionEnable:
         allow_beta,
         event,
         FakeConfig,
+        m_prefetch_resource_machine_access,
     ):
         m_getuid.return_value = 0
         m_entitlement_cls = mock.Mock()
@@ -867,6 +876,9 @@ class TestActionEnable:
         ):
             ret = action_enable(args_mock, cfg)
 
+        assert [
+            mock.call(cfg, ["testitlement"])
+        ] == m_prefetch_resource_machine_access.call_args_list
         assert [
             mock.call(
                 cfg,
@@ -1,31 +1,47 @@
+import json
 import textwrap
 
 import mock
 import pytest
 
-from uaclient import exceptions
+from uaclient import exceptions, messages
 from uaclient.cli import action_fix, main
-from uaclient.security import FixStatus
+from uaclient.security import (
+    UBUNTU_STANDARD_UPDATES_POCKET,
+    FixPlan,
+    FixPlanUpgrade,
+    FixStatus,
+)
 
 M_PATH = "uaclient.cli."
 
 HELP_OUTPUT = textwrap.dedent(
     """\
-usage: pro fix <CVE-yyyy-nnnn+>|<USN-nnnn-d+> [flags]
+usage: pro fix <CVE-yyyy-nnnn+>|<USN-nnnn-d+>...|--file FILE|--plan FILE|--scan [flags]
 
 Inspect and resolve CVEs and USNs (Ubuntu Security Notices) on this machine.
 
 positional arguments:
-  security_issue  Security vulnerability ID to inspect and resolve on this
-                  system. Format: CVE-yyyy-nnnn, CVE-yyyy-nnnnnnn or USN-nnnn-
-                  dd
+  security_issue       Security vulnerability IDs to inspect and resolve on
+                       this system. Format: CVE-yyyy-nnnn, CVE-yyyy-nnnnnnn or
+                       USN-nnnn-dd
 
 Flags:
-  -h, --help      show this help message and exit
-  --dry-run       If used, fix will not actually run but will display
-                  everything that will happen on the machine during the
-                  command.
-"""
+  -h, --help           show this help message and exit
+  --file FILE          Also fix the security vulnerability IDs listed in this
+                       file, separated by whitespace. Lines starting with #
+                       are ignored.
+  --plan PLAN          Apply the fix plans in this file, as printed by --dry-
+                       run --format json, without inspecting the issues again.
+  --dry-run            If used, fix will not actually run but will display
+                       everything that will happen on the machine during the
+                       command.
+  --scan               Check every installed package against all USNs for this
+                       release and report the affected ones, without fixing
+                       them.
+  --format {cli,json}  output the fix in the specified format (default: cli).
+                       With --dry-run, json prints the plan of the fix
+"""  # noqa: E501
 )
 
 
@@ -67,7 +83,14 @@ class TestActionFix:
     ):
         """Check that root and non-root will emit attached status"""
         cfg = FakeConfig()
-        args = mock.MagicMock(security_issue=issue, dry_run=False)
+        args = mock.MagicMock(
+            security_issue=[issue],
+            file=None,
+            plan=None,
+            dry_run=False,
+            scan=False,
+            format="cli",
+        )
         m_fix_security_issue_id.return_value = FixStatus.SYSTEM_NON_VULNERABLE
         if is_valid:
             assert 0 == action_fix(args, cfg=cfg)
@@ -85,3 +108,225 @@ class TestActionFix:
 
             assert expected_msg == str(excinfo.value)
             assert 0 == m_fix_security_issue_id.call_count
+
+    @mock.patch("uaclient.security.fix_security_issue_id")
+    @mock.patch("uaclient.security.scan_security_issues")
+    def test_scan(self, m_scan, m_fix_security_issue_id, FakeConfig):
+        cfg = FakeConfig()
+        m_scan.return_value = FixStatus.SYSTEM_STILL_VULNERABLE
+
+        args = mock.MagicMock(
+            security_issue=[],
+            file=None,
+            plan=None,
+            dry_run=False,
+            scan=True,
+            format="cli",
+        )
+        assert 1 == action_fix(args, cfg=cfg)
+        assert [mock.call(cfg=cfg)] == m_scan.call_args_list
+
+        args.security_issue = ["USN-1234-1"]
+        with pytest.raises(exceptions.UserFacingError):
+            action_fix(args, cfg=cfg)
+
+        args = mock.MagicMock(
+            security_issue=[],
+            file=None,
+            plan=None,
+            dry_run=False,
+            scan=False,
+            format="cli",
+        )
+        with pytest.raises(exceptions.UserFacingError) as excinfo:
+            action_fix(args, cfg=cfg)
+        assert messages.SECURITY_FIX_MISSING_ISSUE == excinfo.value.msg
+        assert 1 == m_scan.call_count
+        assert 0 == m_fix_security_issue_id.call_count
+
+    @mock.patch("uaclient.security.fix_security_issue_ids")
+    def test_many_issues_from_args_and_file(
+        self, m_fix_security_issue_ids, FakeConfig, tmpdir
+    ):
+        cfg = FakeConfig()
+        issues_file = tmpdir.join("issues")
+        issues_file.write("# Issues to fix\nCVE-2020-1234 USN-1234-1\n\n")
+        args = mock.MagicMock(
+            security_issue=["USN-4321-1"],
+            file=issues_file.strpath,
+            plan=None,
+            dry_run=True,
+            scan=False,
+            format="cli",
+        )
+        m_fix_security_issue_ids.return_value = (
+            FixStatus.SYSTEM_VULNERABLE_UNTIL_REBOOT
+        )
+
+        assert 2 == action_fix(args, cfg=cfg)
+        assert [
+            mock.call(
+                cfg=cfg,
+                issue_ids=["USN-4321-1", "CVE-2020-1234", "USN-1234-1"],
+                dry_run=True,
+            )
+        ] == m_fix_security_issue_ids.call_args_list
+
+    def test_unreadable_issues_file(self, FakeConfig, tmpdir):
+        args = mock.MagicMock(
+            security_issue=[],
+            file=tmpdir.join("missing").strpath,
+            plan=None,
+            dry_run=False,
+            scan=False,
+            format="cli",
+        )
+        with pytest.raises(exceptions.UserFacingError) as excinfo:
+            action_fix(args, cfg=FakeConfig())
+        assert "Unable to read security issues from" in excinfo.value.msg
+
+    @mock.patch("uaclient.security.fix_security_issue_id")
+    @mock.patch("uaclient.security.plan_security_issues_fix")
+    def test_json_dry_run_prints_fix_plans(
+        self, m_plan, m_fix_security_issue_id, FakeConfig, capsys
+    ):
+        cfg = FakeConfig()
+        m_plan.return_value = [
+            FixPlan(
+                issue_id="CVE-2020-1234",
+                expected_status=FixStatus.SYSTEM_NON_VULNERABLE,
+                livepatch_version="87.1",
+            ),
+            FixPlan(
+                issue_id="USN-1234-1",
+                expected_status=FixStatus.SYSTEM_VULNERABLE_UNTIL_REBOOT,
+                upgrades=[
+                    FixPlanUpgrade(
+                        pocket=UBUNTU_STANDARD_UPDATES_POCKET,
+                        service=None,
+                        binary_packages=["linux-image-generic"],
+                    )
+                ],
+                reboot_required=True,
+            ),
+        ]
+        args = mock.MagicMock(
+            security_issue=["CVE-2020-1234", "USN-1234-1"],
+            file=None,
+            plan=None,
+            dry_run=True,
+            scan=False,
+            format="json",
+        )
+
+        assert 2 == action_fix(args, cfg=cfg)
+        assert [
+            mock.call(cfg=cfg, issue_ids=["CVE-2020-1234", "USN-1234-1"])
+        ] == m_plan.call_args_list
+        assert 0 == m_fix_security_issue_id.call_count
+        out, _err = capsys.readouterr()
+        plans = json.loads(out)
+        assert ["CVE-2020-1234", "USN-1234-1"] == [
+            plan["issue_id"] for plan in plans
+        ]
+        assert [0, 2] == [plan["expected_status"] for plan in plans]
+        assert m_plan.return_value[1].to_dict() == plans[1]
+        assert FixPlan.from_dict(plans[1]).to_dict() == plans[1]
+
+    @pytest.mark.parametrize("dry_run,scan", ((False, False), (True, True)))
+    def test_json_format_requires_dry_run(self, dry_run, scan, FakeConfig):
+        args = mock.MagicMock(
+            security_issue=[],
+            file=None,
+            plan=None,
+            dry_run=dry_run,
+            scan=scan,
+            format="json",
+        )
+        with pytest.raises(exceptions.UserFacingError) as excinfo:
+            action_fix(args, cfg=FakeConfig())
+        assert messages.SECURITY_FIX_JSON_DRY_RUN == excinfo.value.msg
+
+    @mock.patch("uaclient.security.plan_security_issues_fix")
+    @mock.patch("uaclient.security.apply_fix_plans")
+    def test_plan_file_is_applied(
+        self, m_apply_fix_plans, m_plan, FakeConfig, tmpdir
+    ):
+        plans = [
+            FixPlan(
+                issue_id="USN-1234-1",
+                expected_status=FixStatus.SYSTEM_NON_VULNERABLE,
+                upgrades=[
+                    FixPlanUpgrade(
+                        pocket=UBUNTU_STANDARD_UPDATES_POCKET,
+                        service=None,
+                        binary_packages=["curl"],
+                    )
+                ],
+            )
+        ]
+        plan_file = tmpdir.join("plan.json")
+        plan_file.write(json.dumps([plan.to_dict() for plan in plans]))
+        cfg = FakeConfig()
+        args = mock.MagicMock(
+            security_issue=[],
+            file=None,
+            plan=plan_file.strpath,
+            dry_run=False,
+            scan=False,
+            format="cli",
+        )
+        m_apply_fix_plans.return_value = FixStatus.SYSTEM_NON_VULNERABLE
+
+        assert 0 == action_fix(args, cfg=cfg)
+        assert 1 == m_apply_fix_plans.call_count
+        assert cfg == m_apply_fix_plans.call_args[1]["cfg"]
+        assert False is m_apply_fix_plans.call_args[1]["dry_run"]
+        assert [plan.to_dict() for plan in plans] == [
+            plan.to_dict() for plan in m_apply_fix_plans.call_args[1]["plans"]
+        ]
+        assert 0 == m_plan.call_count
+
+    @pytest.mark.parametrize(
+        "security_issue,scan,format",
+        (
+            (["USN-1234-1"], False, "cli"),
+            ([], True, "cli"),
+            ([], False, "json"),
+        ),
+    )
+    def test_plan_file_excludes_other_issues(
+        self, security_issue, scan, format, FakeConfig, tmpdir
+    ):
+        plan_file = tmpdir.join("plan.json")
+        plan_file.write("[]")
+        args = mock.MagicMock(
+            security_issue=security_issue,
+            file=None,
+            plan=plan_file.strpath,
+            dry_run=True,
+            scan=scan,
+            format=format,
+        )
+        with pytest.raises(exceptions.UserFacingError) as excinfo:
+            action_fix(args, cfg=FakeConfig())
+        assert messages.SECURITY_FIX_PLAN_WITH_ISSUE == excinfo.value.msg
+
+    @pytest.mark.parametrize(
+        "content", (None, "not json", '{"issue_id": "USN-1234-1"}')
+    )
+    def test_invalid_plan_file(self, content, FakeConfig, tmpdir):
+        plan_file = tmpdir.join("plan.json")
+        if content is not None:
+            plan_file.write(content)
+        args = mock.MagicMock(
+            security_issue=[],
+            file=None,
+            plan=plan_file.strpath,
+            dry_run=False,
+            scan=False,
+            format="cli",
+        )
+        with pytest.raises(exceptions.UserFacingError) as excinfo:
+            action_fix(args, cfg=FakeConfig())
+        assert "Unable to read fix plans from" in excinfo.value.msg
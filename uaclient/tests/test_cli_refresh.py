@@ -5,20 +5,23 @@ from uaclient import exceptions, messages
 from uaclient.cli import action_refresh, main
 
 HELP_OUTPUT = """\
-usage: pro refresh [contract|config|messages] [flags]
+usage: pro refresh [contract|config|messages|security] [flags]
 
-Refresh three distinct Ubuntu Pro related artifacts in the system:
+Refresh distinct Ubuntu Pro related artifacts in the system:
 
 * contract: Update contract details from the server.
 * config:   Reload the config file.
 * messages: Update APT and MOTD messages related to UA.
+* security: Download security notices used by `pro fix` to a local
+            database.
 
-You can individually target any of the three specific actions,
+You can individually target any of the specific actions,
 by passing it's target to nome to the command.  If no `target`
-is specified, all targets are refreshed.
+is specified, the contract, config and messages targets are
+refreshed.
 
 positional arguments:
-  {contract,config,messages}
+  {contract,config,messages,security}
                         Target to refresh.
 
 Flags:
@@ -199,6 +202,35 @@ class TestActionRefresh:
         assert [mock.call(cfg)] == m_update_motd.call_args_list
         assert [mock.call()] == m_refresh_motd.call_args_list
 
+    @mock.patch("logging.exception")
+    @mock.patch("uaclient.security.update_security_db")
+    def test_refresh_security_error(
+        self, m_update_security_db, _m_logging_error, getuid, FakeConfig
+    ):
+        """On failure to reach the Security API emit an error."""
+        m_update_security_db.side_effect = exceptions.UrlError(
+            mock.MagicMock()
+        )
+
+        with pytest.raises(exceptions.UserFacingError) as excinfo:
+            action_refresh(mock.MagicMock(target="security"), cfg=FakeConfig())
+
+        assert messages.REFRESH_SECURITY_FAILURE == excinfo.value.msg
+
+    @mock.patch("uaclient.security.update_security_db", return_value=3)
+    def test_refresh_security_happy_path(
+        self, m_update_security_db, getuid, capsys, FakeConfig
+    ):
+        cfg = FakeConfig()
+        ret = action_refresh(mock.MagicMock(target="security"), cfg=cfg)
+
+        assert 0 == ret
+        assert (
+            messages.REFRESH_SECURITY_SUCCESS.format(count=3)
+            in capsys.readouterr()[0]
+        )
+        assert [mock.call(cfg)] == m_update_security_db.call_args_list
+
     @mock.patch("logging.exception")
     @mock.patch(
         "uaclient.config.UAConfig.process_config", side_effect=RuntimeError()
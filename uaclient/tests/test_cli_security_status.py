@@ -1,3 +1,4 @@
+import json
 import re
 import textwrap
 
@@ -15,7 +16,7 @@ M_PATH = "uaclient.cli."
 
 HELP_OUTPUT = textwrap.dedent(
     """\
-usage: security-status \[-h\] --format {json,yaml}
+usage: security-status \[-h\] --format {json,yaml,ndjson}
 
 Show security updates for packages in the system, including all
 available ESM related content.
@@ -33,7 +34,10 @@ complete status on Ubuntu Pro services, run 'pro status'
 
 (optional arguments|options):
   -h, --help            show this help message and exit
-  --format {json,yaml}  Format for the output \(json or yaml\)
+  --format {json,yaml,ndjson}
+                        Format for the output \(json, yaml or ndjson\). ndjson
+                        prints one package per line as it is found and the
+                        summary last
 """  # noqa
 )
 
@@ -57,35 +61,95 @@ class TestActionSecurityStatus:
         out, _err = capsys.readouterr()
         assert re.match(HELP_OUTPUT, out)
 
-    @pytest.mark.parametrize("output_format", ("json", "yaml"))
     @mock.patch(M_PATH + "yaml.safe_dump")
-    @mock.patch(M_PATH + "json.dumps")
-    def test_action_security_status(
+    def test_action_security_status_yaml(
         self,
-        m_dumps,
         m_safe_dump,
         _m_resources,
         m_security_status,
-        output_format,
         FakeConfig,
     ):
         cfg = FakeConfig()
         args = mock.MagicMock()
-        args.format = output_format
+        args.format = "yaml"
         action_security_status(args, cfg=cfg)
 
-        if output_format == "json":
-            assert m_dumps.call_args_list == [
-                mock.call(m_security_status.return_value)
-            ]
-            assert m_safe_dump.call_count == 0
-        else:
-            assert m_safe_dump.call_args_list == [
-                mock.call(
-                    m_security_status.return_value, default_flow_style=False
-                )
-            ]
-            assert m_dumps.call_count == 0
+        assert m_safe_dump.call_args_list == [
+            mock.call(m_security_status.return_value, default_flow_style=False)
+        ]
+
+    @pytest.mark.parametrize("num_packages", (0, 1, 3))
+    @mock.patch(M_PATH + "security_status.get_security_status")
+    def test_action_security_status_json(
+        self,
+        m_get_security_status,
+        _m_resources,
+        m_security_status,
+        num_packages,
+        capsys,
+        FakeConfig,
+    ):
+        summary = {"ua": {"attached": False}, "num_installed_packages": 3}
+        packages = [
+            {"package": "pkg{}".format(i), "version": "1.0"}
+            for i in range(num_packages)
+        ]
+        m_get_security_status.return_value = summary, iter(packages)
+        args = mock.MagicMock()
+        args.format = "json"
+        action_security_status(args, cfg=FakeConfig())
+
+        out, _err = capsys.readouterr()
+        assert (
+            json.dumps(
+                {
+                    "_schema_version": "0.1",
+                    "summary": summary,
+                    "packages": packages,
+                }
+            )
+            + "\n"
+            == out
+        )
+        assert 0 == m_security_status.call_count
+
+    @mock.patch(M_PATH + "security_status.iter_security_status")
+    def test_action_security_status_ndjson(
+        self,
+        m_iter_security_status,
+        _m_resources,
+        m_security_status,
+        capsys,
+        FakeConfig,
+    ):
+        summary = {"ua": {"attached": False}, "num_installed_packages": 3}
+        packages = [
+            {"package": "pkg{}".format(i), "version": "1.0"} for i in range(2)
+        ]
+
+        written = []
+
+        def iter_records():
+            for package in packages:
+                # What was printed before each record is produced
+                written.append(capsys.readouterr()[0])
+                yield "package", package
+            written.append(capsys.readouterr()[0])
+            yield "summary", summary
+
+        m_iter_security_status.return_value = iter_records()
+        args = mock.MagicMock()
+        args.format = "ndjson"
+        action_security_status(args, cfg=FakeConfig())
+        written.append(capsys.readouterr()[0])
+
+        assert [
+            [],
+            [packages[0]],
+            [packages[1]],
+            [{"_schema_version": "0.1", "summary": summary}],
+        ] == [[json.loads(line) for line in w.splitlines()] for w in written]
+        assert 0 == m_security_status.call_count
 
     # Remove this once we have human-readable text
     @pytest.mark.parametrize("with_wrong_format", (False, True))
@@ -111,12 +175,12 @@ class TestActionSecurityStatus:
 
         _, err = capsys.readouterr()
 
-        assert "usage: security-status [-h] --format {json,yaml}" in err
+        assert "usage: security-status [-h] --format {json,yaml,ndjson}" in err
 
         if with_wrong_format:
             assert (
                 "argument --format: invalid choice: 'unsupported'"
-                " (choose from 'json', 'yaml')"
+                " (choose from 'json', 'yaml', 'ndjson')"
             ) in err
         else:
             assert "the following arguments are required: --format" in err
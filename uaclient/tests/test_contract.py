@@ -1,7 +1,9 @@
 import copy
 import json
 import logging
+import os
 import socket
+import threading
 
 import mock
 import pytest
@@ -14,12 +16,16 @@ from uaclient.contract import (
     API_V1_TMPL_CONTEXT_MACHINE_TOKEN_RESOURCE,
     API_V1_TMPL_RESOURCE_MACHINE_ACCESS,
     UAContractClient,
+    _get_delta_dependencies,
     _get_override_weight,
     apply_contract_overrides,
     get_available_resources,
     get_contract_information,
+    get_resource_machine_access,
     is_contract_changed,
+    prefetch_resource_machine_access,
     process_entitlement_delta,
+    process_entitlements_delta,
     request_updated_contract,
 )
 from uaclient.entitlements.base import UAEntitlement
@@ -580,6 +586,110 @@ class TestProcessEntitlementDeltas:
         assert 0 == m_process_contract_deltas.call_count
 
 
+@mock.patch(M_PATH + "process_entitlement_delta")
+@mock.patch("uaclient.entitlements.entitlements_enable_order")
+class TestProcessEntitlementsDelta:
+    def test_unrelated_services_are_processed_concurrently(
+        self, m_enable_order, m_process_entitlement_delta, FakeConfig
+    ):
+        # Each delta waits for the other, so they must be processed at once
+        barrier = threading.Barrier(2, timeout=5)
+
+        def process(cfg, orig_access, new_access, **kwargs):
+            barrier.wait()
+            if new_access["entitlement"]["type"] == "ent2":
+                raise exceptions.UserFacingError("broken ent2")
+            return {"entitlement": {"entitled": True}}, True
+
+        m_enable_order.return_value = ["ent1", "ent2", "ent3"]
+        m_process_entitlement_delta.side_effect = process
+        new_entitlements = {
+            name: {"entitlement": {"type": name}} for name in ("ent1", "ent2")
+        }
+
+        with pytest.raises(exceptions.UserFacingError) as exc:
+            process_entitlements_delta(
+                FakeConfig(), {}, new_entitlements, allow_enable=True
+            )
+        assert ATTACH_FAILURE_DEFAULT_SERVICES.msg == exc.value.msg
+        assert 2 == m_process_entitlement_delta.call_count
+
+    def test_related_services_are_processed_in_enable_order(
+        self, m_enable_order, m_process_entitlement_delta, FakeConfig
+    ):
+        names = ["esm-infra", "esm-apps", "ros", "livepatch", "fips"]
+        steps = []
+        lock = threading.Lock()
+
+        def process(cfg, orig_access, new_access, **kwargs):
+            name = new_access["entitlement"]["type"]
+            with lock:
+                steps.append(("start", name))
+            with lock:
+                steps.append(("end", name))
+            return {}, False
+
+        m_enable_order.return_value = names
+        m_process_entitlement_delta.side_effect = process
+        new_entitlements = {
+            name: {"entitlement": {"type": name}} for name in names
+        }
+
+        process_entitlements_delta(
+            FakeConfig(), {}, new_entitlements, allow_enable=True
+        )
+
+        assert {
+            "esm-infra": set(),
+            "esm-apps": set(),
+            "ros": {"esm-infra", "esm-apps"},
+            "livepatch": set(),
+            "fips": {"livepatch"},
+        } == _get_delta_dependencies(FakeConfig(), names)
+        for first, last in (
+            ("esm-infra", "ros"),
+            ("esm-apps", "ros"),
+            ("livepatch", "fips"),
+        ):
+            assert steps.index(("end", first)) < steps.index(("start", last))
+
+    def test_service_output_is_printed_in_enable_order(
+        self,
+        m_enable_order,
+        m_process_entitlement_delta,
+        FakeConfig,
+        event,
+        capsys,
+    ):
+        ent2_done = threading.Event()
+
+        def process(cfg, orig_access, new_access, **kwargs):
+            name = new_access["entitlement"]["type"]
+            if name == "ent1":
+                # Let ent2 finish and print first
+                assert ent2_done.wait(timeout=5)
+            event.info("Updating {}".format(name))
+            event.info("{} updated".format(name))
+            if name == "ent2":
+                ent2_done.set()
+            return {}, False
+
+        m_enable_order.return_value = ["ent1", "ent2"]
+        m_process_entitlement_delta.side_effect = process
+        new_entitlements = {
+            name: {"entitlement": {"type": name}} for name in ("ent1", "ent2")
+        }
+
+        process_entitlements_delta(
+            FakeConfig(), {}, new_entitlements, allow_enable=True
+        )
+
+        out, _ = capsys.readouterr()
+        assert (
+            "Updating ent1\nent1 updated\nUpdating ent2\nent2 updated\n" == out
+        )
+
+
 class TestGetAvailableResources:
     @mock.patch.object(UAContractClient, "request_resources")
     def test_request_resources_error_on_network_disconnected(
@@ -808,10 +918,15 @@ class TestRequestUpdatedContract:
             },
         }
         m_enable_order.return_value = ["ent2", "ent1"]
+        new_token = copy.deepcopy(machine_token)
+        for entitlement in new_token["machineTokenInfo"]["contractInfo"][
+            "resourceEntitlements"
+        ]:
+            entitlement["new"] = "newval"
 
         def fake_contract_client(cfg):
             fake_client = FakeContractClient(cfg)
-            fake_client._responses = {self.refresh_route: machine_token}
+            fake_client._responses = {self.refresh_route: new_token}
             return fake_client
 
         client.side_effect = fake_contract_client
@@ -901,9 +1016,13 @@ class TestRequestUpdatedContract:
         cfg = FakeConfig.for_attached_machine(
             machine_token=machine_token,
         )
+        new_token = copy.deepcopy(machine_token)
+        new_token["machineTokenInfo"]["contractInfo"]["resourceEntitlements"][
+            2
+        ]["new"] = "newval"
         fake_client = FakeContractClient(cfg)
         fake_client._responses = {
-            self.refresh_route: machine_token,
+            self.refresh_route: new_token,
             self.access_route_ent1: {
                 "entitlement": {
                     "entitled": True,
@@ -931,12 +1050,7 @@ class TestRequestUpdatedContract:
         m_enable_order,
         FakeConfig,
     ):
-        """When attached, refresh machine token and entitled services.
-
-        Processing service deltas are processed in a sorted order based on
-        service dependencies to ensure operations occur the same regardless
-        of dict ordering.
-        """
+        """When attached, refresh machine token and entitled services."""
         m_enable_order.return_value = ["ent2", "ent1"]
 
         machine_token = {
@@ -997,7 +1111,52 @@ class TestRequestUpdatedContract:
                 series_overrides=True,
             ),
         ]
-        assert process_calls == process_entitlement_delta.call_args_list
+        # Unrelated services are processed concurrently, in any order
+        assert 2 == process_entitlement_delta.call_count
+        for process_call in process_calls:
+            assert process_call in process_entitlement_delta.call_args_list
+
+    @mock.patch(M_PATH + "process_entitlements_delta")
+    @mock.patch("uaclient.system.get_machine_id", return_value="mid")
+    @mock.patch(M_PATH + "UAContractClient")
+    def test_unchanged_machine_token_only_updates_its_expiry(
+        self, client, _m_get_machine_id, m_process_deltas, FakeConfig
+    ):
+        """Only the expiry of an unchanged token differs, no deltas."""
+        cfg = FakeConfig.for_attached_machine()
+        public_content = cfg.machine_token_file.public_file.read()
+        new_token = json.loads(cfg.machine_token_file.private_file.read())
+        new_token["expires"] = "Thu, 08 Oct 2026 10:00:00 GMT"
+
+        def fake_contract_client(cfg):
+            client = FakeContractClient(cfg)
+            client._responses = {self.refresh_route: new_token}
+            return client
+
+        client.side_effect = fake_contract_client
+        with mock.patch.object(
+            cfg.machine_token_file, "write"
+        ) as m_write, mock.patch(
+            "uaclient.files.MachineTokenFile.get_entitlements_from_token"
+        ) as m_get_entitlements, mock.patch.object(
+            FakeContractClient, "_get_activity_info", return_value={}
+        ):
+            assert None is request_updated_contract(cfg)
+
+        assert 0 == m_write.call_count
+        assert 0 == m_get_entitlements.call_count
+        assert 0 == m_process_deltas.call_count
+        assert new_token == json.loads(
+            cfg.machine_token_file.private_file.read()
+        )
+        assert public_content == cfg.machine_token_file.public_file.read()
+
+        # The same expiry again leaves the token file alone
+        with mock.patch.object(
+            cfg.machine_token_file.private_file, "write"
+        ) as m_private_write:
+            assert None is request_updated_contract(cfg)
+        assert 0 == m_private_write.call_count
 
 
 @mock.patch("uaclient.contract.UAContractClient.get_updated_contract_info")
@@ -1045,6 +1204,120 @@ class TestContractChanged:
         cfg = FakeConfig().for_attached_machine()
         assert is_contract_changed(cfg) == has_contract_changed
 
+    @mock.patch("uaclient.contract._is_contract_changed", return_value=True)
+    def test_contract_checked_once_per_interval(
+        self, m_is_contract_changed, get_updated_contract_info, FakeConfig
+    ):
+        get_updated_contract_info.return_value = {"machineTokenInfo": {}}
+        cfg = FakeConfig().for_attached_machine()
+        cfg.cfg["ua_config"] = {"contract_check_interval": 600}
+
+        with mock.patch("time.time", return_value=1000):
+            assert is_contract_changed(cfg)
+            assert is_contract_changed(cfg)
+        assert 1 == get_updated_contract_info.call_count
+        assert os.path.exists(cfg.data_path("contract-check"))
+
+        # The server returned the same contract, so it is not compared again
+        with mock.patch("time.time", return_value=1600):
+            assert is_contract_changed(cfg)
+        assert 2 == get_updated_contract_info.call_count
+        assert 1 == m_is_contract_changed.call_count
+
+        # A new machine token is always checked
+        cfg.machine_token_file.write(
+            dict(cfg.machine_token, machineToken="new-token")
+        )
+        with mock.patch("time.time", return_value=1601):
+            assert is_contract_changed(cfg)
+        assert 3 == get_updated_contract_info.call_count
+        assert 2 == m_is_contract_changed.call_count
+
+    def test_contract_not_checked_before_it_expires(
+        self, get_updated_contract_info, FakeConfig
+    ):
+        get_updated_contract_info.return_value = {
+            "machineTokenInfo": {},
+            # 86400 seconds after the epoch
+            "expires": "Fri, 02 Jan 1970 00:00:00 GMT",
+        }
+        cfg = FakeConfig().for_attached_machine()
+        cfg.cfg["ua_config"] = {"contract_check_interval": 600}
+
+        with mock.patch("time.time", return_value=1000):
+            is_contract_changed(cfg)
+        with mock.patch("time.time", return_value=86399):
+            is_contract_changed(cfg)
+        assert 1 == get_updated_contract_info.call_count
+        with mock.patch("time.time", return_value=86400):
+            is_contract_changed(cfg)
+        assert 2 == get_updated_contract_info.call_count
+
+
+@mock.patch("uaclient.system.get_machine_id", return_value="mid")
+@mock.patch(
+    "uaclient.contract.UAContractClient.request_resource_machine_access"
+)
+class TestResourceMachineAccess:
+    def test_prefetch_requests_resources_concurrently(
+        self, m_request, _m_get_machine_id, FakeConfig
+    ):
+        # Each request waits for the other, so they must be made at once
+        barrier = threading.Barrier(2, timeout=5)
+
+        def request(machine_token, resource):
+            barrier.wait()
+            if resource == "cis":
+                raise exceptions.UrlError(Exception("timeout"))
+            return {"resourceToken": resource + "-token"}
+
+        m_request.side_effect = request
+        cfg = FakeConfig.for_attached_machine()
+
+        prefetch_resource_machine_access(cfg, ["esm-apps", "cis", "esm-apps"])
+        assert 2 == m_request.call_count
+
+        # Prefetched tokens are reused, failed ones are requested again
+        m_request.side_effect = None
+        m_request.return_value = {"resourceToken": "cis-token"}
+        assert {"resourceToken": "esm-apps-token"} == (
+            get_resource_machine_access(cfg, "not-null", "esm-apps")
+        )
+        assert {"resourceToken": "cis-token"} == (
+            get_resource_machine_access(cfg, "not-null", "cis")
+        )
+        assert [mock.call("not-null", "cis")] == m_request.call_args_list[2:]
+
+    @pytest.mark.parametrize("caplog_text", [logging.DEBUG], indirect=True)
+    def test_prefetch_failures_of_any_kind_are_only_logged(
+        self, m_request, _m_get_machine_id, FakeConfig, caplog_text
+    ):
+        def request(machine_token, resource):
+            if resource == "cis":
+                raise ValueError("invalid response")
+            return {"resourceToken": resource + "-token"}
+
+        m_request.side_effect = request
+        cfg = FakeConfig.for_attached_machine()
+
+        prefetch_resource_machine_access(cfg, ["esm-apps", "cis"])
+        assert 2 == m_request.call_count
+        assert (
+            "Unable to prefetch machine access to cis:"
+            " ValueError('invalid response'"
+        ) in caplog_text()
+        assert {"resourceToken": "esm-apps-token"} == (
+            get_resource_machine_access(cfg, "not-null", "esm-apps")
+        )
+        assert 2 == m_request.call_count
+
+    def test_prefetch_skips_single_resource(
+        self, m_request, _m_get_machine_id, FakeConfig
+    ):
+        cfg = FakeConfig.for_attached_machine()
+        prefetch_resource_machine_access(cfg, ["cis"])
+        assert 0 == m_request.call_count
+
 
 class TestApplyContractOverrides:
     @pytest.mark.parametrize(
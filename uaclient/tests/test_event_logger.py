@@ -165,3 +165,13 @@ class TestEventLogger:
             assert expected_machine_out == yaml.safe_load(
                 fake_stdout.getvalue().strip()
             )
+
+    def test_captured_info_is_printed_on_request(self, event, capsys):
+        info_messages = []
+        with event.capture_info(info_messages):
+            event.info("captured", end="")
+        event.info("first")
+        assert "first\n" == capsys.readouterr()[0]
+
+        event.print_info(info_messages)
+        assert "captured" == capsys.readouterr()[0]
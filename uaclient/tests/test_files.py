@@ -173,3 +173,23 @@ class TestMachineTokenFile:
         assert root_token != nonroot_token
         machine_token = nonroot_token.get("machineToken", None)
         assert machine_token is None
+
+    def test_write_expires_only_updates_the_private_file(self, tmpdir):
+        token_file = MachineTokenFile(directory=tmpdir.strpath)
+        token = {
+            "machineTokenInfo": {"machineId": "random-id"},
+            "machineToken": "token",
+        }
+        token_file.write(token)
+        public_content = token_file.public_file.read()
+
+        token_file.write_expires("Thu, 08 Oct 2026 10:00:00 GMT")
+
+        assert (
+            dict(token, expires="Thu, 08 Oct 2026 10:00:00 GMT")
+            == token_file.machine_token
+        )
+        assert public_content == token_file.public_file.read()
+        with mock.patch.object(token_file.private_file, "write") as m_write:
+            token_file.write_expires("Thu, 08 Oct 2026 10:00:00 GMT")
+        assert 0 == m_write.call_count
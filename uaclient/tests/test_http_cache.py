@@ -0,0 +1,71 @@
+import os
+
+import mock
+
+from uaclient.http_cache import HTTPResponseCache
+
+
+class TestHTTPResponseCache:
+    def test_entries_are_keyed_by_url_and_authorization(self, tmpdir):
+        cache = HTTPResponseCache(tmpdir.strpath)
+        cache.put(
+            "http://example.com/a",
+            {"Authorization": "Bearer 1"},
+            {"a": "b"},
+            {"ETag": '"v1"', "Last-Modified": "yesterday"},
+        )
+
+        cached = cache.get(
+            "http://example.com/a", {"Authorization": "Bearer 1"}
+        )
+        assert {"a": "b"} == cached.content
+        assert {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "yesterday",
+        } == cached.validator_headers()
+        assert cache.get("http://example.com/a", {}) is None
+        assert cache.get("http://example.com/b", {}) is None
+        for name in os.listdir(tmpdir.strpath):
+            assert 0o600 == os.stat(tmpdir.join(name).strpath).st_mode & 0o777
+
+    @mock.patch("uaclient.http_cache.time.time")
+    def test_freshness_follows_ttl(self, m_time, tmpdir):
+        cache = HTTPResponseCache(tmpdir.strpath)
+        m_time.return_value = 1000
+        cache.put("http://example.com/a", {}, "content", {})
+
+        m_time.return_value = 1059
+        cached = cache.get("http://example.com/a", {})
+        assert cached.is_fresh(60)
+        m_time.return_value = 1060
+        assert not cached.is_fresh(60)
+        cache.touch(cached)
+        assert cache.get("http://example.com/a", {}).is_fresh(60)
+
+    def test_least_recently_used_entries_are_evicted(self, tmpdir):
+        cache = HTTPResponseCache(tmpdir.strpath)
+        cache.put("http://example.com/a", {}, "a" * 100, {})
+        entry_size = os.path.getsize(
+            cache.get("http://example.com/a", {}).path
+        )
+        cache.max_size = 2 * entry_size + 10
+        cache.put("http://example.com/b", {}, "b" * 100, {})
+        a_path = cache.get("http://example.com/a", {}).path
+        os.utime(a_path, (0, 0))
+        cache.get("http://example.com/b", {})
+
+        cache.put("http://example.com/c", {}, "c" * 100, {})
+
+        assert cache.get("http://example.com/a", {}) is None
+        assert cache.get("http://example.com/b", {}) is not None
+        assert cache.get("http://example.com/c", {}) is not None
+
+    def test_invalidate_removes_matching_urls(self, tmpdir):
+        cache = HTTPResponseCache(tmpdir.strpath)
+        cache.put("http://example.com/a?x=1", {}, "a", {})
+        cache.put("http://example.com/b", {}, "b", {})
+
+        cache.invalidate("http://example.com/a")
+
+        assert cache.get("http://example.com/a?x=1", {}) is None
+        assert cache.get("http://example.com/b", {}) is not None
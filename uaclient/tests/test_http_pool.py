@@ -0,0 +1,122 @@
+import io
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib import error
+
+import mock
+import pytest
+
+from uaclient import http_pool, util
+
+M_PATH = "uaclient.http_pool."
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        code = 404 if self.path == "/missing" else 200
+        body = json.dumps({"port": self.client_address[1]}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = _Server(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(
+        target=server.serve_forever, args=(0.05,), daemon=True
+    )
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    pool = http_pool.HTTPConnectionPool(size=2, idle_timeout=30)
+    with mock.patch(M_PATH + "_pool", pool), mock.patch(
+        M_PATH + "_opener", None
+    ), mock.patch(M_PATH + "_proxies", {}):
+        yield pool
+    pool.clear()
+
+
+def get_client_port(url):
+    content, _headers = util.readurl(url, timeout=5)
+    return content["port"]
+
+
+class TestHTTPConnectionPool:
+    def test_sequential_requests_reuse_the_connection(self, server_url):
+        port = get_client_port(server_url + "/a")
+        assert port == get_client_port(server_url + "/b")
+
+        with pytest.raises(error.HTTPError):
+            util.readurl(server_url + "/missing", timeout=5)
+        assert port == get_client_port(server_url + "/c")
+
+    def test_connection_closed_by_the_server_is_not_reused(self, server_url):
+        port = get_client_port(server_url + "/close")
+        assert port != get_client_port(server_url + "/a")
+
+    def test_idle_connections_expire(self, server_url, pool):
+        port = get_client_port(server_url + "/a")
+        pool.idle_timeout = 0
+        assert port != get_client_port(server_url + "/b")
+
+    def test_only_pool_size_idle_connections_are_kept(self, pool):
+        conns = [mock.Mock(sock=object()) for _ in range(3)]
+        key = ("HTTPConnection", "127.0.0.1", None, None)
+        for conn in conns:
+            pool.release(key, conn, True)
+
+        assert [False, False, True] == [c.close.called for c in conns]
+        assert conns[1] is pool.acquire(key)
+        assert conns[0] is pool.acquire(key)
+        assert pool.acquire(key) is None
+
+    def test_stale_connection_is_replaced(self, server_url, pool):
+        port = get_client_port(server_url + "/a")
+        ((_released_at, conn),) = next(iter(pool._idle.values()))
+        conn.sock.close()
+        conn.sock = mock.Mock(sendall=mock.Mock(side_effect=BrokenPipeError()))
+
+        assert port != get_client_port(server_url + "/b")
+
+    @pytest.mark.parametrize("method", ("GET", "POST"))
+    def test_only_get_is_sent_again_once_sent_on_a_stale_connection(
+        self, method, server_url, pool
+    ):
+        port = get_client_port(server_url + "/a")
+        ((_released_at, conn),) = next(iter(pool._idle.values()))
+        conn.sock.close()
+        # The request is sent but the server closes without answering
+        sock = mock.Mock(makefile=lambda *args: io.BytesIO(b""))
+        conn.sock = sock
+
+        if method == "GET":
+            assert port != get_client_port(server_url + "/b")
+        else:
+            with pytest.raises(error.URLError):
+                util.readurl(server_url + "/b", data=b"{}", timeout=5)
+        assert sock.sendall.called
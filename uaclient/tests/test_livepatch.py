@@ -0,0 +1,93 @@
+import json
+
+import mock
+
+from uaclient import exceptions, livepatch
+from uaclient.livepatch import LIVEPATCH_CMD, LivepatchStatus
+
+M_PATH = "uaclient.livepatch."
+
+LIVEPATCH_STATUS = {
+    "Status": [
+        {
+            "Kernel": "4.4.0-210.242-generic",
+            "Running": True,
+            "Livepatch": {
+                "CheckState": "checked",
+                "State": "applied",
+                "Version": "87.1",
+                "Fixes": [
+                    {"Name": "CVE-2013-1798", "Patched": True},
+                    {"Name": "cve-2013-1799", "Patched": False},
+                    {"Name": "cve-2013-1800", "Patched": True},
+                ],
+            },
+        }
+    ]
+}
+
+
+@mock.patch("uaclient.system.which", return_value=True)
+@mock.patch("uaclient.system.subp")
+class TestGetStatus:
+    def test_status_is_fetched_once_per_process(self, m_subp, _m_which):
+        m_subp.return_value = json.dumps(LIVEPATCH_STATUS), ""
+
+        status = livepatch.get_status()
+
+        assert (
+            LivepatchStatus(
+                enabled=True,
+                error=None,
+                version="87.1",
+                fixed_cves=frozenset(["cve-2013-1798", "cve-2013-1800"]),
+            )
+            == status
+        )
+        assert status is livepatch.get_status()
+        assert [
+            mock.call(
+                [LIVEPATCH_CMD, "status", "--verbose", "--format=json"],
+                retry_sleeps=livepatch.LIVEPATCH_RETRIES,
+            )
+        ] == m_subp.call_args_list
+
+    def test_status_is_shared_on_disk_until_it_expires(self, m_subp, _m_which):
+        m_subp.side_effect = exceptions.ProcessExecutionError(
+            "canonical-livepatch status",
+            exit_code=1,
+            stderr="Machine is not enabled",
+        )
+        status = livepatch.get_status()
+        fetched_at = livepatch._status[0]
+        assert not status.enabled
+        assert "Machine is not enabled" in status.error
+
+        # A new process reuses the snapshot on disk
+        with mock.patch(M_PATH + "_status", None):
+            assert status == livepatch.get_status()
+        assert 1 == m_subp.call_count
+
+        with mock.patch(M_PATH + "_status", None):
+            with mock.patch(
+                "time.time",
+                return_value=fetched_at + livepatch.LIVEPATCH_STATUS_CACHE_TTL,
+            ):
+                livepatch.get_status()
+        assert 2 == m_subp.call_count
+
+    def test_invalid_cache_is_ignored(self, m_subp, _m_which):
+        m_subp.return_value = json.dumps(LIVEPATCH_STATUS), ""
+        with open(livepatch.LIVEPATCH_STATUS_CACHE_PATH, "w") as f:
+            f.write('{"fetched_at": "never"}')
+
+        assert livepatch.get_status().enabled
+        assert 1 == m_subp.call_count
+
+    def test_invalidate_status(self, m_subp, _m_which):
+        m_subp.return_value = json.dumps(LIVEPATCH_STATUS), ""
+        livepatch.get_status()
+
+        livepatch.invalidate_status()
+        livepatch.get_status()
+        assert 2 == m_subp.call_count
@@ -1,18 +1,22 @@
 import copy
 import datetime
 import json
+import os
 import textwrap
+import time
 from collections import defaultdict
 
 import mock
 import pytest
 
-from uaclient import exceptions
+from uaclient import exceptions, messages, security_db, util
+from uaclient.apt import InstalledPackage
 from uaclient.clouds.identity import NoCloudTypeReason
 from uaclient.entitlements.entitlement_status import (
     ApplicabilityStatus,
     UserFacingStatus,
 )
+from uaclient.livepatch import LivepatchStatus
 from uaclient.messages import (
     ENABLE_REBOOT_REQUIRED_TMPL,
     FAIL_X,
@@ -37,23 +41,33 @@ from uaclient.security import (
     API_V1_NOTICE_TMPL,
     API_V1_NOTICES,
     CVE,
+    UA_INFRA_POCKET,
+    UBUNTU_STANDARD_UPDATES_POCKET,
     USN,
     CVEPackageStatus,
+    FixPlan,
+    FixPlanUpgrade,
     FixStatus,
     UASecurityClient,
     _check_attached,
     _check_subscription_for_required_service,
     _check_subscription_is_expired,
+    apply_fix_plans,
     fix_security_issue_id,
+    fix_security_issue_ids,
     get_cve_affected_source_packages_status,
     get_related_usns,
     get_usn_affected_packages_status,
+    get_vulnerable_source_packages,
     merge_usn_released_binary_package_versions,
     override_usn_release_package_status,
+    plan_security_issue_fix,
     prompt_for_affected_packages,
     query_installed_source_pkg_versions,
+    scan_security_issues,
     upgrade_packages_and_attach,
 )
+from uaclient.security_db import get_series_cve
 from uaclient.status import colorize_commands
 
 M_PATH = "uaclient.contract."
@@ -577,6 +591,27 @@ https://ubuntu.com/security/CVE-2020-1472""",
         assert expected == usn.cves
 
 
+class TestUSNForSeries:
+    def test_usn_keeps_only_series_data(self, FakeConfig):
+        client = UASecurityClient(FakeConfig())
+        usn = USN.for_series(
+            client, SAMPLE_USN_RESPONSE, series="series-example-1"
+        )
+
+        assert "USN-4510-2" == usn.id
+        assert ["series-example-1", "series-example-2"] == sorted(
+            usn.response["release_packages"]
+        )
+        assert [] == usn.response["release_packages"]["series-example-2"]
+        assert SAMPLE_USN_RESPONSE["release_packages"]["series-example-2"]
+        with mock.patch(
+            "uaclient.system.get_platform_info",
+            return_value={"series": "series-example-1"},
+        ):
+            assert ["samba"] == list(usn.release_packages)
+        assert not hasattr(usn, "__dict__")
+
+
 class TestCVEPackageStatus:
     def test_simple_properties_from_response(self):
         pkg_status = CVEPackageStatus(
@@ -768,7 +803,9 @@ class TestUASecurityClient:
             assert "1" == usn1.id
             assert "2" == usn2.id
             assert [
-                mock.call(API_V1_NOTICES, query_params=m_kwargs)
+                mock.call(
+                    API_V1_NOTICES, query_params=m_kwargs, use_cache=True
+                )
             ] == request_url.call_args_list
 
     @pytest.mark.parametrize("details", (("cve1"), (None)))
@@ -872,37 +909,124 @@ class TestUASecurityClient:
                 )
             ] == request_url.call_args_list
 
+    def test_get_issues_from_local_security_db(self, request_url, FakeConfig):
+        """Avoid the Security API when the local database has the issue."""
+        client = UASecurityClient(FakeConfig())
+        client.db.add_notice(
+            {
+                "id": "USN-4510-2",
+                "cves_ids": ["CVE-2020-1472"],
+                "cves": [SAMPLE_CVE_RESPONSE],
+            }
+        )
+        client.db.index["synced_at"] = time.time()
+
+        assert "USN-4510-2" == client.get_notice("USN-4510-2").id
+        assert (
+            get_series_cve(SAMPLE_CVE_RESPONSE, client.db.series)
+            == client.get_cve("CVE-2020-1472").response
+        )
+        assert ["USN-4510-2"] == [
+            usn.id for usn in client.get_notices(details="CVE-2020-1472")
+        ]
+        assert 0 == request_url.call_count
+
+    def test_outdated_local_issues_are_fetched_again(
+        self, request_url, FakeConfig
+    ):
+        client = UASecurityClient(FakeConfig())
+        client.db.add_notice(
+            {"id": "USN-4510-2", "cves_ids": ["CVE-2020-1472"]}
+        )
+        client.db.add_cve({"id": "CVE-2020-1472", "description": "old"})
+        client.db.save()
+        # Stored and synced longer than SECURITY_DB_MAX_AGE ago
+        stored_at = time.time() - security_db.SECURITY_DB_MAX_AGE - 1
+        for issue_file in (
+            client.db._document_file("notices", "USN-4510-2"),
+            client.db._document_file("cves", "CVE-2020-1472"),
+        ):
+            os.utime(issue_file.path, (stored_at, stored_at))
+        client.db.index["synced_at"] = stored_at
+        request_url.side_effect = [
+            ({"id": "CVE-2020-1472", "description": "new"}, "headers"),
+            (
+                {
+                    "notices": [
+                        {"id": "USN-4510-2", "cves_ids": ["CVE-2020-1472"]}
+                    ]
+                },
+                "headers",
+            ),
+        ]
+
+        assert "new" == client.get_cve("CVE-2020-1472").description
+        assert ["USN-4510-2"] == [
+            usn.id for usn in client.get_notices(details="CVE-2020-1472")
+        ]
+        assert 2 == request_url.call_count
+
+        # The database keeps the copy fetched from the Security API
+        assert "new" == client.get_cve("CVE-2020-1472").description
+        assert 2 == request_url.call_count
+
+    def test_get_issues_fall_back_to_api_on_local_db_miss(
+        self, request_url, FakeConfig
+    ):
+        client = UASecurityClient(FakeConfig())
+        client.db.add_notice({"id": "USN-4510-2", "cves_ids": []})
+        request_url.side_effect = [
+            ({"id": "USN-1"}, "headers"),
+            ({"id": "CVE-1"}, "headers"),
+            ({"notices": [{"id": "USN-2", "cves_ids": ["CVE-1"]}]}, "h"),
+        ]
+
+        assert "USN-1" == client.get_notice("USN-1").id
+        assert "CVE-1" == client.get_cve("CVE-1").id
+        assert ["USN-2"] == [
+            usn.id for usn in client.get_notices(details="CVE-1")
+        ]
+        assert 3 == request_url.call_count
+
 
 class TestQueryInstalledPkgSources:
     @pytest.mark.parametrize(
-        "dpkg_out,results",
+        "dpkg_packages,results",
         (
             # Ignore b non-installed status
-            ("a,,1.2,installed\nb,b,1.2,config-files", {"a": {"a": "1.2"}}),
-            # Handle cases where no Source is defined for the pkg
             (
-                "a,,1.2,installed\nzip,zip,3.0,installed",
-                {"a": {"a": "1.2"}, "zip": {"zip": "3.0"}},
+                [("a", "a", "1.2", "installed"), ("b", "b", "1.2", "conf")],
+                {"a": {"a": "1.2"}},
+            ),
+            # Group binary packages by their source package
+            (
+                [
+                    ("a", "src", "1.2", "installed"),
+                    ("b", "src", "1.3", "installed"),
+                    ("zip", "zip", "3.0", "installed"),
+                ],
+                {"src": {"a": "1.2", "b": "1.3"}, "zip": {"zip": "3.0"}},
             ),
             # Prefer Source package name to binary package name
             (
-                "b,bsrc,1.2,installed\nzip,zip,3.0,installed",
+                [
+                    ("b", "bsrc", "1.2", "installed"),
+                    ("zip", "zip", "3.0", "installed"),
+                ],
                 {"bsrc": {"b": "1.2"}, "zip": {"zip": "3.0"}},
             ),
         ),
     )
     @mock.patch("uaclient.security.system.subp")
-    @mock.patch("uaclient.system.get_platform_info")
+    @mock.patch("uaclient.apt.get_dpkg_status_index")
     def test_result_keyed_by_source_package_name(
-        self, get_platform_info, subp, dpkg_out, results
+        self, m_get_dpkg_status_index, subp, dpkg_packages, results
     ):
-        get_platform_info.return_value = {"series": "bionic"}
-        subp.return_value = dpkg_out, ""
+        m_get_dpkg_status_index.return_value = {
+            pkg[0]: InstalledPackage(*pkg) for pkg in dpkg_packages
+        }
         assert results == query_installed_source_pkg_versions()
-        _format = "-f=${Package},${Source},${Version},${db:Status-Status}\n"
-        assert [
-            mock.call(["dpkg-query", _format, "-W"])
-        ] == subp.call_args_list
+        assert 0 == subp.call_count
 
 
 CVE_PKG_STATUS_NEEDED = {
@@ -2212,6 +2336,45 @@ class TestGetRelatedUSNs:
 
         assert [usn] == get_related_usns(usn, client)
 
+    @pytest.mark.parametrize("max_concurrency", (None, 1, 2))
+    @mock.patch("uaclient.security.ThreadPoolExecutor")
+    def test_related_usns_fetched_once_and_sorted(
+        self, m_executor, max_concurrency, FakeConfig
+    ):
+        cfg = FakeConfig()
+        if max_concurrency:
+            cfg.override_features(
+                {"security_api_max_concurrency": max_concurrency}
+            )
+        client = UASecurityClient(cfg=cfg)
+        cves = [
+            dict(SAMPLE_CVE_RESPONSE, id="CVE-2020-1472"),
+            dict(
+                SAMPLE_CVE_RESPONSE,
+                id="CVE-2020-1473",
+                notices_ids=["USN-4559-1", "USN-4510-2"],
+            ),
+        ]
+        usn = USN(client, dict(SAMPLE_USN_RESPONSE, cves=cves))
+        m_executor.return_value.__enter__.return_value.map.side_effect = map
+
+        with mock.patch.object(
+            client,
+            "get_notice",
+            side_effect=lambda notice_id: USN(
+                client, dict(SAMPLE_USN_RESPONSE, id=notice_id)
+            ),
+        ) as m_get_notice:
+            related_usns = get_related_usns(usn, client)
+
+        assert ["USN-4510-1", "USN-4510-2", "USN-4559-1"] == [
+            related_usn.id for related_usn in related_usns
+        ]
+        assert 3 == m_get_notice.call_count
+        assert [
+            mock.call(max_workers=max_concurrency or 3)
+        ] == m_executor.call_args_list
+
 
 class TestGetUSNAffectedPackagesStatus:
     @pytest.mark.parametrize(
@@ -2291,10 +2454,12 @@ class TestFixSecurityIssueId:
             ),
         ),
     )
+    @mock.patch("uaclient.system.which", return_value=True)
     @mock.patch("uaclient.system.subp")
     def test_patched_msg_when_issue_id_fixed_by_livepatch(
         self,
         subp,
+        _m_which,
         issue_id,
         livepatch_status,
         exp_ret,
@@ -2630,3 +2795,442 @@ class TestCheckSubscriptionIsExpired:
             status_cache=status_cache, cfg=None, dry_run=False
         )
         assert 1 == m_prompt.call_count
+
+
+def _scan_notice(usn_id, src_pkg, bin_pkgs, pocket="security"):
+    return {
+        "id": usn_id,
+        "cves_ids": [],
+        "release_packages": {
+            "focal": [
+                {"is_source": True, "name": src_pkg, "version": "src-ver"}
+            ]
+            + [
+                {
+                    "is_source": False,
+                    "name": bin_pkg,
+                    "source_link": "https://launchpad.net/+source/" + src_pkg,
+                    "version": version,
+                    "pocket": pocket,
+                }
+                for bin_pkg, version in bin_pkgs.items()
+            ]
+        },
+    }
+
+
+@mock.patch(
+    "uaclient.system.get_platform_info", return_value={"series": "focal"}
+)
+class TestScanSecurityIssues:
+    def test_vulnerable_source_packages(self, _m_platform_info, FakeConfig):
+        client = UASecurityClient(FakeConfig())
+        client.db.add_notice(
+            _scan_notice("USN-1-1", "samba", {"samba": "1.1", "libsmb": "1.1"})
+        )
+        client.db.add_notice(
+            _scan_notice("USN-2-1", "samba", {"samba": "1.2"}, "esm-infra")
+        )
+        client.db.add_notice(_scan_notice("USN-3-1", "zip", {"zip": "3.0"}))
+        client.db.add_notice(_scan_notice("USN-4-1", "coin3", {"coin3": "2"}))
+        installed_packages = {
+            "samba": {"samba": "1.0", "libsmb": "1.1"},
+            "zip": {"zip": "3.0"},
+            "curl": {"curl": "7.0"},
+        }
+
+        assert {
+            "samba": {
+                "binary_packages": {"samba": ("1.0", "1.2")},
+                "fixed_version": "1.2",
+                "pocket": UA_INFRA_POCKET,
+                "usns": ["USN-1-1", "USN-2-1"],
+            }
+        } == get_vulnerable_source_packages(client, installed_packages, {})
+        # Fixes from beta pockets are ignored
+        assert ["USN-1-1"] == get_vulnerable_source_packages(
+            client, installed_packages, {"esm-infra": True}
+        )["samba"]["usns"]
+
+    @pytest.mark.parametrize(
+        "installed_packages,expected_status,expected_out",
+        (
+            (
+                {"zip": {"zip": "3.0"}},
+                FixStatus.SYSTEM_NON_VULNERABLE,
+                "Scanned 1 installed source packages against 1 security"
+                " notices.\n" + messages.SECURITY_SCAN_NOT_AFFECTED,
+            ),
+            (
+                {"zip": {"zip": "2.0"}},
+                FixStatus.SYSTEM_STILL_VULNERABLE,
+                "Scanned 1 installed source packages against 1 security"
+                " notices.\n1 affected source package installed:\n"
+                "zip: fixed in 3.0 (Ubuntu standard updates) USN-3-1",
+            ),
+        ),
+    )
+    @mock.patch(
+        "uaclient.security._is_pocket_used_by_beta_service",
+        return_value=False,
+    )
+    @mock.patch("uaclient.security.query_installed_source_pkg_versions")
+    @mock.patch("os.getuid", return_value=0)
+    def test_scan_report(
+        self,
+        _m_getuid,
+        m_query_installed,
+        _m_beta_pocket,
+        _m_platform_info,
+        installed_packages,
+        expected_status,
+        expected_out,
+        FakeConfig,
+        capsys,
+    ):
+        cfg = FakeConfig()
+        m_query_installed.return_value = installed_packages
+
+        with mock.patch.object(
+            UASecurityClient,
+            "get_notices",
+            return_value=[
+                USN(None, _scan_notice("USN-3-1", "zip", {"zip": "3.0"}))
+            ],
+        ) as m_get_notices:
+            assert expected_status == scan_security_issues(cfg)
+
+        # The local database is downloaded when missing
+        assert 1 == m_get_notices.call_count
+        out, _err = capsys.readouterr()
+        assert messages.SECURITY_SCAN_UPDATING_DB + "\n" + expected_out in out
+
+    @mock.patch(
+        "uaclient.security._is_pocket_used_by_beta_service",
+        return_value=False,
+    )
+    @mock.patch(
+        "uaclient.security.query_installed_source_pkg_versions",
+        return_value={"zip": {"zip": "2.0"}},
+    )
+    @mock.patch("os.getuid", return_value=1000)
+    def test_non_root_scan_needs_an_up_to_date_database(
+        self,
+        _m_getuid,
+        _m_query_installed,
+        _m_beta_pocket,
+        _m_platform_info,
+        FakeConfig,
+        capsys,
+    ):
+        cfg = FakeConfig()
+
+        with mock.patch.object(UASecurityClient, "get_notices") as m_notices:
+            with pytest.raises(exceptions.UserFacingError) as exc:
+                scan_security_issues(cfg)
+        assert messages.SECURITY_SCAN_DB_NON_ROOT == exc.value.msg
+        assert 0 == m_notices.call_count
+
+        # A database synced by root is scanned as is
+        client = UASecurityClient(cfg=cfg)
+        client.db.add_notice(_scan_notice("USN-3-1", "zip", {"zip": "3.0"}))
+        client.db.index["synced_at"] = time.time()
+        client.db.save()
+        assert FixStatus.SYSTEM_STILL_VULNERABLE == scan_security_issues(cfg)
+        out, _err = capsys.readouterr()
+        assert messages.SECURITY_SCAN_UPDATING_DB not in out
+        assert "zip: fixed in 3.0" in out
+
+
+class TestFixSecurityIssueIds:
+    @mock.patch("uaclient.system.should_reboot", return_value=False)
+    @mock.patch("uaclient.apt.run_apt_command")
+    @mock.patch("uaclient.apt.run_apt_update_command")
+    @mock.patch("uaclient.security._get_issue_affected_packages")
+    @mock.patch("uaclient.livepatch.get_status")
+    @mock.patch("uaclient.security._get_beta_pockets", return_value={})
+    @mock.patch("uaclient.security.query_installed_source_pkg_versions")
+    @mock.patch("os.getuid", return_value=0)
+    def test_issues_share_one_package_upgrade(
+        self,
+        _m_getuid,
+        m_query_installed,
+        _m_beta_pockets,
+        m_livepatch_status,
+        m_affected_packages,
+        m_apt_update,
+        m_apt_command,
+        _m_should_reboot,
+        FakeConfig,
+        capsys,
+    ):
+        m_query_installed.return_value = {
+            "curl": {"curl": "1.0", "libcurl": "1.0"},
+            "zip": {"zip": "1.0"},
+            "samba": {"samba": "1.0"},
+        }
+        m_livepatch_status.return_value = LivepatchStatus(
+            enabled=True,
+            error=None,
+            version="99.1",
+            fixed_cves=frozenset(["cve-2020-1"]),
+        )
+
+        def affected_packages(client, issue_id, installed, beta_pockets):
+            src_pkg = "curl" if issue_id == "USN-1-1" else "zip"
+            if issue_id == "USN-3-1":
+                return (
+                    {"samba": CVEPackageStatus(CVE_PKG_STATUS_NEEDED)},
+                    {},
+                )
+            released = CVEPackageStatus(
+                {"status": "released", "description": "2.0", "pocket": None}
+            )
+            bin_pkgs = m_query_installed.return_value[src_pkg]
+            usn_released_pkgs = {
+                src_pkg: dict(
+                    {
+                        bin_pkg: {"version": "2.0", "pocket": "security"}
+                        for bin_pkg in bin_pkgs
+                    },
+                    source={"version": "2.0"},
+                )
+            }
+            return {src_pkg: released}, usn_released_pkgs
+
+        m_affected_packages.side_effect = affected_packages
+
+        assert FixStatus.SYSTEM_STILL_VULNERABLE == fix_security_issue_ids(
+            FakeConfig(),
+            ["usn-2-1", "USN-1-1", "USN-3-1", "CVE-2020-1", "USN-2-1"],
+        )
+
+        assert ["USN-1-1", "USN-2-1", "USN-3-1"] == [
+            c[0][1] for c in m_affected_packages.call_args_list
+        ]
+        assert 1 == m_livepatch_status.call_count
+        assert 1 == m_apt_update.call_count
+        assert [
+            mock.call(
+                cmd=[
+                    "apt-get",
+                    "install",
+                    "--only-upgrade",
+                    "-y",
+                    "curl",
+                    "libcurl",
+                    "zip",
+                ],
+                error_msg=messages.APT_INSTALL_FAILED.msg,
+                env={"DEBIAN_FRONTEND": "noninteractive"},
+            )
+        ] == m_apt_command.call_args_list
+        out, _err = capsys.readouterr()
+        for msg in (
+            messages.SECURITY_ISSUE_RESOLVED.format(issue="CVE-2020-1"),
+            messages.SECURITY_ISSUE_RESOLVED.format(issue="USN-1-1"),
+            messages.SECURITY_ISSUE_RESOLVED.format(issue="USN-2-1"),
+            messages.SECURITY_ISSUE_NOT_RESOLVED.format(issue="USN-3-1"),
+        ):
+            assert util.handle_unicode_characters(msg) in out
+
+
+class TestPlanSecurityIssueFix:
+    @pytest.mark.parametrize("attached", (True, False))
+    @mock.patch("uaclient.system.should_reboot", return_value=True)
+    @mock.patch("uaclient.security._get_service_for_pocket")
+    @mock.patch("uaclient.security._get_issue_affected_packages")
+    def test_plan_is_computed_without_output(
+        self,
+        m_affected_packages,
+        m_service_for_pocket,
+        m_should_reboot,
+        attached,
+        FakeConfig,
+        capsys,
+    ):
+        installed_packages = {
+            "curl": {"curl": "1.0", "libcurl": "2.0"},
+            "linux": {"linux-image-generic": "1.0"},
+            "samba": {"samba": "1.0"},
+        }
+        m_affected_packages.return_value = (
+            {
+                "curl": CVEPackageStatus(
+                    {"status": "released", "description": "2.0"}
+                ),
+                "linux": CVEPackageStatus(
+                    {"status": "released", "description": "1.1+esm1"}
+                ),
+                "samba": CVEPackageStatus(CVE_PKG_STATUS_NEEDED),
+            },
+            {
+                "curl": {
+                    "source": {"version": "2.0"},
+                    "curl": {"version": "2.0", "pocket": "security"},
+                    "libcurl": {"version": "2.0", "pocket": "security"},
+                },
+                "linux": {
+                    "source": {"version": "1.1+esm1"},
+                    "linux-image-generic": {
+                        "version": "1.1+esm1",
+                        "pocket": "esm-infra",
+                    },
+                },
+            },
+        )
+        m_service_for_pocket.return_value.user_facing_status.return_value = (
+            UserFacingStatus.INACTIVE,
+            None,
+        )
+        m_service_for_pocket.return_value.name = "esm-infra"
+        cfg = FakeConfig.for_attached_machine() if attached else FakeConfig()
+        cfg.write_cache("status-cache", {"attached": attached})
+
+        plan = plan_security_issue_fix(
+            cfg,
+            "usn-1-1",
+            client=mock.sentinel.client,
+            installed_packages=installed_packages,
+            beta_pockets={},
+        )
+
+        assert (
+            mock.sentinel.client,
+            "USN-1-1",
+            installed_packages,
+            {},
+        ) == m_affected_packages.call_args[0]
+        assert FixStatus.SYSTEM_STILL_VULNERABLE == plan.expected_status
+        assert ["curl", "linux", "samba"] == [
+            pkg.name for pkg in plan.affected_packages
+        ]
+        assert [
+            ("released", "2.0", UBUNTU_STANDARD_UPDATES_POCKET),
+            ("released", "1.1+esm1", UA_INFRA_POCKET),
+            ("needed", None, None),
+        ] == [
+            (pkg.status, pkg.fixed_version, pkg.pocket)
+            for pkg in plan.affected_packages
+        ]
+        assert [("curl", "1.0", "2.0"), ("libcurl", "2.0", "2.0"),] == [
+            (pkg.name, pkg.installed_version, pkg.fixed_version)
+            for pkg in plan.affected_packages[0].binary_packages
+        ]
+        assert [
+            (UBUNTU_STANDARD_UPDATES_POCKET, None, ["curl"]),
+            (UA_INFRA_POCKET, "esm-infra", ["linux-image-generic"]),
+        ] == [
+            (upgrade.pocket, upgrade.service, upgrade.binary_packages)
+            for upgrade in plan.upgrades
+        ]
+        assert (not attached) is plan.requires_attach
+        assert ["esm-infra"] == plan.services_to_enable
+        assert plan.reboot_required
+        assert [
+            mock.call(installed_pkgs={"curl", "linux-image-generic"})
+        ] == m_should_reboot.call_args_list
+        assert plan.error is None
+        assert ("", "") == capsys.readouterr()
+
+    @mock.patch("uaclient.livepatch.get_status")
+    @mock.patch("uaclient.security._get_issue_affected_packages")
+    def test_plan_of_livepatched_cve(
+        self, m_affected_packages, m_livepatch_status, FakeConfig
+    ):
+        m_livepatch_status.return_value = LivepatchStatus(
+            enabled=True,
+            error=None,
+            version="87.1",
+            fixed_cves=frozenset(["cve-2020-1"]),
+        )
+        plan = plan_security_issue_fix(
+            FakeConfig(),
+            "CVE-2020-1",
+            client=mock.sentinel.client,
+            installed_packages={},
+            beta_pockets={},
+        )
+
+        assert FixStatus.SYSTEM_NON_VULNERABLE == plan.expected_status
+        assert "87.1" == plan.livepatch_version
+        assert 0 == m_affected_packages.call_count
+
+    @mock.patch("uaclient.security._get_issue_affected_packages")
+    def test_plan_of_unknown_issue(self, m_affected_packages, FakeConfig):
+        m_affected_packages.side_effect = exceptions.UserFacingError(
+            "not found"
+        )
+        plan = plan_security_issue_fix(
+            FakeConfig(),
+            "USN-1-1",
+            client=mock.sentinel.client,
+            installed_packages={},
+            beta_pockets={},
+        )
+
+        assert FixStatus.SYSTEM_STILL_VULNERABLE == plan.expected_status
+        assert "not found" == plan.error
+        assert [] == plan.upgrades
+
+
+class TestApplyFixPlans:
+    @mock.patch("uaclient.system.should_reboot", return_value=True)
+    @mock.patch("uaclient.security._run_packages_upgrade")
+    @mock.patch("uaclient.security._check_pocket_requirements")
+    def test_plans_share_one_package_upgrade(
+        self,
+        m_check_pocket,
+        m_upgrade,
+        _m_should_reboot,
+        FakeConfig,
+        capsys,
+    ):
+        m_check_pocket.side_effect = lambda cfg, pocket, dry_run: (
+            pocket == UBUNTU_STANDARD_UPDATES_POCKET
+        )
+        plans = [
+            FixPlan(
+                issue_id="USN-1-1",
+                expected_status=FixStatus.SYSTEM_NON_VULNERABLE,
+                upgrades=[
+                    FixPlanUpgrade(
+                        pocket=UBUNTU_STANDARD_UPDATES_POCKET,
+                        service=None,
+                        binary_packages=["curl", "libcurl"],
+                    )
+                ],
+            ),
+            FixPlan(
+                issue_id="USN-2-1",
+                expected_status=FixStatus.SYSTEM_NON_VULNERABLE,
+                upgrades=[
+                    FixPlanUpgrade(
+                        pocket=UA_INFRA_POCKET,
+                        service="esm-infra",
+                        binary_packages=["zip"],
+                    )
+                ],
+                requires_attach=True,
+            ),
+            FixPlan(
+                issue_id="USN-3-1",
+                expected_status=FixStatus.SYSTEM_STILL_VULNERABLE,
+                error="Error: no metadata",
+            ),
+        ]
+
+        assert FixStatus.SYSTEM_STILL_VULNERABLE == apply_fix_plans(
+            FakeConfig(), [FixPlan.from_dict(p.to_dict()) for p in plans]
+        )
+        assert [
+            mock.call(["curl", "libcurl"], False)
+        ] == m_upgrade.call_args_list
+        out, _err = capsys.readouterr()
+        assert "Error: no metadata" in out
+        for msg in (
+            messages.SECURITY_ISSUE_NOT_RESOLVED.format(issue="USN-1-1"),
+            messages.SECURITY_ISSUE_NOT_RESOLVED.format(issue="USN-2-1"),
+            messages.SECURITY_ISSUE_NOT_RESOLVED.format(issue="USN-3-1"),
+        ):
+            assert util.handle_unicode_characters(msg) in out
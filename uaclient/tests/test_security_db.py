@@ -0,0 +1,310 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import mock
+import pytest
+
+from uaclient.security import USN, UASecurityClient
+from uaclient.security_db import (
+    SECURITY_DB_SYNC_PAGE_SIZE,
+    SecurityDB,
+    get_series_cve,
+    get_series_notice,
+)
+
+SAMPLE_NOTICE = {
+    "id": "USN-4510-2",
+    "cves_ids": ["CVE-2020-1473", "CVE-2020-1472"],
+    "cves": [
+        {"id": "CVE-2020-1472", "notices_ids": ["USN-4510-2"], "packages": []},
+        {"id": "CVE-2020-1473", "notices_ids": ["USN-4510-2"]},
+    ],
+    "release_packages": {
+        "focal": [
+            {"is_source": True, "name": "samba", "version": "2:4.3.11"},
+            {
+                "is_source": False,
+                "name": "libsmbclient",
+                "source_link": "https://launchpad.net/ubuntu/+source/samba",
+                "version": "2:4.3.11",
+            },
+        ],
+        "bionic": [{"is_source": True, "name": "coin3", "version": "3.1"}],
+    },
+}
+
+
+@pytest.fixture
+def security_db(tmpdir):
+    return SecurityDB(tmpdir.strpath, series="focal")
+
+
+class TestSecurityDB:
+    def test_empty_database_lookups(self, security_db):
+        assert not security_db.is_present
+        assert security_db.is_outdated
+        assert security_db.get_notice("USN-4510-2") is None
+        assert security_db.get_cve("CVE-2020-1472") is None
+        assert security_db.get_notices_ids_for_cve("CVE-2020-1472") is None
+        assert [] == security_db.get_notices_ids_for_source_package("samba")
+
+    def test_add_notice_indexes_cves_and_source_packages(
+        self, security_db, tmpdir
+    ):
+        security_db.add_notice(SAMPLE_NOTICE)
+        security_db.save()
+
+        db = SecurityDB(tmpdir.strpath, series="focal")
+        assert db.is_present
+        assert os.path.exists(
+            os.path.join(
+                tmpdir.strpath,
+                "security",
+                "focal",
+                "notices",
+                "USN-4510-2.json",
+            )
+        )
+        # Only the data of the db series is stored
+        assert dict(
+            SAMPLE_NOTICE,
+            release_packages={
+                "focal": SAMPLE_NOTICE["release_packages"]["focal"],
+                "bionic": [],
+            },
+        ) == db.get_notice("usn-4510-2")
+        assert ["USN-4510-2"] == db.get_notices_ids_for_cve("cve-2020-1473")
+        assert ["USN-4510-2"] == db.get_notices_ids_for_source_package("samba")
+        # Only source packages released for the db series are indexed
+        assert [] == db.get_notices_ids_for_source_package("coin3")
+        # Only complete CVE documents are stored
+        assert SAMPLE_NOTICE["cves"][0] == db.get_cve("CVE-2020-1472")
+        assert db.get_cve("CVE-2020-1473") is None
+
+    def test_add_notice_twice_does_not_duplicate_index_entries(
+        self, security_db
+    ):
+        security_db.add_notice(SAMPLE_NOTICE)
+        security_db.add_notice(SAMPLE_NOTICE)
+
+        assert {"USN-4510-2"} == security_db.index["notices"]
+        assert ["USN-4510-2"] == security_db.get_notices_ids_for_cve(
+            "CVE-2020-1472"
+        )
+
+    def test_concurrent_refreshes_keep_every_notice(self, security_db, tmpdir):
+        notices = [
+            dict(SAMPLE_NOTICE, id="USN-{}-1".format(i), cves=[])
+            for i in range(50)
+        ]
+        for notice in notices:
+            security_db.add_notice(notice)
+        security_db.save()
+
+        def refresh(notice):
+            security_db.refresh_notice(
+                dict(notice, cves_ids=["CVE-{}".format(notice["id"])])
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(refresh, notices))
+
+        db = SecurityDB(tmpdir.strpath, series="focal")
+        assert {notice["id"] for notice in notices} == db.index["notices"]
+        for notice in notices:
+            assert [notice["id"]] == db.get_notices_ids_for_cve(
+                "CVE-{}".format(notice["id"])
+            )
+        # The index is renamed in place, no temporary file is left behind
+        assert ["index.json", "notices"] == sorted(
+            os.listdir(security_db.directory)
+        )
+
+    def test_failed_save_keeps_the_previous_index(self, security_db, tmpdir):
+        security_db.add_notice(SAMPLE_NOTICE)
+        security_db.save()
+        security_db.add_notice(dict(SAMPLE_NOTICE, id="USN-1-1"))
+
+        with mock.patch(
+            "uaclient.system.write_file", side_effect=OSError("disk full")
+        ):
+            with pytest.raises(OSError):
+                security_db.save()
+
+        db = SecurityDB(tmpdir.strpath, series="focal")
+        assert {"USN-4510-2"} == db.index["notices"]
+
+    def test_sync_pages_through_series_notices(self, security_db):
+        notices = [
+            {"id": "USN-{}-1".format(i)}
+            for i in range(SECURITY_DB_SYNC_PAGE_SIZE + 1)
+        ]
+        client = mock.MagicMock()
+        client.get_notices.side_effect = [
+            [USN(client, n) for n in notices[:SECURITY_DB_SYNC_PAGE_SIZE]],
+            [USN(client, n) for n in notices[SECURITY_DB_SYNC_PAGE_SIZE:]],
+        ]
+
+        assert len(notices) == security_db.sync(client)
+        assert [
+            mock.call(
+                release="focal",
+                limit=SECURITY_DB_SYNC_PAGE_SIZE,
+                offset=0,
+                order="newest",
+                use_cache=False,
+            ),
+            mock.call(
+                release="focal",
+                limit=SECURITY_DB_SYNC_PAGE_SIZE,
+                offset=SECURITY_DB_SYNC_PAGE_SIZE,
+                order="newest",
+                use_cache=False,
+            ),
+        ] == client.get_notices.call_args_list
+        assert security_db.is_present
+        assert not security_db.is_outdated
+        assert len(notices) == len(security_db.index["notices"])
+
+    def test_sync_only_merges_notices_newer_than_high_water_mark(
+        self, security_db, tmpdir
+    ):
+        client = mock.MagicMock()
+        client.get_notices.return_value = [
+            USN(client, {"id": "USN-2-1", "published": "2022-01-02T00:00"}),
+            USN(client, {"id": "USN-1-1", "published": "2022-01-01T00:00"}),
+        ]
+        assert 2 == security_db.sync(client)
+        assert {
+            "notice_id": "USN-2-1",
+            "published": "2022-01-02T00:00",
+        } == security_db.high_water_mark
+
+        # A new process picks the mark up from the index on disk
+        db = SecurityDB(tmpdir.strpath, series="focal")
+        client.get_notices.reset_mock()
+        client.get_notices.side_effect = [
+            [
+                USN(
+                    client, {"id": "USN-4-1", "published": "2022-01-03T00:00"}
+                ),
+                USN(
+                    client, {"id": "USN-3-1", "published": "2022-01-02T00:00"}
+                ),
+                USN(
+                    client, {"id": "USN-2-1", "published": "2022-01-02T00:00"}
+                ),
+            ]
+            + [USN(client, {"id": "USN-1-1", "published": "2022-01-01T00:00"})]
+            * (SECURITY_DB_SYNC_PAGE_SIZE - 3)
+        ]
+
+        assert 2 == db.sync(client)
+        # Paging stopped at the first page reaching the high-water mark
+        assert 1 == client.get_notices.call_count
+        assert {
+            "notice_id": "USN-4-1",
+            "published": "2022-01-03T00:00",
+        } == db.high_water_mark
+        assert {"USN-1-1", "USN-2-1", "USN-3-1", "USN-4-1"} == db.index[
+            "notices"
+        ]
+
+    def test_sync_does_not_mix_cached_and_fresh_pages(
+        self, security_db, FakeConfig
+    ):
+        published = [
+            {"id": "USN-{}-1".format(i), "published": "2022-01-01T00:{:02d}"}
+            for i in range(SECURITY_DB_SYNC_PAGE_SIZE + 10)
+        ]
+        published = [
+            dict(notice, published=notice["published"].format(i))
+            for i, notice in enumerate(published)
+        ]
+
+        def readurl(url, **kwargs):
+            offset = int(parse_qs(urlparse(url).query)["offset"][0])
+            if offset > 0 and not any(
+                n["id"] == "USN-99-1" for n in published
+            ):
+                # Published once the first page of the sync was served
+                published.append(
+                    {"id": "USN-99-1", "published": "2022-01-03T00:00"}
+                )
+            newest = sorted(
+                published, key=lambda n: n["published"], reverse=True
+            )
+            return {
+                "notices": newest[offset : offset + SECURITY_DB_SYNC_PAGE_SIZE]
+            }, {}
+
+        client = UASecurityClient(FakeConfig())
+        with mock.patch("uaclient.util.readurl", side_effect=readurl):
+            # An earlier request left the first page in the HTTP cache
+            client.get_notices(
+                release="focal",
+                limit=SECURITY_DB_SYNC_PAGE_SIZE,
+                offset=0,
+                order="newest",
+            )
+            published.append(
+                {"id": "USN-98-1", "published": "2022-01-02T00:00"}
+            )
+            security_db.sync(client)
+
+        assert {
+            notice["id"] for notice in published if notice["id"] != "USN-99-1"
+        } == security_db.index["notices"]
+
+
+class TestGetSeriesDocuments:
+    def test_get_series_cve_keeps_only_series_statuses(self):
+        cve = {
+            "id": "CVE-2020-1472",
+            "packages": [
+                {
+                    "name": "samba",
+                    "statuses": [
+                        {"release_codename": "focal", "status": "released"},
+                        {"release_codename": "bionic", "status": "needed"},
+                    ],
+                },
+                {
+                    "name": "coin3",
+                    "statuses": [
+                        {"release_codename": "bionic", "status": "needed"}
+                    ],
+                },
+            ],
+            "notices": [SAMPLE_NOTICE],
+        }
+
+        assert {
+            "id": "CVE-2020-1472",
+            "packages": [
+                {
+                    "name": "samba",
+                    "statuses": [
+                        {"release_codename": "focal", "status": "released"}
+                    ],
+                }
+            ],
+            "notices": [get_series_notice(SAMPLE_NOTICE, "focal")],
+        } == get_series_cve(cve, "focal")
+        # The original document is left untouched
+        assert 2 == len(cve["packages"])
+
+    def test_get_series_notice_keeps_other_series_without_packages(self):
+        notice = get_series_notice(SAMPLE_NOTICE, "xenial")
+
+        assert {"focal": [], "bionic": []} == notice["release_packages"]
+        assert [
+            {
+                "id": "CVE-2020-1472",
+                "notices_ids": ["USN-4510-2"],
+                "packages": [],
+            },
+            {"id": "CVE-2020-1473", "notices_ids": ["USN-4510-2"]},
+        ] == notice["cves"]
+        assert 2 == len(SAMPLE_NOTICE["release_packages"]["focal"])
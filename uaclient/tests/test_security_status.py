@@ -1,20 +1,31 @@
+import itertools
+import os
+import tracemalloc
 from typing import List, Optional
 
 import mock
 import pytest
 
+from uaclient.apt import InstalledPackage
 from uaclient.security_status import (
+    OriginIndex,
+    PackageFileOrigin,
     UpdateStatus,
+    _get_package_updates,
     filter_security_updates,
     get_origin_for_package,
+    get_security_status,
     get_service_name,
     get_ua_info,
     get_update_status,
+    iter_security_status,
     security_status,
 )
 
 M_PATH = "uaclient.security_status."
 
+PACKAGE_FILE_IDS = itertools.count()
+
 
 def mock_origin(
     component: str, archive: str, origin: str, site: str
@@ -24,6 +35,7 @@ def mock_origin(
     mock_origin.archive = archive
     mock_origin.origin = origin
     mock_origin.site = site
+    mock_origin.id = next(PACKAGE_FILE_IDS)
     return mock_origin
 
 
@@ -35,7 +47,7 @@ def mock_version(
     mock_version = mock.MagicMock()
     mock_version.__gt__ = lambda self, other: self.version > other.version
     mock_version.version = version
-    mock_version.origins = origin_list
+    mock_version._cand.file_list = [(origin, 0) for origin in origin_list]
     mock_version.size = size
     return mock_version
 
@@ -127,25 +139,33 @@ class TestSecurityStatus:
         assert get_update_status(service_name, ua_info) == expected_result
 
     @pytest.mark.parametrize("is_attached", (True, False))
-    @mock.patch("uaclient.security_status.status")
-    def test_get_ua_info(self, m_status, is_attached, FakeConfig):
+    @mock.patch("uaclient.contract.get_available_resources")
+    @mock.patch("uaclient.apt.get_apt_cache_policy")
+    def test_get_ua_info(self, m_policy, m_resources, is_attached, FakeConfig):
         if is_attached:
-            cfg = FakeConfig().for_attached_machine()
+            entitlements = [
+                {
+                    "type": service,
+                    "entitled": service != "esm-apps",
+                    "directives": {
+                        "aptURL": "https://esm.ubuntu.com/" + service
+                    },
+                }
+                for service in ("esm-infra", "esm-apps", "livepatch")
+            ]
+            cfg = FakeConfig.for_attached_machine()
+            machine_token = cfg.machine_token
+            machine_token["machineTokenInfo"]["contractInfo"][
+                "resourceEntitlements"
+            ] = entitlements
+            cfg.machine_token_file.write(machine_token)
         else:
             cfg = FakeConfig()
 
-        m_status.return_value = {
-            "attached": is_attached,
-            "services": [
-                {"name": "esm-infra", "entitled": "yes", "status": "enabled"},
-                {"name": "esm-apps", "entitled": "yes", "status": "disabled"},
-                {
-                    "name": "non-esm-service",
-                    "entitled": "yes",
-                    "status": "enabled",
-                },
-            ],
-        }
+        m_policy.return_value = (
+            " 510 https://esm.ubuntu.com/esm-infra/ubuntu"
+            " example-infra-security/main amd64 Packages"
+        )
 
         result = get_ua_info(cfg)
 
@@ -153,14 +173,17 @@ class TestSecurityStatus:
             assert result == {
                 "attached": True,
                 "enabled_services": ["esm-infra"],
-                "entitled_services": ["esm-infra", "esm-apps"],
+                "entitled_services": ["esm-infra"],
             }
+            assert 1 == m_policy.call_count
         else:
             assert result == {
                 "attached": False,
                 "enabled_services": [],
                 "entitled_services": [],
             }
+            assert 0 == m_policy.call_count
+        assert 0 == m_resources.call_count
 
     @pytest.mark.parametrize(
         "installed_version,other_versions,expected_output",
@@ -224,7 +247,9 @@ class TestSecurityStatus:
             M_PATH + "ORIGIN_INFORMATION_TO_SERVICE",
             ORIGIN_TO_SERVICE_MOCK,
         ):
-            assert expected_output == get_origin_for_package(package_mock)
+            assert expected_output == get_origin_for_package(
+                package_mock, OriginIndex()
+            )
 
     @pytest.mark.parametrize(
         "origins_input,expected_output",
@@ -251,7 +276,59 @@ class TestSecurityStatus:
             M_PATH + "ORIGIN_INFORMATION_TO_SERVICE",
             ORIGIN_TO_SERVICE_MOCK,
         ):
-            assert expected_output == get_service_name(origins_input)
+            origins = OriginIndex().get_origins(
+                mock_version("1.0", origins_input)
+            )
+            assert expected_output == get_service_name(origins)
+
+    def test_origin_index_classifies_each_package_file_once(self):
+        security = MOCK_ORIGINS["standard-security"]
+        versions = [
+            mock_version("1.0", [security, MOCK_ORIGINS["now"]]),
+            mock_version("2.0", [security]),
+        ]
+        origin_index = OriginIndex()
+        with mock.patch(
+            M_PATH + "ORIGIN_INFORMATION_TO_SERVICE",
+            ORIGIN_TO_SERVICE_MOCK,
+        ):
+            origins = [origin_index.get_origins(v) for v in versions]
+
+        assert [
+            PackageFileOrigin(
+                origin="Ubuntu",
+                archive="example-security",
+                component="main",
+                site="security.ubuntu.com",
+                service_name="standard-security",
+            ),
+            PackageFileOrigin(
+                origin="",
+                archive="now",
+                component="now",
+                site="",
+                service_name="",
+            ),
+        ] == origins[0]
+        assert origins[0][0] is origins[1][0]
+        assert 2 == len(origin_index._origins)
+
+    def test_origins_of_each_update_are_looked_up_once(self):
+        update = mock_version("2.0", [MOCK_ORIGINS["standard-security"]])
+        package = mock_package("pkg", mock_version("1.0"), [update])
+        origin_index = OriginIndex()
+
+        with mock.patch.object(
+            origin_index, "get_origins", wraps=origin_index.get_origins
+        ) as m_get_origins, mock.patch(
+            M_PATH + "ORIGIN_INFORMATION_TO_SERVICE",
+            ORIGIN_TO_SERVICE_MOCK,
+        ):
+            updates = _get_package_updates(package, origin_index)
+
+        assert ["2.0"] == [u["version"] for u in updates]
+        assert "standard-security" == updates[0]["service_name"]
+        assert 1 == m_get_origins.call_count
 
     def test_filter_security_updates(self):
         expected_return = [
@@ -302,7 +379,9 @@ class TestSecurityStatus:
             M_PATH + "ORIGIN_INFORMATION_TO_SERVICE",
             ORIGIN_TO_SERVICE_MOCK,
         ):
-            filtered_versions = filter_security_updates(package_list)
+            filtered_versions = filter_security_updates(
+                package_list, OriginIndex()
+            )
             assert expected_return == filtered_versions
             assert [
                 "update-available",
@@ -310,30 +389,34 @@ class TestSecurityStatus:
                 "more-than-one-update",
             ] == [v.package.name for v in filtered_versions]
 
-    @mock.patch(M_PATH + "status", return_value={"attached": False})
     @mock.patch(
         M_PATH + "get_service_name",
         return_value=("esm-infra", "some.url.for.esm"),
     )
     @mock.patch(M_PATH + "get_origin_for_package", return_value="main")
-    @mock.patch(M_PATH + "filter_security_updates")
+    @mock.patch(M_PATH + "_iter_security_updates")
     @mock.patch(M_PATH + "Cache")
     def test_security_status_format(
         self,
         m_cache,
-        m_filter_sec_updates,
+        m_security_updates,
         _m_get_origin,
         _m_service_name,
-        _m_status,
         FakeConfig,
     ):
         """Make sure the output format matches the expected JSON"""
         cfg = FakeConfig()
         m_version = mock_version("1.0", size=123456)
         m_package = mock_package("example_package", m_version)
+        other_packages = [
+            mock_package("other_package_{}".format(i), mock_version("1.0"))
+            for i in range(9)
+        ]
 
-        m_cache.return_value = [m_package] * 10
-        m_filter_sec_updates.return_value = [m_version] * 2
+        m_cache.return_value = [m_package] + other_packages
+        m_security_updates.side_effect = lambda package, _index: (
+            [(m_version, [])] * 2 if package == m_package else []
+        )
 
         expected_output = {
             "_schema_version": "0.1",
@@ -377,3 +460,262 @@ class TestSecurityStatus:
         }
 
         assert expected_output == security_status(cfg)
+
+
+@mock.patch(
+    M_PATH + "get_ua_info",
+    return_value={
+        "attached": False,
+        "enabled_services": [],
+        "entitled_services": [],
+    },
+)
+@mock.patch(M_PATH + "apt.get_apt_cache_time", return_value=1000.0)
+@mock.patch(M_PATH + "Cache")
+class TestSecurityStatusCache:
+    @pytest.yield_fixture
+    def dpkg_status(self, tmpdir):
+        path = tmpdir.join("status")
+        path.write("")
+        with mock.patch(M_PATH + "apt.DPKG_STATUS_PATH", path.strpath):
+            yield path
+
+    def _packages(self, **versions):
+        security_origins = [MOCK_ORIGINS["standard-security"]]
+        packages = {}
+        for name, version in versions.items():
+            installed = mock_version(version, [MOCK_ORIGINS["now"]])
+            update = mock_version(version + ".1", security_origins)
+            packages[name] = mock_package(name, installed, [update])
+        return packages
+
+    def _security_status(self, cfg, packages):
+        with mock.patch(
+            M_PATH + "ORIGIN_INFORMATION_TO_SERVICE", ORIGIN_TO_SERVICE_MOCK
+        ):
+            with mock.patch(
+                M_PATH + "apt.get_dpkg_status_index",
+                return_value={
+                    name: InstalledPackage(
+                        name, name, package.installed.version, "installed"
+                    )
+                    for name, package in packages.items()
+                },
+            ):
+                return security_status(cfg)
+
+    def _updates(self, result):
+        return [(p["package"], p["version"]) for p in result["packages"]]
+
+    def test_unchanged_system_is_answered_from_cache(
+        self, m_cache, _m_cache_time, m_ua_info, dpkg_status, FakeConfig
+    ):
+        cfg = FakeConfig()
+        packages = self._packages(pkg1="1.0", pkg2="2.0")
+        m_cache.return_value = list(packages.values())
+
+        result = self._security_status(cfg, packages)
+        assert [("pkg1", "1.0.1"), ("pkg2", "2.0.1")] == self._updates(result)
+
+        assert result == self._security_status(cfg, packages)
+        assert 1 == m_cache.call_count
+        assert 1 == m_ua_info.call_count
+
+    def _apt_cache(self, packages):
+        apt_cache = mock.MagicMock()
+        apt_cache.__contains__.side_effect = lambda name: name in packages
+        apt_cache.__getitem__.side_effect = packages.get
+        return apt_cache
+
+    def test_only_packages_changed_by_dpkg_are_classified_again(
+        self, m_cache, _m_cache_time, m_ua_info, dpkg_status, FakeConfig
+    ):
+        cfg = FakeConfig()
+        packages = self._packages(pkg1="1.0", pkg2="2.0", pkg4="4.0")
+        m_cache.return_value = list(packages.values())
+        self._security_status(cfg, packages)
+
+        new_packages = dict(packages, **self._packages(pkg2="2.0.1", pkg3="3"))
+        del new_packages["pkg1"]
+        m_cache.return_value = self._apt_cache(new_packages)
+        dpkg_status.write("changed")
+
+        result = self._security_status(cfg, new_packages)
+
+        assert [
+            ("pkg2", "2.0.1.1"),
+            ("pkg3", "3.1"),
+            ("pkg4", "4.0.1"),
+        ] == self._updates(result)
+        assert 3 == result["summary"]["num_installed_packages"]
+        assert 3 == result["summary"]["num_main_packages"]
+        assert [
+            mock.call("pkg2"),
+            mock.call("pkg3"),
+        ] == sorted(m_cache.return_value.__getitem__.call_args_list)
+        assert not m_cache.return_value.__iter__.called
+        assert 1 == m_ua_info.call_count
+
+    def test_package_missing_from_apt_cache_walks_it_again(
+        self, m_cache, _m_cache_time, _m_ua_info, dpkg_status, FakeConfig
+    ):
+        cfg = FakeConfig()
+        packages = self._packages(pkg1="1.0")
+        m_cache.return_value = list(packages.values())
+        self._security_status(cfg, packages)
+
+        new_packages = dict(packages, **self._packages(pkg2="2.0"))
+        m_cache.return_value = self._apt_cache(packages)
+        m_cache.return_value.__iter__.side_effect = lambda: iter(
+            new_packages.values()
+        )
+        dpkg_status.write("changed")
+
+        result = self._security_status(cfg, new_packages)
+
+        assert [("pkg1", "1.0.1"), ("pkg2", "2.0.1")] == self._updates(result)
+        assert m_cache.return_value.__iter__.called
+
+    def test_only_counters_updates_and_installed_versions_are_cached(
+        self, m_cache, _m_cache_time, _m_ua_info, dpkg_status, FakeConfig
+    ):
+        cfg = FakeConfig()
+        packages = self._packages(pkg1="1.0", pkg2="2.0")
+        packages["pkg3"] = mock_package(
+            "pkg3", mock_version("3.0", [MOCK_ORIGINS["now"]])
+        )
+        m_cache.return_value = list(packages.values())
+        self._security_status(cfg, packages)
+
+        cache = cfg.read_cache("security-status")
+        assert [
+            "installed",
+            "key",
+            "package_count",
+            "ua",
+            "updates",
+        ] == sorted(cache)
+        assert {"main": 2, "unknown": 1} == cache["package_count"]
+        assert {
+            "pkg1": ["1.0", "main"],
+            "pkg2": ["2.0", "main"],
+            "pkg3": ["3.0", "unknown"],
+        } == cache["installed"]
+        assert ["pkg1", "pkg2"] == [
+            update["package"] for update in cache["updates"]
+        ]
+
+    def test_new_apt_lists_or_machine_token_recompute_what_they_affect(
+        self, m_cache, m_cache_time, m_ua_info, dpkg_status, FakeConfig
+    ):
+        cfg = FakeConfig()
+        packages = self._packages(pkg1="1.0")
+        m_cache.return_value = list(packages.values())
+        self._security_status(cfg, packages)
+
+        m_cache_time.return_value = 2000.0
+        self._security_status(cfg, packages)
+        assert 2 == m_cache.call_count
+        assert 1 == m_ua_info.call_count
+
+        cfg.machine_token_file.write({"machineToken": "new-token"})
+        self._security_status(cfg, packages)
+        assert 2 == m_cache.call_count
+        assert 2 == m_ua_info.call_count
+
+    def test_updates_are_yielded_while_walking_the_apt_cache(
+        self, m_cache, _m_cache_time, _m_ua_info, dpkg_status, FakeConfig
+    ):
+        packages = self._packages(pkg1="1.0", pkg2="2.0")
+        walked = []
+
+        def walk():
+            for name, package in packages.items():
+                walked.append(name)
+                yield package
+
+        m_cache.return_value.__iter__.side_effect = walk
+        with mock.patch(
+            M_PATH + "ORIGIN_INFORMATION_TO_SERVICE", ORIGIN_TO_SERVICE_MOCK
+        ):
+            records = iter_security_status(FakeConfig())
+            kind, record = next(records)
+            assert ("package", "pkg1") == (kind, record["package"])
+            assert ["pkg1"] == walked
+            assert ["package", "summary"] == [kind for kind, _ in records]
+
+    def test_cache_is_kept_in_the_data_dir_until_detach(
+        self,
+        m_cache,
+        _m_cache_time,
+        _m_ua_info,
+        dpkg_status,
+        FakeConfig,
+    ):
+        cfg = FakeConfig()
+        packages = self._packages(pkg1="1.0")
+        m_cache.return_value = list(packages.values())
+        self._security_status(cfg, packages)
+        assert os.path.exists(cfg.data_path("security-status"))
+
+        cfg.delete_cache()
+        self._security_status(cfg, packages)
+        assert 2 == m_cache.call_count
+
+
+class SyntheticVersion:
+    def __init__(self, version: str, origins: List[mock.MagicMock]):
+        self.version = version
+        self._cand = mock.Mock(file_list=[(origin, 0) for origin in origins])
+        self.size = 1
+
+    def __gt__(self, other):
+        return self.version > other.version
+
+
+class SyntheticPackage:
+    """A package that holds as much memory as an apt package would."""
+
+    def __init__(self, index: int):
+        self.name = "pkg{:05d}".format(index)
+        self.is_installed = True
+        self.installed = SyntheticVersion(
+            "1.0", [MOCK_ORIGINS["now"], MOCK_ORIGINS["archive_main"]]
+        )
+        self.candidate = self.installed
+        self.versions = [self.installed]
+        if index % 10 == 0:
+            self.candidate = SyntheticVersion(
+                "1.1", [MOCK_ORIGINS["standard-security"]]
+            )
+            self.versions.append(self.candidate)
+        self.data = bytearray(100 * 1024)
+
+
+class TestSecurityStatusMemory:
+    @mock.patch(M_PATH + "Cache")
+    def test_peak_memory_does_not_grow_with_installed_packages(
+        self, m_cache, FakeConfig
+    ):
+        num_packages = 10000
+        m_cache.return_value.__iter__.side_effect = lambda: (
+            SyntheticPackage(i) for i in range(num_packages)
+        )
+
+        tracemalloc.start()
+        try:
+            with mock.patch(
+                M_PATH + "ORIGIN_INFORMATION_TO_SERVICE",
+                ORIGIN_TO_SERVICE_MOCK,
+            ):
+                summary, packages = get_security_status(FakeConfig())
+                num_updates = sum(1 for _ in packages)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert num_packages == summary["num_installed_packages"]
+        assert num_packages == summary["num_main_packages"]
+        assert num_packages // 10 == num_updates
+        # Keeping every package alive would take over 1GB
+        assert peak < 64 * 1024 * 1024
@@ -26,6 +26,10 @@ class OurServiceClient(UAServiceClient):
         return "contract_url"
 
 
+class OurCachingServiceClient(OurServiceClient):
+    cache_ttls = {"fresh": 60, "revalidated/": 0}
+
+
 class TestRequestUrl:
 
     # TODO: Non error-path tests
@@ -109,6 +113,76 @@ URL_FAKES = {
 }
 
 
+class TestRequestUrlHTTPCache:
+    @mock.patch("uaclient.serviceclient.util.readurl")
+    def test_fresh_responses_are_served_from_cache(
+        self, m_readurl, FakeConfig
+    ):
+        m_readurl.return_value = ({"a": "b"}, {"expires": "never"})
+        cfg = FakeConfig()
+        cfg.cfg["contract_url"] = "http://example.com"
+
+        for _ in range(2):
+            response, headers = OurCachingServiceClient(cfg=cfg).request_url(
+                "fresh"
+            )
+            assert {"a": "b"} == response
+            assert "never" == headers.get("expires")
+        assert 1 == m_readurl.call_count
+
+        OurServiceClient(cfg=cfg).request_url("fresh")
+        assert 2 == m_readurl.call_count
+
+    @mock.patch("uaclient.serviceclient.util.readurl")
+    def test_stale_responses_are_revalidated(self, m_readurl, FakeConfig):
+        cfg = FakeConfig()
+        cfg.cfg["contract_url"] = "http://example.com"
+        client = OurCachingServiceClient(cfg=cfg)
+        m_readurl.side_effect = [
+            ({"a": "b"}, {"ETag": '"v1"'}),
+            HTTPError(None, 304, "Not Modified", None, BytesIO()),
+        ]
+
+        assert ({"a": "b"}) == client.request_url("revalidated/1")[0]
+        assert ({"a": "b"}) == client.request_url("revalidated/1")[0]
+
+        assert "If-None-Match" not in m_readurl.call_args_list[0][1]["headers"]
+        assert (
+            '"v1"'
+            == m_readurl.call_args_list[1][1]["headers"]["If-None-Match"]
+        )
+
+    @mock.patch("uaclient.serviceclient.util.readurl")
+    def test_writes_invalidate_cached_responses(self, m_readurl, FakeConfig):
+        cfg = FakeConfig()
+        cfg.cfg["contract_url"] = "http://example.com"
+        client = OurCachingServiceClient(cfg=cfg)
+        m_readurl.return_value = ({"a": "b"}, {})
+
+        client.request_url("fresh")
+        client.request_url("fresh", data={"c": "d"})
+        client.request_url("fresh")
+
+        assert 3 == m_readurl.call_count
+
+    @mock.patch("uaclient.serviceclient.util.readurl")
+    def test_non_root_responses_are_cached_per_user(
+        self, m_readurl, FakeConfig, tmpdir
+    ):
+        cfg = FakeConfig(root_mode=False)
+        cfg.cfg["contract_url"] = "http://example.com"
+        client = OurCachingServiceClient(cfg=cfg)
+        m_readurl.return_value = ({"a": "b"}, {})
+
+        with mock.patch.dict(
+            "os.environ", {"XDG_CACHE_HOME": tmpdir.join("cache").strpath}
+        ):
+            client.request_url("fresh")
+
+        assert tmpdir.join("cache", "ubuntu-pro", "http-cache").check()
+        assert not tmpdir.join("private", "http-cache").check()
+
+
 class Test_GetResponseOverlay:
     @pytest.mark.parametrize(
         "url,expected",
@@ -3,6 +3,7 @@ import datetime
 import os
 import stat
 import string
+import threading
 
 import mock
 import pytest
@@ -23,6 +24,7 @@ from uaclient.entitlements.entitlement_status import (
 from uaclient.entitlements.fips import FIPSEntitlement
 from uaclient.entitlements.ros import ROSEntitlement
 from uaclient.entitlements.tests.test_base import ConcreteTestEntitlement
+from uaclient.livepatch import LIVEPATCH_CMD, LivepatchStatus
 from uaclient.status import (
     DEFAULT_STATUS,
     TxtColor,
@@ -926,3 +928,138 @@ class TestAttachedServiceStatus:
         )
         service_status = status._attached_service_status(ent, [])
         assert service_status["blocked_by"] == expected_blocked_by
+
+
+class TestAttachedStatus:
+    @mock.patch("uaclient.apt.get_apt_cache_policy", return_value="")
+    @mock.patch("uaclient.status._attached_service_status")
+    def test_services_are_checked_concurrently(
+        self, m_service_status, m_policy, FakeConfig
+    ):
+        names = ["livepatch", "esm-infra", "esm-apps"]
+        cfg = FakeConfig.for_attached_machine()
+        token = cfg.machine_token
+        token["availableResources"] = [
+            {"name": name, "available": True} for name in names
+        ]
+        token["machineTokenInfo"]["contractInfo"]["resourceEntitlements"] = [
+            {"type": "esm-infra", "entitled": True}
+        ]
+        cfg.machine_token_file.write(token)
+
+        # Every check waits for the others, so they can't run one by one
+        barrier = threading.Barrier(len(names), timeout=10)
+
+        def service_status(ent, _inapplicable_resources):
+            assert 1 == m_policy.call_count
+            barrier.wait()
+            return {"name": ent.name}
+
+        m_service_status.side_effect = service_status
+
+        response = status._attached_status(cfg)
+
+        assert [{"name": name} for name in sorted(names)] == response[
+            "services"
+        ]
+        assert 1 == m_policy.call_count
+
+    @pytest.fixture
+    def attached_cfg(self, FakeConfig):
+        cfg = FakeConfig.for_attached_machine()
+        token = cfg.machine_token
+        token["availableResources"] = [
+            {"name": name, "available": True}
+            for name in ("esm-infra", "livepatch")
+        ]
+        cfg.machine_token_file.write(token)
+        return cfg
+
+    @mock.patch("uaclient.status._get_livepatch_fingerprint")
+    @mock.patch("uaclient.status._attached_service_status")
+    def test_services_with_unchanged_inputs_are_not_checked_again(
+        self, m_service_status, m_livepatch_fingerprint, attached_cfg
+    ):
+        m_livepatch_fingerprint.return_value = None
+        m_service_status.side_effect = lambda ent, _: {
+            "name": ent.name,
+            "status": "enabled",
+        }
+
+        response = status.status(attached_cfg)
+        assert status.STATUS_INPUTS_KEY not in response
+        assert status.STATUS_INPUTS_KEY in attached_cfg.read_cache(
+            "status-cache"
+        )
+        assert 2 == m_service_status.call_count
+
+        assert response == status.status(attached_cfg)
+        assert 2 == m_service_status.call_count
+
+        # Only livepatch depends on the state of livepatch
+        m_livepatch_fingerprint.return_value = [True, None]
+        assert response == status.status(attached_cfg)
+        assert ["livepatch"] == [
+            call[0][0].name for call in m_service_status.call_args_list[2:]
+        ]
+
+        status.invalidate_status_cache(attached_cfg)
+        assert status.STATUS_INPUTS_KEY not in attached_cfg.read_cache(
+            "status-cache"
+        )
+        status.status(attached_cfg)
+        assert 5 == m_service_status.call_count
+
+    @mock.patch("uaclient.status._attached_service_status")
+    def test_dpkg_changes_check_every_service_again(
+        self, m_service_status, attached_cfg, tmpdir
+    ):
+        m_service_status.side_effect = lambda ent, _: {"name": ent.name}
+        dpkg_status = tmpdir.join("status")
+        dpkg_status.write("Package: a\n")
+        with mock.patch("uaclient.apt.DPKG_STATUS_PATH", dpkg_status.strpath):
+            status.status(attached_cfg)
+            status.status(attached_cfg)
+            assert 2 == m_service_status.call_count
+
+            dpkg_status.write("Package: a\n\nPackage: b\n")
+            status.status(attached_cfg)
+        assert 4 == m_service_status.call_count
+
+    @mock.patch("uaclient.livepatch.get_status")
+    @mock.patch("uaclient.system.which", return_value=LIVEPATCH_CMD)
+    @mock.patch("uaclient.status._attached_service_status")
+    def test_livepatch_state_changes_check_livepatch_again(
+        self, m_service_status, _m_which, m_livepatch_status, attached_cfg
+    ):
+        m_service_status.side_effect = lambda ent, _: {"name": ent.name}
+        m_livepatch_status.return_value = LivepatchStatus(
+            enabled=True, error=None, version="1", fixed_cves=frozenset()
+        )
+        status.status(attached_cfg)
+        assert 2 == m_service_status.call_count
+
+        m_livepatch_status.return_value = LivepatchStatus(
+            enabled=True,
+            error=None,
+            version="2",
+            fixed_cves=frozenset(["cve-2022-1"]),
+        )
+        status.status(attached_cfg)
+        assert ["livepatch"] == [
+            call[0][0].name for call in m_service_status.call_args_list[2:]
+        ]
+
+    @mock.patch("uaclient.status._attached_service_status")
+    def test_new_machine_token_checks_every_service_again(
+        self, m_service_status, attached_cfg
+    ):
+        m_service_status.side_effect = lambda ent, _: {"name": ent.name}
+        status.status(attached_cfg)
+
+        token = attached_cfg.machine_token
+        token["machineTokenInfo"]["contractInfo"]["name"] = "new-contract"
+        attached_cfg.machine_token_file.write(token)
+        status.status(attached_cfg)
+
+        assert 4 == m_service_status.call_count
@@ -1,9 +1,11 @@
 """Tests related to uaclient.util module."""
 import datetime
+import gzip
 import json
 import logging
 import socket
 import urllib
+import zlib
 
 import mock
 import pytest
@@ -82,7 +84,8 @@ class TestReadurl:
                 "http://some_url",
                 None,
                 [
-                    "URL [GET]: http://some_url, headers: {}, data: None",
+                    "URL [GET]: http://some_url, headers: {'Accept-Encoding':"
+                    " 'gzip, deflate'}, data: None",
                     "URL [GET] response: http://some_url, headers: {},"
                     " data: response\n",
                 ],
@@ -99,7 +102,8 @@ class TestReadurl:
                 b"SECRET==",
                 [
                     "URL [PUT]: http://169.254.169.254/latest/api/token,"
-                    " headers: {'X-aws-ec2-metadata-token': '<REDACTED>',"
+                    " headers: {'Accept-Encoding': 'gzip, deflate',"
+                    " 'X-aws-ec2-metadata-token': '<REDACTED>',"
                     " 'X-aws-ec2-metadata-token-ttl-seconds': '21600'}",
                     "URL [PUT] response:"
                     " http://169.254.169.254/latest/api/token, headers:"
@@ -115,8 +119,9 @@ class TestReadurl:
                 "http://some_url",
                 b"{'machineToken': 'HIDEME', 'machineTokenInfo': 'SHOWME'}",
                 [
-                    "URL [POST]: http://some_url, headers: {'Authorization':"
-                    " 'Bearer <REDACTED>', 'key1': 'Bearcat'}, data:"
+                    "URL [POST]: http://some_url, headers: {'Accept-Encoding':"
+                    " 'gzip, deflate', 'Authorization': 'Bearer <REDACTED>',"
+                    " 'key1': 'Bearcat'}, data:"
                     " {'token': '<REDACTED>', 'tokenInfo': 'SHOWME'}",
                     "URL [POST] response: http://some_url, headers:"
                     " {'Authorization': 'Bearer <REDACTED>', 'key1': 'Bearcat'"
@@ -126,7 +131,7 @@ class TestReadurl:
             ),
         ),
     )
-    @mock.patch("uaclient.util.request.urlopen")
+    @mock.patch("uaclient.util.http_pool.urlopen")
     def test_readurl_redacts_call_and_response(
         self,
         urlopen,
@@ -158,9 +163,72 @@ class TestReadurl:
         for log in expected_logs:
             assert log in logs
 
+    @pytest.mark.parametrize("caplog_text", [logging.DEBUG], indirect=True)
+    @pytest.mark.parametrize(
+        "encoding,compress",
+        (
+            ("gzip", gzip.compress),
+            ("deflate", zlib.compress),
+            (
+                "deflate",
+                lambda data: zlib.compress(data)[2:-4],  # raw deflate
+            ),
+        ),
+    )
+    @mock.patch("uaclient.util.READURL_CHUNK_SIZE", 16)
+    def test_compressed_response_is_decoded(
+        self, encoding, compress, caplog_text
+    ):
+        content = {"resourceEntitlements": [{"type": "esm-infra"}] * 100}
+        body = compress(json.dumps(content).encode("utf-8"))
+        resp = mock.Mock(
+            headers={
+                "Content-type": "application/json",
+                "Content-Encoding": encoding,
+            },
+            read=mock.Mock(side_effect=[body[:16], body[16:], b""]),
+        )
+        with mock.patch(
+            "uaclient.util.http_pool.urlopen", return_value=resp
+        ) as m_urlopen:
+            assert (content, resp.headers) == util.readurl("http://some_url")
+
+        req = m_urlopen.call_args[0][0]
+        assert "gzip, deflate" == req.get_header("Accept-encoding")
+        assert (
+            "URL [GET] http://some_url: received {} bytes, {} decoded".format(
+                len(body), len(json.dumps(content))
+            )
+            in caplog_text()
+        )
+
+    @pytest.mark.parametrize(
+        "encoding,body",
+        (
+            ("gzip", b"not gzip at all"),
+            ("gzip", gzip.compress(b'{"a": 1}')[:-8] + b"corrupt!"),
+            ("gzip", gzip.compress(b'{"a": 1}')[:12]),
+            ("deflate", b"not deflate at all"),
+        ),
+    )
+    def test_corrupt_compressed_response_raises_url_error(
+        self, encoding, body
+    ):
+        resp = mock.Mock(
+            headers={
+                "Content-type": "application/json",
+                "Content-Encoding": encoding,
+            },
+            read=mock.Mock(side_effect=[body, b""]),
+        )
+        with mock.patch("uaclient.util.http_pool.urlopen", return_value=resp):
+            with pytest.raises(urllib.error.URLError) as excinfo:
+                util.readurl("http://some_url")
+        assert encoding in str(excinfo.value.reason)
+
     @pytest.mark.parametrize("timeout", (None, 1))
     def test_simple_call_with_url_and_timeout_works(self, timeout):
-        with mock.patch("uaclient.util.request.urlopen") as m_urlopen:
+        with mock.patch("uaclient.util.http_pool.urlopen") as m_urlopen:
             if timeout:
                 util.readurl("http://some_url", timeout=timeout)
             else:
@@ -170,7 +238,7 @@ class TestReadurl:
         ] == m_urlopen.call_args_list
 
     def test_call_with_timeout(self):
-        with mock.patch("uaclient.util.request.urlopen") as m_urlopen:
+        with mock.patch("uaclient.util.http_pool.urlopen") as m_urlopen:
             util.readurl("http://some_url")
         assert 1 == m_urlopen.call_count
 
@@ -178,7 +246,7 @@ class TestReadurl:
         "data", [b"{}", b"not a dict", b'{"caveat_id": "dict"}']
     )
     def test_data_passed_through_unchanged(self, data):
-        with mock.patch("uaclient.util.request.urlopen") as m_urlopen:
+        with mock.patch("uaclient.util.http_pool.urlopen") as m_urlopen:
             util.readurl("http://some_url", data=data)
 
         assert 1 == m_urlopen.call_count
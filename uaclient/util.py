@@ -6,6 +6,7 @@ import re
 import socket
 import sys
 import time
+import zlib
 from contextlib import contextmanager
 from functools import wraps
 from http.client import HTTPMessage
@@ -13,7 +14,7 @@ from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
 from urllib import error, request
 from urllib.parse import urlparse
 
-from uaclient import event_logger, exceptions, messages
+from uaclient import event_logger, exceptions, http_pool, messages
 from uaclient.defaults import CONFIG_FIELD_ENVVAR_ALLOWLIST
 from uaclient.types import MessagingOperations
 
@@ -24,6 +25,8 @@ PROXY_VALIDATION_APT_HTTP_URL = "http://archive.ubuntu.com"
 PROXY_VALIDATION_APT_HTTPS_URL = "https://esm.ubuntu.com"
 PROXY_VALIDATION_SNAP_HTTP_URL = "http://api.snapcraft.io"
 PROXY_VALIDATION_SNAP_HTTPS_URL = "https://api.snapcraft.io"
+READURL_ACCEPT_ENCODING = "gzip, deflate"
+READURL_CHUNK_SIZE = 64 * 1024
 
 
 event = event_logger.get_event_logger()
@@ -288,9 +291,50 @@ def configure_web_proxy(
     os.environ["no_proxy"] = no_proxy
     os.environ["NO_PROXY"] = no_proxy
     if proxy_dict:
-        proxy_handler = request.ProxyHandler(proxy_dict)
-        opener = request.build_opener(proxy_handler)
-        request.install_opener(opener)
+        http_pool.set_proxies(proxy_dict)
+
+
+def _read_response_body(resp: Any) -> Tuple[bytes, int]:
+    """Return the decoded body of resp and the number of bytes received.
+
+    gzip and deflate bodies are decompressed while they are read, so the
+    compressed body is never held in memory as a whole.
+
+    :raises URLError: when a compressed body is corrupt or truncated.
+    """
+    encoding = str(resp.headers.get("Content-Encoding", "")).strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        wbits = 16 + zlib.MAX_WBITS
+    elif encoding == "deflate":
+        wbits = zlib.MAX_WBITS
+    else:
+        body = resp.read()
+        return body, len(body)
+    decompressor = zlib.decompressobj(wbits)
+    chunks = []
+    received = 0
+    try:
+        while True:
+            chunk = resp.read(READURL_CHUNK_SIZE)
+            if not chunk:
+                break
+            try:
+                chunks.append(decompressor.decompress(chunk))
+            except zlib.error:
+                if received or encoding != "deflate":
+                    raise
+                # Some servers send raw deflate data without the zlib header
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                chunks.append(decompressor.decompress(chunk))
+            received += len(chunk)
+        chunks.append(decompressor.flush())
+    except zlib.error as e:
+        raise error.URLError(
+            "Invalid {} response body: {}".format(encoding, e)
+        )
+    if not decompressor.eof:
+        raise error.URLError("Truncated {} response body".format(encoding))
+    return b"".join(chunks), received
 
 
 def readurl(
@@ -303,6 +347,8 @@ def readurl(
 ) -> Tuple[Any, Union[HTTPMessage, Mapping[str, str]]]:
     if data and not method:
         method = "POST"
+    if not any(name.lower() == "accept-encoding" for name in headers):
+        headers = dict(headers, **{"Accept-Encoding": READURL_ACCEPT_ENCODING})
     req = request.Request(url, data=data, headers=headers, method=method)
     sorted_header_str = ", ".join(
         ["'{}': '{}'".format(k, headers[k]) for k in sorted(headers)]
@@ -318,13 +364,23 @@ def readurl(
         )
     )
     http_error_found = False
+    start = time.monotonic()
     try:
-        resp = request.urlopen(req, timeout=timeout)
+        resp = http_pool.urlopen(req, timeout=timeout)
         http_error_found = False
     except error.HTTPError as e:
         resp = e
         http_error_found = True
-    setattr(resp, "body", resp.read().decode("utf-8"))
+    body, received = _read_response_body(resp)
+    logging.debug(
+        "URL [%s] %s: received %d bytes, %d decoded, in %.3f seconds",
+        method or "GET",
+        url,
+        received,
+        len(body),
+        time.monotonic() - start,
+    )
+    setattr(resp, "body", body.decode("utf-8"))
     content = resp.body
     if "application/json" in str(resp.headers.get("Content-type", "")):
         content = json.loads(content)